@@ -1,4 +1,5 @@
-from fastapi import Request, HTTPException, Depends
+from fastapi import Request, HTTPException, Depends, WebSocket
+from typing import Optional
 from app.services.auth_service import AuthService
 import os
 
@@ -19,10 +20,13 @@ async def get_current_user(request: Request):
     if not token:
         raise HTTPException(status_code=401, detail="Authentication required")
     
+    return decode_access_token(token)
+
+
+def decode_access_token(token: str) -> dict:
+    """JWTを検証して {"email": ...} を返す（無効なら401）"""
+    import jwt
     try:
-        # トークンをデコードしてペイロードを取得
-        # AuthServiceにデコード機能を追加するか、ここで直接jwtを使う
-        import jwt
         payload = jwt.decode(token, auth_service.secret_key, algorithms=[auth_service.algorithm])
         email: str = payload.get("sub")
         if email is None:
@@ -30,3 +34,22 @@ async def get_current_user(request: Request):
         return {"email": email}
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+
+def get_websocket_user(websocket: WebSocket) -> Optional[dict]:
+    """
+    WebSocket接続のユーザーを返す（認証できなければ None）
+    ブラウザのWebSocketはヘッダーを付けられないため、クエリの token → Authorizationヘッダー → クッキーの順に見る
+    """
+    token = websocket.query_params.get("token")
+    auth_header = websocket.headers.get("Authorization")
+    if not token and auth_header and auth_header.startswith("Bearer "):
+        token = auth_header.split(" ")[1]
+    if not token:
+        token = websocket.cookies.get("access_token")
+    if not token:
+        return None
+    try:
+        return decode_access_token(token)
+    except HTTPException:
+        return None
@@ -1,24 +1,39 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Optional
 from app.services.ai_service import AIService
+from app.services.chat_session_store import ChatSessionStore
 from app.deps import get_current_user
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 ai_service = AIService()
+chat_store = ChatSessionStore(ai_service)
 
 class ChatRequest(BaseModel):
     message: str
+    # conversation_id がない場合（旧クライアント・会話が見つからなかった場合の送り直し）の初期履歴
     history: List[Dict[str, str]] = []
+    conversation_id: Optional[str] = None
 
 @router.post("")
 async def chat(request: ChatRequest, user: dict = Depends(get_current_user)):
-    """AIとの自由対話エンドポイント"""
+    """AIとの自由対話エンドポイント（会話履歴はサーバー側で保持）"""
     try:
         print(f"Chat request from {user.get('email')}: {request.message[:50]}...")
-        response = await ai_service.chat_response(request.message, request.history)
+        owner = user.get("email", "")
+        conversation = None
+        if request.conversation_id:
+            conversation = await chat_store.get(owner, request.conversation_id)
+            if conversation is None and not request.history:
+                # 期限切れなどでサーバー側の会話がない場合、文脈なしで続けずにクライアントに履歴を送り直してもらう
+                raise HTTPException(status_code=404, detail="conversation_not_found")
+        if conversation is None:
+            conversation = await chat_store.create(owner, request.history)
+        response = await chat_store.reply(conversation, request.message)
         print(f"Chat response generated successfully ({len(response)} chars)")
-        return {"response": response}
+        return {"response": response, "conversation_id": conversation.conversation_id}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"CHAT ERROR: {e}")
         raise HTTPException(status_code=500, detail=str(e))
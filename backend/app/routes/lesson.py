@@ -1,9 +1,11 @@
+import asyncio
 from fastapi import APIRouter, HTTPException, Depends
 from app.models.schemas import LessonGenerateRequest, LessonGenerateResponse, LessonOption
 from app.services import AIService, NewsService, NotionService
+from app.services.lesson_variant_store import LessonVariantStore
 from app.deps import get_current_user
 import logging
-from typing import List, Dict
+from typing import List, Dict, Optional
 from datetime import datetime
 
 router = APIRouter(prefix="/api/lesson", tags=["lesson"])
@@ -13,22 +15,99 @@ ai_service = AIService()
 news_service = NewsService()
 notion_service = NotionService()
 
+lesson_variant_store = LessonVariantStore(ai_service, news_service)
+
 logger = logging.getLogger(__name__)
 
 
+def _save_lessons_to_notion(lessons: List, user_email: str):
+    """生成したレッスンをNotionに保存（各レッスンごと・失敗しても処理は続行）"""
+    logger.info(f"Notion保存開始: ユーザー={user_email}, レッスン数={len(lessons)}")
+    for lesson in lessons:
+        try:
+            # Pydanticモデルを辞書に変換
+            if hasattr(lesson, 'model_dump'):
+                lesson_dict = lesson.model_dump()  # Pydantic v2
+            elif hasattr(lesson, 'dict'):
+                lesson_dict = lesson.dict()  # Pydantic v1
+            else:
+                lesson_dict = lesson  # 既に辞書の場合
+            
+            # lessonがdictの場合に備えて、titleを安全に取得
+            lesson_title = lesson_dict.get('title', 'Unknown') if isinstance(lesson_dict, dict) else getattr(lesson, 'title', 'Unknown')
+            
+            logger.info(f"レッスンをNotionに保存開始: {lesson_title}")
+            page_id = notion_service.save_lesson(lesson_dict, user_email)
+            if page_id:
+                logger.info(f"レッスンをNotionに保存成功: {lesson_title} (Page ID: {page_id})")
+            else:
+                logger.warning(f"レッスンのNotion保存がスキップされました: {lesson_title} (環境変数が設定されていない可能性があります)")
+        except Exception as e:
+            # lesson_dictが定義されていない場合に備えて、lessonから直接取得を試みる
+            try:
+                lesson_title = lesson_dict.get('title', 'Unknown') if isinstance(lesson_dict, dict) else getattr(lesson, 'title', 'Unknown')
+            except:
+                lesson_title = lesson.get('title', 'Unknown') if isinstance(lesson, dict) else 'Unknown'
+            logger.error(f"レッスンのNotion保存に失敗（処理は続行）: {lesson_title}, エラー: {str(e)}", exc_info=True)
+
+
+
+# 実行中のNotion保存（タスクへの参照を持ち、完了前にGCされないようにする）
+_background_saves: set = set()
+
+
+def _save_lessons_in_background(lessons: List, user_email: str):
+    """Notion保存をバックグラウンドで実行（レスポンスを先行返却して体感時間を短縮）"""
+    task = asyncio.ensure_future(
+        asyncio.get_running_loop().run_in_executor(None, _save_lessons_to_notion, lessons, user_email)
+    )
+    _background_saves.add(task)
+    task.add_done_callback(_background_saves.discard)
+
+
+async def _save_lessons_once(key: str, level: int, lessons: List, user_email: str):
+    """
+    生成済みのレッスンを、このユーザーに初めて返すときだけNotionに保存する（バックグラウンド）
+    誰が生成したかに関係なくユーザーごとに1回保存し、レベル切り替え・再読み込みでは保存し直さない
+    """
+    try:
+        first_time = await lesson_variant_store.mark_served(key, level, user_email)
+    except Exception as e:
+        # 記録できなくても保存はする（重複はNotion側の重複チェックで防ぐ）
+        logger.warning(f"レッスンの配信記録に失敗: {key} level={level}, エラー: {e}")
+        first_time = True
+    if first_time:
+        _save_lessons_in_background(lessons, user_email)
+
+
 @router.post("/generate", response_model=LessonGenerateResponse)
 async def generate_lesson(
     request: LessonGenerateRequest,
     user: dict = Depends(get_current_user),
-    level: int = 2
+    level: int = 2,
+    all_levels: bool = False
 ):
     """
     Daily News Englishレッスンを生成（URL指定版）
     
     指定された記事URLからスクレイピングし、
     OpenAI APIで英語レッスンを生成します。
+    all_levels=true の場合はレベル1/2/3をまとめて並行生成して保持し、
+    同じURLでのレベル切り替えは生成済みのものを返します。
     """
     try:
+        if all_levels:
+            lessons = await lesson_variant_store.get_url_lessons(request.news_url, level)
+            if not lessons:
+                raise HTTPException(
+                    status_code=500,
+                    detail="記事の取得またはレッスンの生成に失敗しました。"
+                )
+            await _save_lessons_once(
+                LessonVariantStore.url_key(request.news_url), level, lessons, user.get("email", "")
+            )
+            return LessonGenerateResponse(lessons=lessons)
+
         # 1. 記事をスクレイピング
         logger.info(f"記事をスクレイピング開始: {request.news_url}")
         article = await news_service.scrape_article(request.news_url)
@@ -60,34 +139,7 @@ async def generate_lesson(
         logger.info(f"レッスン生成成功: {len(lessons)}件")
         
         # 3. 生成したレッスンをNotionに保存（各レッスンごと）
-        user_email = user.get("email", "")
-        logger.info(f"Notion保存開始: ユーザー={user_email}, レッスン数={len(lessons)}")
-        for lesson in lessons:
-            try:
-                # Pydanticモデルを辞書に変換
-                if hasattr(lesson, 'model_dump'):
-                    lesson_dict = lesson.model_dump()  # Pydantic v2
-                elif hasattr(lesson, 'dict'):
-                    lesson_dict = lesson.dict()  # Pydantic v1
-                else:
-                    lesson_dict = lesson  # 既に辞書の場合
-                
-                # lessonがdictの場合に備えて、titleを安全に取得
-                lesson_title = lesson_dict.get('title', 'Unknown') if isinstance(lesson_dict, dict) else getattr(lesson, 'title', 'Unknown')
-                
-                logger.info(f"レッスンをNotionに保存開始: {lesson_title}")
-                page_id = notion_service.save_lesson(lesson_dict, user_email)
-                if page_id:
-                    logger.info(f"レッスンをNotionに保存成功: {lesson_title} (Page ID: {page_id})")
-                else:
-                    logger.warning(f"レッスンのNotion保存がスキップされました: {lesson_title} (環境変数が設定されていない可能性があります)")
-            except Exception as e:
-                # lesson_dictが定義されていない場合に備えて、lessonから直接取得を試みる
-                try:
-                    lesson_title = lesson_dict.get('title', 'Unknown') if isinstance(lesson_dict, dict) else getattr(lesson, 'title', 'Unknown')
-                except:
-                    lesson_title = lesson.get('title', 'Unknown') if isinstance(lesson, dict) else 'Unknown'
-                logger.error(f"レッスンのNotion保存に失敗（処理は続行）: {lesson_title}, エラー: {str(e)}", exc_info=True)
+        _save_lessons_to_notion(lessons, user.get("email", ""))
         
         return LessonGenerateResponse(lessons=lessons)
         
@@ -102,17 +154,23 @@ async def generate_lesson(
 
 
 @router.get("/generate/auto", response_model=LessonGenerateResponse)
-async def generate_lesson_auto(user: dict = Depends(get_current_user), level: int = 2):
+async def generate_lesson_auto(
+    user: dict = Depends(get_current_user),
+    level: int = 2,
+    category: Optional[str] = None,
+    max_age_hours: Optional[float] = None,
+):
     """
     自動でニュース記事を取得してレッスンを生成（URL指定なし）
     
-    複数のニュースソースから自動的に記事を取得し、
+    先読み済みの記事索引（なければ複数のニュースソース）から記事を取得し、
     OpenAI APIで英語レッスンを生成します。
+    category / max_age_hours で記事のカテゴリーと新しさを絞り込めます。
     """
     try:
-        # 1. 複数のニュースソースから自動で記事を取得
+        # 1. 記事索引 / 複数のニュースソースから自動で記事を取得
         logger.info("自動ニュース取得開始")
-        article = await news_service.fetch_random_news()
+        article = await news_service.fetch_random_news(category=category, max_age_hours=max_age_hours)
         
         if not article:
             logger.error("記事の自動取得に失敗")
@@ -123,13 +181,9 @@ async def generate_lesson_auto(user: dict = Depends(get_current_user), level: in
         
         logger.info(f"記事取得成功: {article['title']} (URL: {article.get('url', 'Unknown')})")
         
-        # 2. OpenAI APIでレッスンを生成
+        # 2. OpenAI APIでレッスンを生成（別ソースの同じニュースで生成済みならそれを使う）
         logger.info("レッスン生成開始")
-        lessons = await ai_service.generate_english_lesson(
-            japanese_content=article["content"],
-            japanese_title=article["title"],
-            level=level
-        )
+        lessons = await lesson_variant_store.get_article_lessons(article, level)
         
         if not lessons:
             logger.error("レッスンの生成に失敗")
@@ -140,35 +194,8 @@ async def generate_lesson_auto(user: dict = Depends(get_current_user), level: in
         
         logger.info(f"レッスン生成成功: {len(lessons)}件")
         
-        # 3. 生成したレッスンをNotionに保存（各レッスンごと）
-        user_email = user.get("email", "")
-        logger.info(f"Notion保存開始: ユーザー={user_email}, レッスン数={len(lessons)}")
-        for lesson in lessons:
-            try:
-                # Pydanticモデルを辞書に変換
-                if hasattr(lesson, 'model_dump'):
-                    lesson_dict = lesson.model_dump()  # Pydantic v2
-                elif hasattr(lesson, 'dict'):
-                    lesson_dict = lesson.dict()  # Pydantic v1
-                else:
-                    lesson_dict = lesson  # 既に辞書の場合
-                
-                # lessonがdictの場合に備えて、titleを安全に取得
-                lesson_title = lesson_dict.get('title', 'Unknown') if isinstance(lesson_dict, dict) else getattr(lesson, 'title', 'Unknown')
-                
-                logger.info(f"レッスンをNotionに保存開始: {lesson_title}")
-                page_id = notion_service.save_lesson(lesson_dict, user_email)
-                if page_id:
-                    logger.info(f"レッスンをNotionに保存成功: {lesson_title} (Page ID: {page_id})")
-                else:
-                    logger.warning(f"レッスンのNotion保存がスキップされました: {lesson_title} (環境変数が設定されていない可能性があります)")
-            except Exception as e:
-                # lesson_dictが定義されていない場合に備えて、lessonから直接取得を試みる
-                try:
-                    lesson_title = lesson_dict.get('title', 'Unknown') if isinstance(lesson_dict, dict) else getattr(lesson, 'title', 'Unknown')
-                except:
-                    lesson_title = lesson.get('title', 'Unknown') if isinstance(lesson, dict) else 'Unknown'
-                logger.error(f"レッスンのNotion保存に失敗（処理は続行）: {lesson_title}, エラー: {str(e)}", exc_info=True)
+        # 3. レッスンをNotionに保存（このユーザーに初めて返すときだけ）
+        await _save_lessons_once(LessonVariantStore.article_key(article), level, lessons, user.get("email", ""))
         
         return LessonGenerateResponse(lessons=lessons)
         
@@ -182,6 +209,49 @@ async def generate_lesson_auto(user: dict = Depends(get_current_user), level: in
         )
 
 
+@router.get("/daily", response_model=LessonGenerateResponse)
+async def get_daily_lesson(
+    user: dict = Depends(get_current_user),
+    level: int = 2,
+    category: Optional[str] = None,
+):
+    """
+    今日のニュースのレッスンを指定レベルで取得
+
+    その日の最初のリクエストで記事を1つ取得し、レベル1/2/3のレッスンを並行生成して保持します。
+    以降のリクエスト（レベル切り替えを含む）は生成済みのレッスンを即座に返します。
+    category を指定するとカテゴリーごとに別の記事になります。
+    """
+    if level not in LessonVariantStore.LEVELS:
+        raise HTTPException(status_code=400, detail="levelは1, 2, 3のいずれかを指定してください")
+
+    try:
+        # 日付をまたぐリクエストでも、返したレッスンと配信記録のキーを同じ日付にする
+        now = datetime.now()
+        lessons = await lesson_variant_store.get_daily_lessons(level, category=category, now=now)
+        if not lessons:
+            logger.error("今日のレッスンの生成に失敗")
+            raise HTTPException(
+                status_code=500,
+                detail="今日のレッスンの生成に失敗しました。しばらく時間をおいて再度お試しください。"
+            )
+
+        # Notion保存は、各ユーザーに初めて返すときだけ（生成したユーザー以外の履歴にも残す）
+        await _save_lessons_once(
+            LessonVariantStore.daily_key(now, category), level, lessons, user.get("email", "")
+        )
+        return LessonGenerateResponse(lessons=lessons)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"予期しないエラー: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"レッスン生成中にエラーが発生しました: {str(e)}"
+        )
+
+
 @router.get("/history", response_model=List[LessonOption])
 async def get_lesson_history(
     limit: int = 50,
@@ -1,8 +1,15 @@
 import asyncio
-from fastapi import APIRouter, HTTPException, Depends
+import json
+import math
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, WebSocket, WebSocketDisconnect
 from app.models.schemas import SessionCreate, SessionResponse, TranscriptSubmit, AnalysisResponse, LessonGenerateResponse
 from app.services import AIService, ArticleService, NotionService, NewsService
-from app.deps import get_current_user
+from app.services.session_store import session_store
+from app.services.live_practice import LivePractice
+from app.services.whisper_service import WhisperService
+from app.services.usage_service import UsageService
+from app.deps import get_current_user, get_websocket_user
 import uuid
 from datetime import datetime
 
@@ -13,9 +20,8 @@ ai_service = AIService()
 article_service = ArticleService()
 notion_service = NotionService()
 news_service = NewsService()
-
-# セッション管理用の簡易ストレージ（本番環境ではRedisなどを使用）
-sessions = {}
+whisper_service = WhisperService()
+usage_service = UsageService()
 
 
 @router.get("/session/generate", response_model=LessonGenerateResponse)
@@ -143,7 +149,7 @@ async def start_session(request: SessionCreate):
             }
         
         # セッション情報を保存
-        sessions[session_id] = {
+        await session_store.aput(session_id, {
             "article_url": request.article_url or "generated",
             "article_title": article_title,
             "article_content": article_content,
@@ -151,7 +157,7 @@ async def start_session(request: SessionCreate):
             "topic": request.topic or article_title,
             "created_at": datetime.now().isoformat(),
             "lesson_data": lesson_data  # レッスン情報を追加
-        }
+        })
         
         return SessionResponse(
             session_id=session_id,
@@ -167,6 +173,49 @@ async def start_session(request: SessionCreate):
 
 
 
+def _save_practice_to_notion(
+    session: dict,
+    session_id: str,
+    transcript: str,
+    duration_seconds: float,
+    user_email: str,
+    feedback_items: list,
+):
+    """会話ログとフィードバックをNotionに保存（失敗しても続行）"""
+    # レッスン情報を取得
+    lesson_data = session.get("lesson_data")
+    lesson = lesson_data if lesson_data and isinstance(lesson_data, dict) else {}
+    
+    try:
+        notion_service.create_conversation_log(
+            topic=session["topic"],
+            article_url=session["article_url"],
+            full_transcript=transcript,
+            duration_seconds=duration_seconds,
+            user_email=user_email,
+            lesson_title=lesson.get("title"),
+            lesson_category=lesson.get("category"),
+            lesson_level=lesson.get("level"),
+            lesson_date=lesson.get("date")
+        )
+    except Exception as e:
+        print(f"Notion conversation log save failed (non-critical): {e}")
+    
+    if feedback_items:
+        try:
+            notion_service.create_multiple_feedback_items(
+                feedback_items=feedback_items,
+                session_id=session_id,
+                user_email=user_email,
+                lesson_title=lesson.get("title"),
+                lesson_category=lesson.get("category"),
+                lesson_level=lesson.get("level"),
+                lesson_date=lesson.get("date")
+            )
+        except Exception as e:
+            print(f"Notion feedback save failed (non-critical): {e}")
+
+
 @router.post("/session/submit", response_model=AnalysisResponse)
 async def submit_transcript(request: TranscriptSubmit, user: dict = Depends(get_current_user)):
     """
@@ -177,46 +226,17 @@ async def submit_transcript(request: TranscriptSubmit, user: dict = Depends(get_
     user_email = user.get("email")
     try:
         # セッション情報を取得
-        session = sessions.get(request.session_id)
+        session = await session_store.aget(request.session_id)
         if not session:
             raise HTTPException(status_code=404, detail="セッションが見つかりません")
         
         # 発話を解析（これがメイン機能）
         feedback_items = await ai_service.analyze_speech(request.transcript)
         
-        # レッスン情報を取得
-        lesson_data = session.get("lesson_data")
-        
-        # 会話ログをNotionに保存（失敗しても続行）
-        try:
-            not_service_res = notion_service.create_conversation_log(
-                topic=session["topic"],
-                article_url=session["article_url"],
-                full_transcript=request.transcript,
-                duration_seconds=request.duration_seconds,
-                user_email=user_email,
-                lesson_title=lesson_data.get("title") if lesson_data and isinstance(lesson_data, dict) else None,
-                lesson_category=lesson_data.get("category") if lesson_data and isinstance(lesson_data, dict) else None,
-                lesson_level=lesson_data.get("level") if lesson_data and isinstance(lesson_data, dict) else None,
-                lesson_date=lesson_data.get("date") if lesson_data and isinstance(lesson_data, dict) else None
-            )
-        except Exception as e:
-            print(f"Notion conversation log save failed (non-critical): {e}")
-        
-        # フィードバックをNotionに保存（失敗しても続行）
-        if feedback_items:
-            try:
-                notion_service.create_multiple_feedback_items(
-                    feedback_items=feedback_items,
-                    session_id=request.session_id,
-                    user_email=user_email,
-                    lesson_title=lesson_data.get("title") if lesson_data and isinstance(lesson_data, dict) else None,
-                    lesson_category=lesson_data.get("category") if lesson_data and isinstance(lesson_data, dict) else None,
-                    lesson_level=lesson_data.get("level") if lesson_data and isinstance(lesson_data, dict) else None,
-                    lesson_date=lesson_data.get("date") if lesson_data and isinstance(lesson_data, dict) else None
-                )
-            except Exception as e:
-                print(f"Notion feedback save failed (non-critical): {e}")
+        # 会話ログとフィードバックをNotionに保存（失敗しても続行）
+        _save_practice_to_notion(
+            session, request.session_id, request.transcript, request.duration_seconds, user_email, feedback_items
+        )
         
         return AnalysisResponse(
             session_id=request.session_id,
@@ -231,6 +251,148 @@ async def submit_transcript(request: TranscriptSubmit, user: dict = Depends(get_
         raise HTTPException(status_code=500, detail=f"解析エラー: {str(e)}")
 
 
+def _client_duration(data: dict) -> Optional[float]:
+    """ライブ練習のメッセージの duration_seconds（省略時は0、不正な値なら None）"""
+    value = data.get("duration_seconds")
+    if value is None:
+        return 0.0
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        return None
+    return seconds if math.isfinite(seconds) and seconds >= 0 else None
+
+
+@router.websocket("/session/live")
+async def live_practice(websocket: WebSocket, session_id: str):
+    """
+    話しながら音声を送り、区間ごとの文字起こしと文ごとのフィードバックを受け取るライブ練習
+    
+    クライアント → サーバー:
+    - バイナリ: 音声データ（区間の途中で何回に分けて送ってもよい）
+    - {"type": "segment_end", "duration_seconds": 4.2, "format": "webm"}: ここまでを1区間として文字起こし
+      （区間はそれだけで再生できる音声ファイルであること。MediaRecorder を区間ごとに開始・停止する。
+        timeslice で分割したWebMの断片は先頭以外単独でデコードできない）
+    - {"type": "stop"}: 練習終了（残りの文字起こし・フィードバックを待って done を返す）
+    
+    サーバー → クライアント:
+    - ready / transcript（区間ごと）/ feedback（確定した文のまとまりごと）/ error / done（全体の結果）
+    """
+    await websocket.accept()
+    
+    user = get_websocket_user(websocket)
+    if not user:
+        await websocket.close(code=4401, reason="Authentication required")
+        return
+    user_email = user["email"]
+    
+    session = await session_store.aget(session_id)
+    if not session:
+        await websocket.close(code=4404, reason="Session not found")
+        return
+    
+    check_result = await usage_service.can_use_whisper(user_email, 0.0)
+    if not check_result["allowed"]:
+        await websocket.send_json({"type": "error", "detail": check_result["reason"]})
+        await websocket.close(code=4403, reason="Whisper not available")
+        return
+    remaining_minutes = check_result["remaining_minutes"]
+    
+    async def _send(message: dict):
+        try:
+            await websocket.send_json(message)
+        except Exception:
+            pass  # 切断済み（受信側のループで検知する）
+    
+    async def _transcribe(audio: bytes, index: int, fmt: str) -> str:
+        return await whisper_service.transcribe_bytes(audio, user_email, filename=f"segment-{index}.{fmt}")
+    
+    live = LivePractice(transcribe=_transcribe, analyze=ai_service.analyze_speech, send=_send)
+    result = None
+    await _send({"type": "ready", "session_id": session_id, "remaining_minutes": remaining_minutes})
+    
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes") is not None:
+                try:
+                    live.add_audio(message["bytes"])
+                except ValueError as e:
+                    await _send({"type": "error", "detail": str(e)})
+                    break
+                continue
+            
+            try:
+                data = json.loads(message.get("text") or "{}")
+            except json.JSONDecodeError:
+                await _send({"type": "error", "detail": "不正なメッセージです"})
+                continue
+            if not isinstance(data, dict):
+                await _send({"type": "error", "detail": "不正なメッセージです"})
+                continue
+            kind = data.get("type")
+            duration_seconds = _client_duration(data)
+            if kind in ("segment_end", "stop") and duration_seconds is None:
+                await _send({"type": "error", "detail": "duration_seconds は0以上の数値で指定してください"})
+                continue
+            if kind == "segment_end":
+                await live.end_segment(duration_seconds, str(data.get("format") or "webm"))
+                # 無料体験の残り分数を超えたら、ここまでの区間で終了する
+                if remaining_minutes is not None and live.duration_seconds / 60.0 >= remaining_minutes:
+                    await _send({"type": "error", "detail": "Whisperの残り時間に達したため終了します"})
+                    break
+            elif kind == "stop":
+                if live.has_audio:
+                    await live.end_segment(duration_seconds, str(data.get("format") or "webm"))
+                break
+        
+        result = await live.finish()
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"[Backend] Live practice failed: {e}")
+        await _send({"type": "error", "detail": "ライブ練習でエラーが発生しました"})
+    finally:
+        if result is None:
+            # 切断・エラー時は実行中の文字起こし・フィードバックを取り消す（切れた接続のために課金し続けない）
+            await live.aclose()
+        # 文字起こしに送った分は切断時も使用量として記録する
+        if live.duration_seconds > 0:
+            try:
+                await usage_service.add_whisper_usage(user_email, live.duration_seconds / 60.0)
+            except Exception as e:
+                print(f"[Backend] Whisper usage record failed (live): {e}")
+    
+    if result is None:
+        return
+    
+    if result["transcript"]:
+        asyncio.get_running_loop().run_in_executor(
+            None,
+            _save_practice_to_notion,
+            session, session_id, result["transcript"], result["duration_seconds"], user_email, result["feedback_items"],
+        )
+    
+    feedback_items = result["feedback_items"]
+    await _send({
+        "type": "done",
+        "session_id": session_id,
+        "transcript": result["transcript"],
+        "duration_seconds": result["duration_seconds"],
+        "feedback_count": len(feedback_items),
+        "feedback_items": feedback_items,
+        "message": f"{len(feedback_items)}件のフィードバックを記録しました" if feedback_items else "素晴らしい！改善点は見つかりませんでした",
+    })
+    try:
+        await websocket.close()
+    except Exception:
+        pass
+
+
 @router.get("/feedback/recent")
 async def get_recent_feedback(limit: int = 10, user: dict = Depends(get_current_user)):
     """最近のフィードバックを取得"""
@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
 from app.models.schemas import WhisperTranscribeRequest, WhisperTranscribeResponse
 from app.services.whisper_service import WhisperService
 from app.services.usage_service import UsageService
+from app.services.audio_probe import metered_duration
+from app.services.idempotency import AudioHasher, idempotency_key, transcription_results
 from app.deps import get_current_user
 import logging
+import os
+import tempfile
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
@@ -12,64 +17,130 @@ router = APIRouter(prefix="/api/whisper", tags=["whisper"])
 whisper_service = WhisperService()
 usage_service = UsageService()
 
+# Whisper APIが受け付けるファイルサイズの上限
+MAX_UPLOAD_BYTES = int(os.getenv("WHISPER_MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+# これを超えたアップロードはメモリではなく一時ファイルに書く
+SPOOL_MEMORY_BYTES = int(os.getenv("WHISPER_SPOOL_MEMORY_BYTES", str(1024 * 1024)))
+
+# Content-Type -> Whisperに渡すファイル名の拡張子（Whisperは拡張子で形式を判定する）
+_AUDIO_EXTENSIONS = {
+    "audio/webm": "webm",
+    "video/webm": "webm",
+    "audio/ogg": "ogg",
+    "audio/mp4": "mp4",
+    "video/mp4": "mp4",
+    "audio/m4a": "m4a",
+    "audio/x-m4a": "m4a",
+    "audio/aac": "m4a",
+    "audio/mpeg": "mp3",
+    "audio/wav": "wav",
+    "audio/wave": "wav",
+    "audio/x-wav": "wav",
+}
+# Content-Type から形式が分からない場合（application/octet-stream）は、先頭のバイト列で判定する
+_CONTAINER_FORMATS = {
+    "webm": ("webm", "audio/webm"),
+    "ogg": ("ogg", "audio/ogg"),
+    "mp4": ("mp4", "audio/mp4"),
+    "wav": ("wav", "audio/wav"),
+    "mp3": ("mp3", "audio/mpeg"),
+}
+
+
+async def _check_whisper_allowed(user_email: str, duration_seconds: float) -> bool:
+    """使用可能かチェックし（不可なら403）、無料体験中かどうかを返す"""
+    requested_minutes = duration_seconds / 60.0
+    check_result = await usage_service.can_use_whisper(user_email, requested_minutes)
+
+    if not check_result["allowed"]:
+        error_detail = check_result["reason"]
+        if check_result["remaining_minutes"] is not None:
+            error_detail += f" (残り: {check_result['remaining_minutes']:.1f}分)"
+        raise HTTPException(
+            status_code=403,
+            detail=error_detail
+        )
+
+    subscription = await usage_service.get_user_subscription_status(user_email)
+    return subscription["is_trial"]
+
+
+async def _spool_body(request: Request, spool) -> str:
+    """リクエストボディを受信しながら一時ファイルに書き、音声の内容のハッシュを返す"""
+    hasher = AudioHasher()
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail="音声ファイルが大きすぎます（上限25MB）")
+        spool.write(chunk)
+        hasher.update(chunk)
+    if size == 0:
+        raise HTTPException(status_code=400, detail="音声データが空です")
+    return hasher.hexdigest()
+
+
+async def _record_usage(user_email: str, is_trial: bool, result: dict) -> dict:
+    """使用量を記録し、残り分数（無料体験の場合）を付けたレスポンスの内容を返す"""
+    await usage_service.add_whisper_usage(user_email, result["usage_minutes"])
+
+    if is_trial:
+        current_usage = await usage_service.get_whisper_usage_this_month(user_email)
+        result["remaining_minutes"] = 20.0 - current_usage
+
+    return WhisperTranscribeResponse(
+        transcript=result["transcript"],
+        duration_seconds=result["duration_seconds"],
+        usage_minutes=result["usage_minutes"],
+        remaining_minutes=result["remaining_minutes"]
+    ).model_dump()
+
 
 @router.post("/transcribe", response_model=WhisperTranscribeResponse)
 async def transcribe_audio(
     request: WhisperTranscribeRequest,
-    user: dict = Depends(get_current_user)
+    response: Response,
+    user: dict = Depends(get_current_user),
+    idempotency_key_header: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
     """
     音声をWhisper APIで文字起こし
     - 無料体験: 20分まで
     - 有料プラン: 無制限
+    - 同じ録音（または同じ Idempotency-Key）の再送には、前回の結果を使用量を記録せずに返す
     """
     user_email = user.get("email")
-    
+
     if not user_email:
         raise HTTPException(status_code=401, detail="User email not found")
-    
-    try:
-        # 1. 使用可能かチェック
-        requested_minutes = request.duration_seconds / 60.0
-        check_result = await usage_service.can_use_whisper(user_email, requested_minutes)
-        
-        if not check_result["allowed"]:
-            error_detail = check_result["reason"]
-            if check_result["remaining_minutes"] is not None:
-                error_detail += f" (残り: {check_result['remaining_minutes']:.1f}分)"
-            raise HTTPException(
-                status_code=403,
-                detail=error_detail
-            )
-        
-        # 2. サブスクリプション状態を取得
-        subscription = await usage_service.get_user_subscription_status(user_email)
-        is_trial = subscription["is_trial"]
-        
-        # 3. Whisper API呼び出し
+
+    async def _transcribe() -> dict:
+        # 1. 使用可能かチェック・サブスクリプション状態を取得
+        is_trial = await _check_whisper_allowed(user_email, request.duration_seconds)
+
+        # 2. Whisper API呼び出し
         result = await whisper_service.transcribe_audio_with_duration(
             audio_base64=request.audio_data,
             duration_seconds=request.duration_seconds,
             user_email=user_email,
             is_trial=is_trial
         )
-        
-        # 4. 使用量を記録
-        await usage_service.add_whisper_usage(user_email, result["usage_minutes"])
-        
-        # 5. 残り分数を計算（無料体験の場合）
-        if is_trial:
-            current_usage = await usage_service.get_whisper_usage_this_month(user_email)
-            remaining = 20.0 - current_usage
-            result["remaining_minutes"] = remaining
-        
-        # 6. レスポンス返却
-        return WhisperTranscribeResponse(
-            transcript=result["transcript"],
-            duration_seconds=result["duration_seconds"],
-            usage_minutes=result["usage_minutes"],
-            remaining_minutes=result["remaining_minutes"]
-        )
+
+        # 3. 使用量を記録
+        return await _record_usage(user_email, is_trial, result)
+
+    try:
+        audio_hash = None
+        if not idempotency_key_header:
+            hasher = AudioHasher()
+            hasher.update(request.audio_data.encode("ascii", "replace"))
+            audio_hash = hasher.hexdigest()
+        key = idempotency_key(user_email, idempotency_key_header, audio_hash)
+
+        result, replayed = await transcription_results.run(key, _transcribe)
+        if replayed:
+            response.headers["Idempotent-Replayed"] = "true"
+        return WhisperTranscribeResponse(**result)
     except HTTPException:
         raise
     except ValueError as e:
@@ -78,3 +149,96 @@ async def transcribe_audio(
     except Exception as e:
         logger.error(f"Unexpected error in transcribe_audio: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@router.post("/transcribe/stream", response_model=WhisperTranscribeResponse)
+async def transcribe_audio_stream(
+    request: Request,
+    response: Response,
+    duration_seconds: float,
+    session_id: Optional[str] = None,
+    user: dict = Depends(get_current_user),
+    idempotency_key_header: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """
+    音声をWhisper APIで文字起こし（バイナリ版）
+
+    録音データをbase64にせず、リクエストボディそのままで送る（Content-Type: audio/webm など）。
+    duration_seconds（と、ログ用の session_id）はクエリで渡す。
+    Content-Type が application/octet-stream の場合は、音声の先頭のバイト列から形式を判定する。
+    - ボディは受信しながら一時ファイル（WHISPER_SPOOL_MEMORY_BYTES まではメモリ）に書き、
+      そのファイルを少しずつ読みながらWhisper APIへ送る（base64のJSON版のような全体のコピーを作らない）
+    - 同じ録音（または同じ Idempotency-Key）の再送には、前回の結果を使用量を記録せずに返す
+      （Idempotency-Key があれば、利用上限と再送のチェックはボディを受け取る前に行う）
+    """
+    user_email = user.get("email")
+
+    if not user_email:
+        raise HTTPException(status_code=401, detail="User email not found")
+
+    content_type = (request.headers.get("content-type") or "application/octet-stream").split(";")[0].strip().lower()
+    extension = _AUDIO_EXTENSIONS.get(content_type)
+    if extension is None and content_type != "application/octet-stream":
+        raise HTTPException(status_code=415, detail=f"対応していない音声形式です: {content_type}")
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="音声ファイルが大きすぎます（上限25MB）")
+
+    async def _transcribe(spool, is_trial: Optional[bool]) -> dict:
+        if is_trial is None:
+            is_trial = await _check_whisper_allowed(user_email, duration_seconds)
+        spool.seek(0)
+
+        # 課金に使う長さはコンテナのヘッダーから求める（取れなければクライアント申告値とサイズからの推定値の大きい方）
+        container, metered_seconds = metered_duration(spool, duration_seconds)
+
+        file_extension, file_type = extension, content_type
+        if file_extension is None:
+            if container not in _CONTAINER_FORMATS:
+                raise HTTPException(status_code=415, detail="音声形式を判別できませんでした。Content-Type を指定してください")
+            file_extension, file_type = _CONTAINER_FORMATS[container]
+
+        logger.info(
+            f"Calling Whisper API for user: {user_email}, session: {session_id or '-'}, "
+            f"duration: {metered_seconds:.1f}s ({file_type})"
+        )
+        transcript = await whisper_service.transcribe_recording(
+            spool, f"recording.{file_extension}", user_email, content_type=file_type
+        )
+        return await _record_usage(user_email, is_trial, {
+            "transcript": transcript,
+            "duration_seconds": metered_seconds,
+            "usage_minutes": metered_seconds / 60.0,
+            "remaining_minutes": None
+        })
+
+    try:
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES) as spool:
+            if idempotency_key_header:
+                # キーがあれば、ボディを受け取る前に再送かどうかと利用上限を判定できる
+                key = idempotency_key(user_email, idempotency_key_header)
+
+                async def _receive_and_transcribe() -> dict:
+                    is_trial = await _check_whisper_allowed(user_email, duration_seconds)
+                    await _spool_body(request, spool)
+                    return await _transcribe(spool, is_trial)
+
+                result, replayed = await transcription_results.run(key, _receive_and_transcribe)
+            else:
+                # キーがなければ、受信しながら計算した音声のハッシュで再送を判定する
+                audio_hash = await _spool_body(request, spool)
+                key = idempotency_key(user_email, audio_hash=audio_hash)
+                result, replayed = await transcription_results.run(key, lambda: _transcribe(spool, None))
+
+        if replayed:
+            response.headers["Idempotent-Replayed"] = "true"
+        return WhisperTranscribeResponse(**result)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        logger.error(f"Whisper transcription error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Unexpected error in transcribe_audio_stream: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
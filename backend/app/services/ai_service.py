@@ -1,19 +1,190 @@
-from openai import AsyncOpenAI
+from openai import APITimeoutError, AsyncOpenAI
+import asyncio
+import logging
 import os
-from typing import List, Dict, Optional
-import json
+import time
+from typing import List, Dict, Optional, Sequence
+from app.services.llm_hedging import llm_hedger
+from app.services.llm_usage import prompt_cache_stats, structured_output_stats
+from app.services.structured_output import (
+    FEEDBACK_RESPONSE_FORMAT,
+    LESSON_RESPONSE_FORMAT,
+    parse_json_output,
+    validate_items,
+)
+from app.models.schemas import FeedbackItem, LessonOption
+from app.services.model_router import model_router
+
+logger = logging.getLogger(__name__)
+
+_LESSON_SYSTEM_PROMPT = (
+    "You are a professional English education content creator. "
+    "Create one lesson strictly for the learner level specified at the end of the user message. "
+    "Follow the constraints for that level exactly. "
+    "Output valid JSON with 'lessons' key containing a single lesson. "
+    "The lesson.level MUST be the specified level."
+)
+
+# generate_english_lesson の静的プレフィックス（{level_rules} は起動時に一度だけ展開される）
+_LESSON_PROMPT_TEMPLATE = """
+あなたは英会話教材のプロフェッショナルです。
+末尾の日本語ニュースを元に、わかりやすく読みやすい英語教材を1つ作成してください。
+
+【レベル別の制約（最重要）】
+学習者レベルは末尾の「今回の指定」で与えられます（1=初心者 / 2=中級 / 3=上級）。
+指定されたレベルのCEFR目安・文体・語彙・長さに必ず合わせてください。
+{level_rules}
+
+【作成要件】
+レッスンは以下の構成要素を必ず含めてください：
+1. **Header**: 英語タイトル、カテゴリー(News/Sports/Technologyなど)
+2. **Unlocking Word Meanings**: 指定レベルの「語彙」の条件に従う
+   - word, pronunciation (IPA), type (v., n., adj.), definition (英語、わかりやすく), example sentence
+3. **Article**: ニュース記事本文。
+   - 長さ: 指定レベルの「記事の長さ」（3-4段落構成で、わかりやすく簡潔に執筆してください）
+   - レベル: 指定レベルのCEFRに必ず合わせる
+   - 重要: レベル不一致（難しすぎ/易しすぎ）はNG。特に初心者は簡単な語彙・文法のみで書くこと。
+4. **Viewpoint Discussion**:
+   - **Discussion A**: コンテンツの理解に関する質問 (2-3問)
+   - **Discussion B**: 個人的な見解を聞く質問 (2-3問)
+
+【出力形式】
+以下のJSON形式のみを出力してください（必ず "lessons" キーを使用し、リスト内に1つのレッスンオブジェクトを含めてください）。
+```json
+{
+  "lessons": [
+    {
+      "title": "Clear and Simple English Title",
+      "category": "News",
+      "vocabulary": [
+        {
+            "word": "word",
+            "pronunciation": "/.../",
+            "type": "(n.)",
+            "definition": "Clear and precise English definition...",
+            "example": "A natural example sentence using the word..."
+        }
+      ],
+      "content": "Article body...",
+      "discussion_a": ["Q1", "Q2"],
+      "discussion_b": ["Q1", "Q2"],
+      "question": "Main Question to start the discussion",
+      "level": "1 | 2 | 3"
+    }
+  ]
+}
+```
+
+【出力例（レベル2の場合。内容は元記事に合わせて必ず書き換えること）】
+```json
+{
+  "lessons": [
+    {
+      "title": "Small Towns Try On-Demand Buses",
+      "category": "Society",
+      "vocabulary": [
+        {"word": "rural", "pronunciation": "/ˈrʊərəl/", "type": "(adj.)", "definition": "Related to the countryside, not the city.", "example": "Many young people leave rural areas to find work."},
+        {"word": "elderly", "pronunciation": "/ˈeldərli/", "type": "(adj.)", "definition": "Old; used as a polite way to talk about older people.", "example": "The elderly man takes the bus to the hospital."},
+        {"word": "route", "pronunciation": "/ruːt/", "type": "(n.)", "definition": "The way a bus, train, or person travels from one place to another.", "example": "This bus route goes past the station."},
+        {"word": "reservation", "pronunciation": "/ˌrezərˈveɪʃən/", "type": "(n.)", "definition": "An arrangement to have something kept for you.", "example": "You need a reservation to ride the bus."},
+        {"word": "shortage", "pronunciation": "/ˈʃɔːrtɪdʒ/", "type": "(n.)", "definition": "A situation when there is not enough of something.", "example": "There is a shortage of bus drivers."}
+      ],
+      "content": "Several small towns in Japan are starting on-demand bus services. Instead of following a fixed route, the buses pick up passengers who make a reservation by phone or app.\n\nThe towns say the service helps elderly residents who no longer drive. Many of them need to visit hospitals and supermarkets, but regular buses come only a few times a day.\n\nThe new system also responds to a shortage of drivers. Because the buses run only when people need them, the towns can use fewer drivers and smaller vehicles.\n\nSome residents say booking a ride is difficult at first. The towns plan to hold classes to teach people how to use the app.",
+      "discussion_a": ["How is an on-demand bus different from a regular bus?", "Why are the towns starting this service?", "What problem do some residents have with the new system?"],
+      "discussion_b": ["How do you usually travel around your town?", "Would you like to use an on-demand bus? Why or why not?", "What could make public transportation better where you live?"],
+      "question": "How is an on-demand bus different from a regular bus?",
+      "level": "2"
+    }
+  ]
+}
+```
+"""
+
+# analyze_speech の静的プレフィックス（発話内容より前に置く部分は一切変化させないこと）
+_FEEDBACK_PROMPT_PREFIX = """
+あなたは英語学習者向けの高度なフィードバック専門コーチです。
+
+【重要な背景】
+1. 学習者は日本人です。
+2. 音声認識エンジン（STT）を使用しているため、日本人の名前や日本語固有の単語が、響きの似た「誤った英語」として認識されている可能性が非常に高いです。
+   例：「代田（Shirota）」→ 「She wrote a」
+   例：「宗田（Soda）」→ 「Soda (炭酸水)」
+   例：「名前は...（Namae wa）」→ 「No my way」
+3. 解析を行う前に、まず文脈からこのようなSTTの誤認識（特に人名や固有名詞）を特定し、正しい日本人の名前や意図された表現に頭の中で修正してください。
+
+【指示】
+1. 上記の背景を踏まえ、末尾の発話内容について、まず文脈から正しい意図を読み取ってください。
+2. **発話内容を、必ずセンテンス（一文）ごとに分解してください。**
+3. **各センテンスについて、文法エラーやより自然な表現、または音声認識エラー（日本人名など）がないか個別に解析してください。**
+4. 日本人名が誤認識されている場合は、その修正後の文を「corrected_sentence」として提示し、理由（reason）で「音声認識の誤り（人名と思われる）」と指摘してください。
+5. 各センテンスのフィードバックを、以下のJSON形式（"feedback" キーのリスト）で出力してください。
+6. 改善点が全くない文については含める必要はありませんが、少しでも不自然な点があれば積極的に指摘してください。
+7. 理由（reason）は必ず日本語で、初心者が理解しやすいよう具体的に（どこの単語をどう変えたか、なぜその方が良いか）簡潔に説明してください。
+
+【出力形式】
+```json
+{
+  "feedback": [
+    {
+      "original_sentence": "個別の（誤認識された）一文",
+      "corrected_sentence": "その一文の修正後の完璧な文",
+      "category": "Grammar | Vocabulary | Expression | Pronunciation",
+      "reason": "なぜその修正が必要か、具体的かつ簡潔な日本語解説"
+    }
+  ]
+}
+```
+
+【出力例】
+発話内容: 「My name is she wrote a. I live in Osaka since five years. Yesterday I go to the park with my friend and we eat lunch. It was very fun.」
+```json
+{
+  "feedback": [
+    {
+      "original_sentence": "My name is she wrote a.",
+      "corrected_sentence": "My name is Shirota.",
+      "category": "Pronunciation",
+      "reason": "音声認識の誤り（人名と思われる）です。「She wrote a」は日本人の名前「Shirota（代田）」が英語として誤って認識されたものと考えられます。"
+    },
+    {
+      "original_sentence": "I live in Osaka since five years.",
+      "corrected_sentence": "I have lived in Osaka for five years.",
+      "category": "Grammar",
+      "reason": "過去から現在まで続いていることは現在完了形（have lived）で表します。期間を表すときは since ではなく for を使います。"
+    },
+    {
+      "original_sentence": "Yesterday I go to the park with my friend and we eat lunch.",
+      "corrected_sentence": "Yesterday I went to the park with my friend and we ate lunch.",
+      "category": "Grammar",
+      "reason": "Yesterday（昨日）の話なので、go → went、eat → ate と過去形にします。"
+    },
+    {
+      "original_sentence": "It was very fun.",
+      "corrected_sentence": "It was a lot of fun.",
+      "category": "Expression",
+      "reason": "fun は名詞として使うのが自然なので、very fun より a lot of fun の方がネイティブらしい表現です。"
+    }
+  ]
+}
+```
+
+重要: JSONのみを出力し、他の説明は不要です。
+"""
 
 
 class AIService:
     """OpenAI API連携サービス"""
 
+    _lesson_prefix_cache: Optional[str] = None
+
     _LEVEL_MAPPING = {
         1: "A1-A2 (Beginner)",
         2: "B1-B2 (Intermediate)",
         3: "B2-C1 (Advanced)",
     }
 
-    def _level_constraints(self, level: int) -> Dict[str, str]:
+    @staticmethod
+    def _level_constraints(level: int) -> Dict[str, str]:
         """
         難易度に応じた制約を返す（プロンプト用）。
         levelは 1=初心者, 2=中級, 3=上級 を想定。
@@ -51,12 +222,52 @@ class AIService:
         if not api_key:
             self.client = None
         else:
-            self.client = AsyncOpenAI(api_key=api_key)
+            # OPENAI_API_BASE で接続先を差し替え可能（負荷試験用のfake_openai_server.pyなど）
+            # リトライはllm_hedger側でデッドラインを見ながら行うため、SDK内部のリトライは無効化
+            self.client = AsyncOpenAI(api_key=api_key, base_url=os.getenv("OPENAI_API_BASE") or None, max_retries=0)
 
     def _require_client(self) -> AsyncOpenAI:
         if self.client is None:
             raise RuntimeError("OPENAI_API_KEY is not configured")
         return self.client
+
+    async def _create_completion(self, method: str, **kwargs):
+        """
+        chat.completions.create をメソッドごとのレイテンシ予算内で実行
+        （p95超過時のヘッジ・残り時間内でのリトライは llm_hedger が担当）
+        """
+        client = self._require_client()
+        # モデルは model_router がタスクごとの設定と観測レイテンシ/エラー率から選ぶ
+        kwargs.pop("model", None)
+
+        async def _attempt(timeout: float):
+            # 試行ごとに選び直すため、リトライ/ヘッジ時にはフェイルオーバー先が使われる
+            model = model_router.choose(method)
+            started = time.monotonic()
+            try:
+                response = await client.chat.completions.create(model=model, timeout=timeout, **kwargs)
+            except asyncio.CancelledError:
+                elapsed = time.monotonic() - started
+                if elapsed >= timeout:
+                    # 試行自身のデッドラインまで待っても終わらなかった（遅いモデルとしてタイムアウトに数える）
+                    model_router.record(model, elapsed, ok=False, timed_out=True)
+                else:
+                    # ヘッジで負けた・クライアントが切断した試行は、モデルの成否に数えない
+                    model_router.record_cancelled(model)
+                raise
+            except Exception as e:
+                timed_out = isinstance(e, APITimeoutError)
+                model_router.record(model, time.monotonic() - started, ok=False, timed_out=timed_out)
+                raise
+            elapsed = time.monotonic() - started
+            model_router.record(model, elapsed, ok=True)
+            if model != model_router.primary_model(method):
+                logger.info(f"[ModelRouter] {method} served by fallback {model} in {elapsed:.2f}s")
+            return response
+
+        response = await llm_hedger.call(method, _attempt)
+        prompt_cache_stats.record(method, getattr(response, "usage", None))
+        return response
     
     async def generate_question(self, article_content: str, article_title: str = "") -> str:
         """記事に基づいて質問を生成"""
@@ -78,8 +289,8 @@ class AIService:
 """
         
         try:
-            response = await self._require_client().chat.completions.create(
-                model="gpt-4o-mini",
+            response = await self._create_completion(
+                "generate_question",
                 messages=[
                     {"role": "system", "content": "あなたは優秀な英会話コーチです。"},
                     {"role": "user", "content": prompt}
@@ -96,67 +307,42 @@ class AIService:
     
     async def analyze_speech(self, transcript: str) -> List[Dict]:
         """発話内容を解析してフィードバックを生成（一文ごと）"""
-        prompt = f"""
-        あなたは英語学習者向けの高度なフィードバック専門コーチです。
-
-        【重要な背景】
-        1. 学習者は日本人です。
-        2. 音声認識エンジン（STT）を使用しているため、日本人の名前や日本語固有の単語が、響きの似た「誤った英語」として認識されている可能性が非常に高いです。
-           例：「代田（Shirota）」→ 「She wrote a」
-           例：「宗田（Soda）」→ 「Soda (炭酸水)」
-           例：「名前は...（Namae wa）」→ 「No my way」
-        3. 解析を行う前に、まず文脈からこのようなSTTの誤認識（特に人名や固有名詞）を特定し、正しい日本人の名前や意図された表現に頭の中で修正してください。
-
-        【発話内容（未修正のSTTテキスト）】
-        {transcript}
-
-        【指示】
-        1. 上記の背景を踏まえ、まず文脈から正しい意図を読み取ってください。
-        2. **発話内容を、必ずセンテンス（一文）ごとに分解してください。**
-        3. **各センテンスについて、文法エラーやより自然な表現、または音声認識エラー（日本人名など）がないか個別に解析してください。**
-        4. 日本人名が誤認識されている場合は、その修正後の文を「corrected_sentence」として提示し、理由（reason）で「音声認識の誤り（人名と思われる）」と指摘してください。
-        5. 各センテンスのフィードバックを、以下のJSON形式のリストとして出力してください。
-        6. 改善点が全くない文については含める必要はありませんが、少しでも不自然な点があれば積極的に指摘してください。
-        7. 理由（reason）は必ず日本語で、初心者が理解しやすいよう具体的に（どこの単語をどう変えたか、なぜその方が良いか）簡潔に説明してください。
-
-        【出力形式】
-        ```json
-        [
-          {{
-            "original_sentence": "個別の（誤認識された）一文",
-            "corrected_sentence": "その一文の修正後の完璧な文",
-            "category": "Grammar | Vocabulary | Expression | Pronunciation",
-            "reason": "なぜその修正が必要か、具体的かつ簡潔な日本語解説"
-          }}
-        ]
-        ```
-
-        重要: JSONのみを出力し、他の説明は不要です。
-        """
+        # 静的な指示を先頭に、可変の発話内容を末尾に置く（プロンプトのプレフィックスキャッシュを効かせるため）
+        prompt = f"""{_FEEDBACK_PROMPT_PREFIX}
+【発話内容（未修正のSTTテキスト）】
+{transcript}
+"""
         
         try:
-            response = await self._require_client().chat.completions.create(
-                model="gpt-4o-mini",
+            response = await self._create_completion(
+                "analyze_speech",
                 messages=[
                     {"role": "system", "content": "You are a professional English coach. Output only raw JSON."},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.3,
-                response_format={ "type": "json_object" }
+                # FeedbackItem に合わせたスキーマで出力を制約する
+                response_format=FEEDBACK_RESPONSE_FORMAT
             )
             
             content = response.choices[0].message.content.strip()
-            
-            try:
-                data = json.loads(content)
-                if isinstance(data, dict):
-                    for key in ["feedback", "feedback_items", "sentences", "items"]:
-                        if key in data and isinstance(data[key], list):
-                            return data[key]
-                return data if isinstance(data, list) else []
-            except json.JSONDecodeError:
+            data, outcome = parse_json_output(content, "analyze_speech")
+            if data is None:
+                structured_output_stats.record("analyze_speech", outcome)
                 print(f"JSON parse error in feedback: {content}")
                 return []
+
+            items = []
+            if isinstance(data, dict):
+                for key in ["feedback", "feedback_items", "sentences", "items"]:
+                    if key in data and isinstance(data[key], list):
+                        items = data[key]
+                        break
+            elif isinstance(data, list):
+                items = data
+            feedback = validate_items(FeedbackItem, items, defaults={"session_id": ""})
+            structured_output_stats.record("analyze_speech", outcome, dropped_items=len(items) - len(feedback))
+            return feedback
                 
         except Exception as e:
             print(f"Error analyzing speech: {e}")
@@ -172,8 +358,8 @@ class AIService:
 """
         
         try:
-            response = await self._require_client().chat.completions.create(
-                model="gpt-4o-mini",
+            response = await self._create_completion(
+                "summarize_article",
                 messages=[
                     {"role": "system", "content": "あなたは要約の専門家です。"},
                     {"role": "user", "content": prompt}
@@ -209,85 +395,93 @@ class AIService:
                 }
             ]
         """
-        from datetime import datetime
-        today_str = datetime.now().strftime("Posted %B %d, %Y")
+        request = self.build_lesson_request(japanese_content, japanese_title, level)
+        print(f"[Backend] AI Prompt constructed (first 200 chars): {request['messages'][-1]['content'][:200]}...")
 
-        level_str = self._LEVEL_MAPPING.get(level, "B1-B2 (Intermediate)")
-        c = self._level_constraints(level)
+        response = await self._create_completion("generate_english_lesson", **request)
 
-        prompt = f"""
-あなたは英会話教材のプロフェッショナルです。
-以下の日本語ニュースを元に、わかりやすく読みやすい英語教材を1つ作成してください。
+        content = response.choices[0].message.content.strip()
+        print(f"[Backend] AI Raw Response (first 200 chars): {content[:200]}...")
+        return self.parse_lesson_response(content, japanese_title, level)
 
-【難易度指定（最重要）】
-- 学習者レベル: {level}（1=初心者 / 2=中級 / 3=上級）
-- CEFR目安: {c["cefr"]}（必ずこのレベルに合わせること）
-- 文体: {c["style"]}
+    async def generate_lesson_variants(
+        self,
+        japanese_content: str,
+        japanese_title: str,
+        levels: Sequence[int] = (1, 2, 3),
+    ) -> Dict[int, List[Dict]]:
+        """
+        1つの記事から複数レベルのレッスンを並行生成
+        一部のレベルが失敗しても他のレベルの結果は返す（失敗したレベルは空リスト）
+        """
+        results = await asyncio.gather(
+            *[self.generate_english_lesson(japanese_content, japanese_title, level=level) for level in levels],
+            return_exceptions=True,
+        )
+        variants: Dict[int, List[Dict]] = {}
+        for level, result in zip(levels, results):
+            if isinstance(result, BaseException):
+                print(f"[Backend] Lesson generation failed for level {level}: {result}")
+                variants[level] = []
+            else:
+                variants[level] = result
+        return variants
+
+    def build_lesson_request(self, japanese_content: str, japanese_title: str, level: int = 2) -> Dict:
+        """
+        レッスン生成用の chat.completions リクエストパラメータを組み立てる
+        （バッチファイル出力でも同じリクエストを使うため分離）
+        """
+        c = self._level_constraints(level)
+
+        # 静的な指示・JSONスキーマを先頭に、レベル指定と元記事を末尾に置く
+        # （日付などの可変値を先頭に入れるとプロンプトのプレフィックスキャッシュが効かなくなる）
+        prompt = f"""{self._lesson_prompt_prefix()}
+【今回の指定】
+- 学習者レベル: {level}（CEFR {c["cefr"]}）。上記「レベル別の制約」のレベル{level}に必ず従うこと
+- 出力JSONの "level" は必ず "{level}" とすること
 
 【元記事（日本語）】
 タイトル: {japanese_title}
 内容: {japanese_content}
-
-【作成要件】
-レッスンは以下の構成要素を必ず含めてください：
-1. **Header**: 英語タイトル、日付({today_str})、カテゴリー(News/Sports/Technologyなど)
-2. **Unlocking Word Meanings**: {c["vocab"]}
-   - word, pronunciation (IPA), type (v., n., adj.), definition (英語、わかりやすく), example sentence
-3. **Article**: ニュース記事本文。
-   - 長さ: **{c["article_words"]}**（3-4段落構成で、わかりやすく簡潔に執筆してください）
-   - レベル: CEFR {c["cefr"]} に必ず合わせる
-   - 重要: レベル不一致（難しすぎ/易しすぎ）はNG。特に初心者は簡単な語彙・文法のみで書くこと。
-4. **Viewpoint Discussion**:
-   - **Discussion A**: コンテンツの理解に関する質問 (2-3問)
-   - **Discussion B**: 個人的な見解を聞く質問 (2-3問)
-
-【出力形式】
-以下のJSON形式のみを出力してください（必ず "lessons" キーを使用し、リスト内に1つのレッスンオブジェクトを含めてください）。
-```json
-{{
-  "lessons": [
-    {{
-                    "title": "Clear and Simple English Title",
-      "date": "{today_str}",
-      "category": "News",
-      "vocabulary": [
-        {{
-            "word": "word",
-            "pronunciation": "/.../",
-            "type": "(n.)",
-            "definition": "Clear and precise English definition...",
-            "example": "A natural example sentence using the word..."
-        }}
-      ],
-      "content": "Article body...",
-      "discussion_a": ["Q1", "Q2"],
-      "discussion_b": ["Q1", "Q2"],
-      "question": "Main Question to start the discussion",
-      "level": "{level}"
-    }}
-  ]
-}}
-```
 """
-        print(f"[Backend] AI Prompt constructed (first 200 chars): {prompt[:200]}...")
-        
-        response = await self._require_client().chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": f"You are a professional English education content creator. Create one lesson strictly for learner level {level} (CEFR {c['cefr']}). Follow constraints exactly. Output valid JSON with 'lessons' key containing a single lesson. The lesson.level MUST be '{level}'."},
+        return {
+            "model": model_router.primary_model("generate_english_lesson"),
+            "messages": [
+                {"role": "system", "content": _LESSON_SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
-            temperature=0.7,
-            max_tokens=2500,
-            response_format={ "type": "json_object" }
-        )
-        
-        content = response.choices[0].message.content.strip()
-        print(f"[Backend] AI Raw Response (first 200 chars): {content[:200]}...")
-        
+            "temperature": 0.7,
+            "max_tokens": 2500,
+            # LessonOption に合わせたスキーマで出力を制約する（date/japanese_titleはパース後に付与）
+            "response_format": LESSON_RESPONSE_FORMAT,
+        }
+
+    @classmethod
+    def _lesson_prompt_prefix(cls) -> str:
+        """レッスン生成プロンプトの静的プレフィックス（全レベル共通・プロセス内でキャッシュ）"""
+        if cls._lesson_prefix_cache is None:
+            level_rules = []
+            for level in (1, 2, 3):
+                c = cls._level_constraints(level)
+                level_rules.append(
+                    f"- レベル{level}（CEFR {c['cefr']}）\n"
+                    f"  - 文体: {c['style']}\n"
+                    f"  - 語彙: {c['vocab']}\n"
+                    f"  - 記事の長さ: {c['article_words']}"
+                )
+            cls._lesson_prefix_cache = _LESSON_PROMPT_TEMPLATE.replace("{level_rules}", "\n".join(level_rules))
+        return cls._lesson_prefix_cache
+
+    def parse_lesson_response(self, content: str, japanese_title: str, level: int = 2) -> List[Dict]:
+        """レッスン生成のレスポンス（JSON文字列）をレッスンのリストに変換"""
         try:
-            data = json.loads(content)
-            print(f"[Backend] JSON parsed successfully. Keys: {data.keys()}")
+            # 途中で切れた/軽微に壊れたJSONはローカルで修復し、再生成のコストを払わない
+            data, outcome = parse_json_output(content, "generate_english_lesson")
+            if data is None:
+                structured_output_stats.record("generate_english_lesson", outcome)
+                return []
+            print(f"[Backend] JSON parsed ({outcome}). Type: {type(data).__name__}")
             lessons = []
             
             if isinstance(data, dict):
@@ -298,31 +492,71 @@ class AIService:
             
             if not lessons:
                 print("[Backend] No lessons found in parsed data")
+                structured_output_stats.record("generate_english_lesson", "failed")
                 return []
 
             # メタデータ付与
             final_lessons = []
+            # 日付はプロンプトに含めずここで付与する（プレフィックスキャッシュのため）
+            from datetime import datetime
+            today_str = datetime.now().strftime("Posted %B %d, %Y")
+
             for lesson in lessons:
+                if not isinstance(lesson, dict):
+                    continue
                 lesson["japanese_title"] = japanese_title
+                lesson["date"] = today_str
                 # UI/Notion用: levelは必ず 1/2/3 の文字列に正規化
                 lesson["level"] = str(level)
                 if "question" not in lesson and "discussion_a" in lesson and lesson["discussion_a"]:
                     lesson["question"] = lesson["discussion_a"][0]
                 final_lessons.append(lesson)
+
+            valid_lessons = validate_items(LessonOption, final_lessons)
+            structured_output_stats.record(
+                "generate_english_lesson", outcome, dropped_items=len(final_lessons) - len(valid_lessons)
+            )
+            return valid_lessons
             
-            return final_lessons
-            
-        except json.JSONDecodeError as je:
-            print(f"[Backend] JSON Decode Error: {je}")
-            return []
         except Exception as e:
             print(f"[Backend] Unexpected error after AI completion: {e}")
             import traceback
             traceback.print_exc()
             return []
 
-    async def chat_response(self, message: str, history: List[Dict]) -> str:
-        """英会話コーチとしてのレスポンスを生成（文脈重視）"""
+    async def summarize_conversation(self, previous_summary: str, messages: List[Dict]) -> str:
+        """
+        会話のローリング要約を更新
+        previous_summary に messages（古いターン）の内容を畳み込んだ要約を返す
+        """
+        transcript = "\n".join(f"{m.get('role', 'user')}: {m.get('content', '')}" for m in messages)
+        prompt = f"""
+Update the running summary of an English tutoring chat between a Japanese learner (user) and a tutor (assistant).
+Keep facts the learner shared about themselves, topics discussed, and recurring mistakes the tutor pointed out.
+Write at most 120 words in English. Output only the updated summary.
+
+Current summary:
+{previous_summary or "(none)"}
+
+New turns to fold in:
+{transcript}
+"""
+        response = await self._create_completion(
+            "summarize_conversation",
+            messages=[
+                {"role": "system", "content": "You maintain concise conversation summaries."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.3,
+            max_tokens=250
+        )
+        return response.choices[0].message.content.strip()
+
+    async def chat_response(self, message: str, history: List[Dict], summary: Optional[str] = None) -> str:
+        """
+        英会話コーチとしてのレスポンスを生成（文脈重視）
+        summary が指定された場合は、それ以前の会話の要約として文脈に含める
+        """
         system_prompt = """
 You are a friendly and encouraging native English tutor. Your goals are:
 1. Conduct natural, engaging conversations in English.
@@ -336,6 +570,8 @@ Context: The user is a Japanese learner. You should focus on being supportive an
         messages = [
             {"role": "system", "content": system_prompt}
         ]
+        if summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
         
         # 履歴を追加（直近10件程度）
         for msg in history[-10:]:
@@ -345,8 +581,8 @@ Context: The user is a Japanese learner. You should focus on being supportive an
         messages.append({"role": "user", "content": message})
         
         try:
-            response = await self._require_client().chat.completions.create(
-                model="gpt-4o-mini",
+            response = await self._create_completion(
+                "chat_response",
                 messages=messages,
                 temperature=0.7
             )
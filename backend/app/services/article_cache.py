@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Set, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+# 同じ記事を指すURLの揺れを吸収するため、キャッシュキーから除くクエリパラメータ
+_TRACKING_PARAMS = {"fbclid", "gclid", "yclid", "ref", "cmpid", "at_medium", "at_campaign"}
+
+
+def canonical_url(url: str) -> str:
+    """キャッシュキー用にURLを正規化（スキーム/ホストの小文字化・既定ポート・フラグメント・トラッキング用クエリの除去）"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and not ((scheme == "http" and parts.port == 80) or (scheme == "https" and parts.port == 443)):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in _TRACKING_PARAMS
+    ))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+class FetchResult:
+    """ローダーの取得結果（抽出済みの記事と、条件付きGET用のバリデータ）"""
+
+    def __init__(
+        self,
+        article: Dict[str, str],
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        cacheable: bool = True,
+    ):
+        self.article = article
+        self.etag = etag
+        self.last_modified = last_modified
+        self.cacheable = cacheable
+
+
+# ローダーが 304 Not Modified を受け取ったことを示す
+NOT_MODIFIED = object()
+
+# ローダーは条件付きGET用のヘッダーを受け取り、FetchResult / NOT_MODIFIED / None（取得失敗）を返す
+Loader = Callable[[Dict[str, str]], Awaitable[Union[FetchResult, object, None]]]
+
+
+class _Entry:
+    def __init__(self, result: FetchResult):
+        self.article = result.article
+        self.etag = result.etag
+        self.last_modified = result.last_modified
+        self.fetched_at = time.monotonic()
+        self.size = sum(len(str(v).encode("utf-8")) for v in self.article.values())
+
+    def validators(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ArticleCache:
+    """
+    URLをキーにした記事キャッシュ（抽出済みのタイトル・本文 + ETag/Last-Modified）
+
+    - TTL以内: キャッシュをそのまま返す
+    - TTL超過〜max_stale以内: キャッシュを返しつつ、裏で条件付きGETにより再検証する（stale-while-revalidate）
+    - max_stale超過・未取得: 取得を待つ（同じURLへの同時取得は1回にまとめる）
+    - エントリ数とバイト数の上限を超えたら最も使われていないものから破棄する（LRU）
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = float(os.getenv("ARTICLE_CACHE_TTL_SECONDS", "600")),
+        max_stale_seconds: float = float(os.getenv("ARTICLE_CACHE_MAX_STALE_SECONDS", "86400")),
+        max_entries: int = int(os.getenv("ARTICLE_CACHE_MAX_ENTRIES", "500")),
+        max_bytes: int = int(os.getenv("ARTICLE_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._background: Set[asyncio.Task] = set()
+        self._stats = {
+            "hits": 0, "stale_hits": 0, "misses": 0,
+            "revalidations": 0, "not_modified": 0, "evictions": 0,
+        }
+
+    async def fetch(self, namespace: str, url: str, loader: Loader) -> Optional[Dict[str, str]]:
+        """
+        キャッシュ経由で記事を取得
+        namespace は抽出方法ごとの区別（NewsService と ArticleService で抽出結果が異なるため）
+        """
+        key = f"{namespace}:{canonical_url(url)}"
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry.fetched_at
+            if age <= self.ttl_seconds:
+                self._stats["hits"] += 1
+                self._entries.move_to_end(key)
+                return dict(entry.article)
+            if age <= self.ttl_seconds + self.max_stale_seconds:
+                self._stats["stale_hits"] += 1
+                self._entries.move_to_end(key)
+                self._revalidate_in_background(key, loader)
+                return dict(entry.article)
+
+        self._stats["misses"] += 1
+        article = await self._load(key, loader)
+        return dict(article) if article else None
+
+    def _revalidate_in_background(self, key: str, loader: Loader):
+        if key in self._inflight:
+            return
+        task = asyncio.ensure_future(self._load(key, loader))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _load(self, key: str, loader: Loader) -> Optional[Dict[str, str]]:
+        inflight = self._inflight.get(key)
+        if inflight is None:
+            inflight = asyncio.ensure_future(self._load_once(key, loader))
+            self._inflight[key] = inflight
+            inflight.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # 1人がリクエストを中断しても他の待機者・キャッシュ更新のための取得は続ける
+        return await asyncio.shield(inflight)
+
+    async def _load_once(self, key: str, loader: Loader) -> Optional[Dict[str, str]]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._stats["revalidations"] += 1
+        try:
+            result = await loader(entry.validators() if entry else {})
+        except Exception as e:
+            logger.warning(f"[ArticleCache] load failed for {key}: {e}")
+            result = None
+
+        if result is NOT_MODIFIED and entry is not None:
+            self._stats["not_modified"] += 1
+            entry.fetched_at = time.monotonic()
+            return entry.article
+        if isinstance(result, FetchResult):
+            if result.cacheable:
+                self._store(key, result)
+            return result.article
+        # 取得に失敗した場合、古いキャッシュがあればそれを使い続ける
+        return entry.article if entry is not None else None
+
+    def _store(self, key: str, result: FetchResult):
+        new_entry = _Entry(result)
+        if new_entry.size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.size
+        self._entries[key] = new_entry
+        self._bytes += new_entry.size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self._stats["evictions"] += 1
+
+    def snapshot(self) -> Dict:
+        """/health 表示用"""
+        return {**self._stats, "entries": len(self._entries), "bytes": self._bytes}
+
+
+# NewsService / ArticleService が共有するプロセス全体のキャッシュ
+article_cache = ArticleCache()
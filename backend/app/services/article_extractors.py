@@ -0,0 +1,460 @@
+import logging
+import os
+import re
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+from urllib.parse import urlparse
+
+import httpx
+from lxml import etree
+
+from app.services.circuit_breaker import DomainCircuitBreaker, domain_breaker
+from app.services.parse_pool import parse_pool
+
+logger = logging.getLogger(__name__)
+
+# 本文抽出時に中身ごと除外する要素
+_NOISE_TAGS = {"script", "style", "noscript", "template", "svg", "nav", "footer", "aside", "form", "button", "figure", "iframe"}
+# パース中に中身を捨ててメモリを節約する要素（本文には使わないが巨大になりがち）
+_DISCARD_TAGS = {"script", "style", "noscript", "template", "svg"}
+
+# 全角スペース（\u3000）は日本語の見出しで意味を持つため残す
+_WS = re.compile(r"[ \t\r\n\f\v]+")
+
+
+def _text(el) -> str:
+    return _WS.sub(" ", "".join(el.itertext())).strip()
+
+
+def _remove(el):
+    """要素を取り除く（後ろに続くテキスト tail は残す）"""
+    parent = el.getparent()
+    if parent is None:
+        return
+    if el.tail:
+        prev = el.getprevious()
+        if prev is not None:
+            prev.tail = (prev.tail or "") + el.tail
+        else:
+            parent.text = (parent.text or "") + el.tail
+    parent.remove(el)
+
+
+def _classes(el) -> List[str]:
+    return (el.get("class") or "").split()
+
+
+class ContainerRule:
+    """本文コンテナの判定ルール（タグ名・class・id・任意属性の組み合わせ）"""
+
+    def __init__(self, tag: Optional[str] = None, cls: Optional[str] = None, id: Optional[str] = None, attr: Optional[Dict[str, str]] = None):
+        self.tag = tag
+        self.cls = cls
+        self.id = id
+        self.attr = attr or {}
+
+    def matches(self, el) -> bool:
+        if self.tag and el.tag != self.tag:
+            return False
+        if self.cls and self.cls not in _classes(el):
+            return False
+        if self.id and el.get("id") != self.id:
+            return False
+        return all(el.get(k) == v for k, v in self.attr.items())
+
+
+class Extraction:
+    """抽出結果（タイトルと本文の段落リスト）"""
+
+    def __init__(self, title: str, paragraphs: List[str], extractor: str):
+        self.title = title
+        self.paragraphs = paragraphs
+        self.extractor = extractor
+
+    def text(self, separator: str = "\n") -> str:
+        return separator.join(self.paragraphs)
+
+
+class SiteExtractor:
+    """
+    ドメインごとの本文抽出ルール
+
+    containers: 本文コンテナのルール（優先順。広いコンテナの中により優先度の高いものがあればそちらを使う）
+    title_rules: タイトル要素のルール（一致しなければ最初の <h1>、og:title、<title> の順）
+    paragraph_xpath: コンテナ内の段落を取り出すXPath
+    """
+
+    name = "site"
+    domains: Sequence[str] = ()
+    containers: Sequence[ContainerRule] = ()
+    title_rules: Sequence[ContainerRule] = ()
+    paragraph_xpath = ".//p"
+
+    def container_rank(self, el) -> Optional[int]:
+        """本文コンテナのルールに一致すれば優先順位（小さいほど優先）を返す"""
+        for rank, rule in enumerate(self.containers):
+            if rule.matches(el):
+                return rank
+        return None
+
+    def is_title(self, el) -> bool:
+        return any(rule.matches(el) for rule in self.title_rules)
+
+    def paragraphs(self, container) -> List[str]:
+        for noise in list(container.iter(*_NOISE_TAGS)):
+            if noise is not container:
+                _remove(noise)
+        paragraphs = [t for t in (_text(p) for p in container.xpath(self.paragraph_xpath)) if t]
+        if not paragraphs and self.paragraph_xpath != ".//p":
+            paragraphs = [t for t in (_text(p) for p in container.xpath(".//p")) if t]
+        if not paragraphs:
+            # <p> を使わないページ: テキストを行単位で拾う
+            paragraphs = [line.strip() for line in "\n".join(container.itertext()).split("\n") if line.strip()]
+        return paragraphs
+
+
+class MainichiExtractor(SiteExtractor):
+    name = "mainichi"
+    domains = ("mainichi.jp",)
+    containers = (
+        ContainerRule("section", id="articledetail-body"),
+        ContainerRule(cls="articledetail-body"),
+        ContainerRule("section", cls="main-text"),
+        ContainerRule("div", cls="main-text"),
+        ContainerRule("div", id="main-text"),
+        ContainerRule("div", cls="article-body"),
+    )
+    title_rules = (ContainerRule("h1", cls="title-page"),)
+
+
+class NhkExtractor(SiteExtractor):
+    name = "nhk"
+    domains = ("nhk.or.jp",)
+    containers = (
+        ContainerRule("section", cls="content--detail-body"),
+        ContainerRule("div", cls="content--detail-body"),
+        ContainerRule("div", cls="article-body"),
+        ContainerRule("article"),
+    )
+    title_rules = (ContainerRule("h1", cls="content--title"),)
+    # リード文は <p> ではなく div.content--summary に入っている
+    paragraph_xpath = ".//div[contains(@class, 'content--summary')] | .//p"
+
+
+class BbcExtractor(SiteExtractor):
+    name = "bbc"
+    domains = ("bbc.com", "bbc.co.uk")
+    containers = (ContainerRule("article"), ContainerRule("main", id="main-content"))
+    title_rules = (ContainerRule("h1", id="main-heading"),)
+    # 関連記事・キャプション等を除き、本文ブロックの段落のみ
+    paragraph_xpath = ".//div[@data-component='text-block']//p"
+
+
+class RareJobExtractor(SiteExtractor):
+    name = "rarejob"
+    domains = ("rarejob.com",)
+    containers = (
+        ContainerRule("div", cls="article-body"),
+        ContainerRule("div", cls="article_body"),
+        ContainerRule("article"),
+        ContainerRule("main"),
+        ContainerRule("div", cls="content"),
+    )
+
+
+_POSITIVE = re.compile(r"article|body|content|entry|main|post|story|text", re.I)
+_NEGATIVE = re.compile(r"ad-|banner|comment|footer|header|menu|nav|promo|related|share|sidebar|social|sponsor|widget", re.I)
+
+
+class ReadabilityExtractor(SiteExtractor):
+    """
+    未登録ドメイン用の汎用抽出（readability風のスコアリング）
+    段落の文字数・読点の数で親要素に加点し、class/idとリンク密度で補正して最も本文らしい要素を選ぶ
+    """
+
+    name = "readability"
+
+    def best_container(self, root):
+        scores: Dict = {}
+        for p in root.iter("p"):
+            text = _text(p)
+            if len(text) < 25:
+                continue
+            score = 1 + text.count(",") + text.count("、") + text.count("。") + min(len(text) / 100, 3)
+            parent = p.getparent()
+            if parent is None:
+                continue
+            scores[parent] = scores.get(parent, 0) + score
+            grandparent = parent.getparent()
+            if grandparent is not None:
+                scores[grandparent] = scores.get(grandparent, 0) + score / 2
+
+        best, best_score = None, 0.0
+        for el, score in scores.items():
+            hint = f"{el.get('class', '')} {el.get('id', '')}"
+            if _POSITIVE.search(hint):
+                score += 25
+            if _NEGATIVE.search(hint):
+                score -= 25
+            text_len = len(_text(el)) or 1
+            link_len = sum(len(_text(a)) for a in el.iter("a"))
+            score *= 1 - min(link_len / text_len, 1)
+            if score > best_score:
+                best, best_score = el, score
+        return best
+
+    def paragraphs(self, container) -> List[str]:
+        return [p for p in super().paragraphs(container) if len(p) >= 20]
+
+
+_REGISTRY: List[SiteExtractor] = []
+_FALLBACK = ReadabilityExtractor()
+
+
+def register_extractor(extractor: SiteExtractor):
+    """ドメイン別の抽出ルールを登録（後から登録したものを優先）"""
+    _REGISTRY.insert(0, extractor)
+
+
+def extractor_for(url: str) -> SiteExtractor:
+    host = (urlparse(url).hostname or "").lower()
+    for extractor in _REGISTRY:
+        if any(host == d or host.endswith("." + d) for d in extractor.domains):
+            return extractor
+    return _FALLBACK
+
+
+for _extractor in (MainichiExtractor(), NhkExtractor(), BbcExtractor(), RareJobExtractor()):
+    register_extractor(_extractor)
+
+
+class ArticleParser:
+    """
+    lxmlのプル型パーサーでHTMLを逐次パースし、本文コンテナが閉じた時点で抽出を終える
+
+    - feed() は本文コンテナが閉じたら True を返す（以降のHTMLは読まなくてよい）
+    - script/style などはパース中に中身を捨ててメモリを抑える
+    - サイト別ルールで本文が見つからなければ、close() 時に汎用抽出にフォールバックする
+    """
+
+    def __init__(self, url: str, encoding: Optional[str] = None, extractor: Optional[SiteExtractor] = None):
+        self.extractor = extractor or extractor_for(url)
+        self._parser = etree.HTMLPullParser(events=("start", "end"), encoding=encoding, remove_comments=True)
+        self._container = None
+        self._container_rank = 0
+        self._title: Optional[str] = None
+        self._first_h1: Optional[str] = None
+        self._og_title: Optional[str] = None
+        self._page_title: Optional[str] = None
+        self._paragraphs: Optional[List[str]] = None
+        self.done = False
+
+    def feed(self, data: Union[str, bytes]) -> bool:
+        if self.done:
+            return True
+        self._parser.feed(data)
+        self._consume()
+        return self.done
+
+    def _consume(self):
+        for event, el in self._parser.read_events():
+            if not isinstance(el.tag, str):
+                continue
+            if event == "start":
+                rank = self.extractor.container_rank(el)
+                # 開いているコンテナの内側で、より優先度の高いルールに一致したら乗り換える
+                if rank is not None and (self._container is None or rank < self._container_rank):
+                    self._container = el
+                    self._container_rank = rank
+                continue
+
+            tag = el.tag
+            if tag == "h1":
+                if self._title is None and self.extractor.is_title(el):
+                    self._title = _text(el)
+                elif self._first_h1 is None:
+                    self._first_h1 = _text(el)
+            elif tag == "title" and self._page_title is None:
+                self._page_title = _text(el)
+            elif tag == "meta" and el.get("property") == "og:title" and self._og_title is None:
+                self._og_title = (el.get("content") or "").strip()
+            elif tag in _DISCARD_TAGS:
+                el.clear(keep_tail=True)
+
+            if el is self._container:
+                self._paragraphs = self.extractor.paragraphs(el)
+                self.done = True
+                return
+
+    def close(self) -> Optional[Extraction]:
+        """抽出結果を返す（本文が見つからなければ None）"""
+        extractor_name = self.extractor.name
+        if not self.done:
+            try:
+                root = self._parser.close()
+            except etree.XMLSyntaxError:
+                root = None
+            self._consume()
+            if self._paragraphs is None and root is not None:
+                container = _FALLBACK.best_container(root)
+                if container is not None:
+                    self._paragraphs = _FALLBACK.paragraphs(container)
+                    extractor_name = _FALLBACK.name
+        if not self._paragraphs:
+            return None
+        title = self._title or self._first_h1 or self._og_title or self._page_title or ""
+        return Extraction(title, self._paragraphs, extractor_name)
+
+
+_CHUNK_SIZE = 64 * 1024
+
+
+def extract_article(url: str, html: Union[str, bytes], encoding: Optional[str] = None) -> Optional[Extraction]:
+    """
+    HTMLから本文を抽出（ドメイン別ルール → 汎用抽出）
+    チャンクごとに流し込み、本文コンテナが閉じたら残り（関連記事・フッター・末尾のscript等）はパースしない
+    """
+    parser = ArticleParser(url, encoding=encoding if isinstance(html, bytes) else None)
+    for start in range(0, len(html), _CHUNK_SIZE):
+        if parser.feed(html[start:start + _CHUNK_SIZE]):
+            break
+    return parser.close()
+
+
+def find_links(html: Union[str, bytes], xpaths: Sequence[str]) -> List[str]:
+    """トップページ等からリンクを抽出（最初に結果が得られたXPathの href を返す）"""
+    root = etree.fromstring(html, etree.HTMLParser(remove_comments=True)) if html else None
+    if root is None:
+        return []
+    for xpath in xpaths:
+        # 要素への参照を持つ lxml の文字列型ではなく、素の str にして返す
+        hrefs = [str(h) for h in root.xpath(xpath) if isinstance(h, str) and h]
+        if hrefs:
+            return hrefs
+    return []
+
+
+class DownloadStats:
+    """ストリーミング取得の統計（読んだバイト数・本文終了での打ち切り・上限到達）"""
+
+    def __init__(self):
+        self._stats = {"pages": 0, "bytes_read": 0, "early_stops": 0, "capped": 0, "content_length_total": 0}
+
+    def record(self, bytes_read: int, early_stop: bool, capped: bool, content_length: Optional[int]):
+        self._stats["pages"] += 1
+        self._stats["bytes_read"] += bytes_read
+        self._stats["early_stops"] += int(early_stop)
+        self._stats["capped"] += int(capped)
+        if content_length:
+            self._stats["content_length_total"] += content_length
+
+    def snapshot(self) -> Dict:
+        """/health 表示用"""
+        pages = self._stats["pages"]
+        return {
+            **self._stats,
+            "avg_kb_read": round(self._stats["bytes_read"] / pages / 1024, 1) if pages else 0.0,
+        }
+
+
+download_stats = DownloadStats()
+
+# 1ページあたりに読む本文の上限（展開後のバイト数）
+MAX_ARTICLE_BYTES = int(os.getenv("ARTICLE_MAX_BYTES", str(3 * 1024 * 1024)))
+
+
+async def fetch_and_extract(
+    http,
+    url: str,
+    *,
+    headers: Dict[str, str],
+    timeout: Optional[float] = None,
+    follow_redirects: bool = True,
+    max_bytes: Optional[int] = None,
+    breaker: Optional[DomainCircuitBreaker] = domain_breaker,
+) -> Tuple[httpx.Response, Optional[Extraction]]:
+    """
+    記事ページをストリーミングで取得しながら逐次パースする
+
+    - 本文コンテナが閉じた時点で残りのダウンロードを打ち切る
+    - max_bytes（既定 ARTICLE_MAX_BYTES）を超えたら打ち切り、それまでの内容で抽出する
+    - 200以外のレスポンスは本文を読まずに (response, None) を返す（304/403の判定は呼び出し側）
+    - ドメインのブレーカーが開いていればリクエストを送らず CircuitOpenError。
+      403・タイムアウト・空の抽出は失敗、304と本文の取れた200は成功としてブレーカーに記録する
+    """
+    if breaker is not None:
+        breaker.acquire(url)
+    try:
+        response, extraction = await _stream_extract(http, url, headers, timeout, follow_redirects, max_bytes)
+    except httpx.TimeoutException:
+        if breaker is not None:
+            breaker.record_failure(url, "timeout")
+        raise
+    except BaseException:
+        if breaker is not None:
+            breaker.release(url)
+        raise
+
+    if breaker is not None:
+        if response.status_code == 304 or (response.status_code == 200 and extraction is not None):
+            breaker.record_success(url)
+        elif response.status_code == 403:
+            breaker.record_failure(url, "403")
+        elif response.status_code == 200:
+            breaker.record_failure(url, "empty")
+        else:
+            breaker.release(url)
+    return response, extraction
+
+
+async def _stream_extract(
+    http,
+    url: str,
+    headers: Dict[str, str],
+    timeout: Optional[float],
+    follow_redirects: bool,
+    max_bytes: Optional[int],
+) -> Tuple[httpx.Response, Optional[Extraction]]:
+    max_bytes = max_bytes or MAX_ARTICLE_BYTES
+    kwargs = {"headers": headers, "follow_redirects": follow_redirects}
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+
+    async with http.stream("GET", url, **kwargs) as response:
+        if response.status_code != 200:
+            return response, None
+
+        # Content-Type に charset があればそれを使い、なければ <meta charset> から lxml に判定させる
+        # 逐次パーサーの作成・feed・close は同じスレッド（レーン）で行う
+        lane = parse_pool.lane()
+        parser = await parse_pool.run(ArticleParser, url, response.charset_encoding, lane=lane)
+        bytes_read = 0
+        capped = False
+        # パースはスレッドプールで実行する。受信チャンクは細かいため _CHUNK_SIZE までまとめてから渡す
+        pending: List[bytes] = []
+        pending_size = 0
+        async for chunk in response.aiter_bytes():
+            bytes_read += len(chunk)
+            pending.append(chunk)
+            pending_size += len(chunk)
+            capped = bytes_read >= max_bytes
+            if pending_size < _CHUNK_SIZE and not capped:
+                continue
+            done = await parse_pool.run(parser.feed, b"".join(pending), lane=lane)
+            pending, pending_size = [], 0
+            if done:
+                break
+            if capped:
+                logger.info(f"[Extract] {url}: reached {max_bytes} bytes, extracting from partial page")
+                break
+        if pending:
+            await parse_pool.run(parser.feed, b"".join(pending), lane=lane)
+        capped = capped and not parser.done
+
+        content_length = response.headers.get("content-length")
+        download_stats.record(
+            bytes_read,
+            early_stop=parser.done,
+            capped=capped,
+            content_length=int(content_length) if content_length and content_length.isdigit() else None,
+        )
+        return response, await parse_pool.run(parser.close, lane=lane)
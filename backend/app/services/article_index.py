@@ -0,0 +1,179 @@
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data", "articles.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    source TEXT NOT NULL,
+    category TEXT NOT NULL DEFAULT '',
+    title TEXT NOT NULL,
+    content TEXT NOT NULL,
+    published_at REAL NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_articles_published ON articles(published_at);
+CREATE INDEX IF NOT EXISTS idx_articles_category ON articles(category, published_at);
+
+-- 日本語は単語区切りがないため trigram トークナイザで全文検索する
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+    title, content, content='articles', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS articles_ai AFTER INSERT ON articles BEGIN
+    INSERT INTO articles_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_ad AFTER DELETE ON articles BEGIN
+    INSERT INTO articles_fts(articles_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+END;
+"""
+
+
+class ArticleIndex:
+    """
+    RSSポーラーが先読みした記事のローカル索引（SQLite + FTS5）
+
+    ソース・カテゴリー・公開日時・抽出済み本文を保持し、
+    レッスン生成時にカテゴリーと新しさで絞り込んだ記事を即座に返す。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("ARTICLE_INDEX_PATH") or _DEFAULT_PATH
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        # 初回利用時に接続（import時にファイルを作らないため）
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def has(self, url: str) -> bool:
+        with self._lock:
+            row = self._connection().execute("SELECT 1 FROM articles WHERE url = ?", (url,)).fetchone()
+        return row is not None
+
+    def add(
+        self,
+        *,
+        url: str,
+        source: str,
+        category: str,
+        title: str,
+        content: str,
+        published_at: Optional[float] = None,
+    ) -> bool:
+        """記事を追加（同じURLが既にあれば何もしない）。追加したら True"""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO articles (url, source, category, title, content, published_at, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, source, category or "", title, content, published_at or now, now),
+            )
+            conn.commit()
+        return cur.rowcount > 0
+
+    def pick(
+        self,
+        *,
+        category: Optional[str] = None,
+        max_age_hours: Optional[float] = None,
+        query: Optional[str] = None,
+        exclude_urls: Optional[List[str]] = None,
+        candidates: int = 10,
+    ) -> Optional[Dict[str, str]]:
+        """
+        条件に合う新しい記事の中からランダムに1件返す
+        （毎回同じ記事にならないよう、新しい順の上位 candidates 件から選ぶ）
+        """
+        rows = self.search(
+            category=category,
+            max_age_hours=max_age_hours,
+            query=query,
+            exclude_urls=exclude_urls,
+            limit=candidates,
+        )
+        return random.choice(rows) if rows else None
+
+    def search(
+        self,
+        *,
+        category: Optional[str] = None,
+        max_age_hours: Optional[float] = None,
+        query: Optional[str] = None,
+        exclude_urls: Optional[List[str]] = None,
+        limit: int = 20,
+    ) -> List[Dict[str, str]]:
+        where, params = [], []
+        if category:
+            where.append("a.category = ?")
+            params.append(category)
+        if max_age_hours:
+            where.append("a.published_at >= ?")
+            params.append(time.time() - max_age_hours * 3600)
+        if exclude_urls:
+            where.append(f"a.url NOT IN ({','.join('?' * len(exclude_urls))})")
+            params.extend(exclude_urls)
+        if query:
+            where.append("a.id IN (SELECT rowid FROM articles_fts WHERE articles_fts MATCH ?)")
+            # trigram はフレーズとして扱う（記号でクエリ構文エラーにならないよう引用符で囲む）
+            params.append('"' + query.replace('"', '""') + '"')
+
+        sql = "SELECT a.url, a.source, a.category, a.title, a.content, a.published_at FROM articles a"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY a.published_at DESC LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._connection().execute(sql, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def prune(self, max_age_days: float) -> int:
+        """古い記事を削除。削除件数を返す"""
+        with self._lock:
+            conn = self._connection()
+            cur = conn.execute("DELETE FROM articles WHERE published_at < ?", (time.time() - max_age_days * 86400,))
+            conn.commit()
+        return cur.rowcount
+
+    def stats(self) -> Dict:
+        """/health 表示用（ソース・カテゴリーごとの件数）"""
+        with self._lock:
+            conn = self._connection()
+            total = conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+            by_source = dict(conn.execute("SELECT source, COUNT(*) FROM articles GROUP BY source").fetchall())
+            by_category = dict(conn.execute("SELECT category, COUNT(*) FROM articles GROUP BY category").fetchall())
+            newest = conn.execute("SELECT MAX(published_at) FROM articles").fetchone()[0]
+        return {
+            "articles": total,
+            "by_source": by_source,
+            "by_category": by_category,
+            "newest_age_hours": round((time.time() - newest) / 3600, 1) if newest else None,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# RSSポーラーとNewsServiceが共有する索引
+article_index = ArticleIndex()
@@ -1,52 +1,61 @@
 import httpx
-from bs4 import BeautifulSoup
-from typing import Optional, Dict
+from typing import Optional, Dict, Union
+
+from app.services.article_extractors import fetch_and_extract, find_links
+from app.services.article_cache import NOT_MODIFIED, FetchResult, article_cache
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.http_client import SharedHttpClient, shared_http_client
+from app.services.parse_pool import parse_pool
 
 
 class ArticleService:
     """RareJob DNA記事取得サービス"""
+
+    def __init__(self, http: Optional[SharedHttpClient] = None):
+        # 接続プールはアプリ全体で共有する（lifespanで生成・破棄）
+        self.http = http or shared_http_client
     
     async def fetch_article(self, url: str) -> Optional[Dict[str, str]]:
         """
         指定されたURLから記事を取得
+        同じURLの記事はキャッシュから返し、TTL経過後は条件付きGETで再検証する
         
         Returns:
             Dict with keys: title, content, url
         """
+        return await article_cache.fetch("article", url, lambda validators: self._download_article(url, validators))
+
+    async def _download_article(self, url: str, validators: Dict[str, str]) -> Union[FetchResult, object, None]:
+        """記事をダウンロードして抽出（validators があれば条件付きGET、304なら NOT_MODIFIED）"""
         headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+            **validators,
         }
         try:
-            async with httpx.AsyncClient(verify=False, headers=headers) as client:
-                response = await client.get(url, timeout=10.0)
-                response.raise_for_status()
-
-
-                
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # タイトル取得（サイト構造に応じて調整が必要）
-                title_tag = soup.find('h1') or soup.find('title')
-                title = title_tag.get_text(strip=True) if title_tag else "記事タイトル"
-                
-                # 本文取得（一般的なarticleタグやmainタグを探す）
-                article_tag = soup.find('article') or soup.find('main') or soup.find('div', class_='content')
-                
-                if article_tag:
-                    # 段落を取得
-                    paragraphs = article_tag.find_all('p')
-                    content = '\n\n'.join([p.get_text(strip=True) for p in paragraphs if p.get_text(strip=True)])
-                else:
-                    # フォールバック: すべての段落を取得
-                    paragraphs = soup.find_all('p')
-                    content = '\n\n'.join([p.get_text(strip=True) for p in paragraphs[:10] if p.get_text(strip=True)])
-                
-                return {
+            # 本文コンテナが閉じたら残りはダウンロードしない（サイズ上限付きのストリーミング取得）
+            response, extraction = await fetch_and_extract(self.http, url, headers=headers, timeout=10.0)
+            if response.status_code == 304:
+                return NOT_MODIFIED
+            response.raise_for_status()
+            
+            title = (extraction.title if extraction else "") or "記事タイトル"
+            content = extraction.text("\n\n") if extraction else ""
+            
+            return FetchResult(
+                {
                     "title": title,
                     "content": content if content else "記事の内容を取得できませんでした。",
                     "url": url
-                }
+                },
+                etag=response.headers.get("etag"),
+                last_modified=response.headers.get("last-modified"),
+                # 本文が取れなかった結果はキャッシュしない
+                cacheable=bool(content),
+            )
         
+        except CircuitOpenError as e:
+            print(f"Skipped fetching article: {e}")
+            return None
         except httpx.HTTPError as e:
             print(f"HTTP error fetching article: {e}")
             return None
@@ -62,23 +71,20 @@ class ArticleService:
         base_url = "https://www.rarejob.com/dna/"
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(base_url, timeout=10.0)
-                response.raise_for_status()
-                
-                soup = BeautifulSoup(response.text, 'html.parser')
+            response = await self.http.get(base_url, timeout=10.0)
+            response.raise_for_status()
+            
+            # 最新記事のリンクを探す（サイト構造に応じて調整）
+            links = await parse_pool.run(find_links, response.content, ["//a[contains(concat(' ', @class, ' '), ' article-link ')]/@href"])  # 例: クラス名は要調整
+            
+            if links:
+                article_url = links[0]
+                if not article_url.startswith('http'):
+                    article_url = base_url + article_url.lstrip('/')
                 
-                # 最新記事のリンクを探す（サイト構造に応じて調整）
-                article_link = soup.find('a', class_='article-link')  # 例: クラス名は要調整
-                
-                if article_link and article_link.get('href'):
-                    article_url = article_link['href']
-                    if not article_url.startswith('http'):
-                        article_url = base_url + article_url.lstrip('/')
-                    
-                    return await self.fetch_article(article_url)
-                
-                return None
+                return await self.fetch_article(article_url)
+            
+            return None
         
         except Exception as e:
             print(f"Error getting latest article: {e}")
@@ -0,0 +1,591 @@
+import logging
+import os
+import struct
+import time
+from typing import BinaryIO, Dict, Iterator, NamedTuple, Optional, Tuple
+
+from app.services.llm_hedging import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+# 末尾から探す範囲（見つからなければ倍にして MAX_TAIL_BYTES まで広げる）
+TAIL_BYTES = 64 * 1024
+MAX_TAIL_BYTES = 4 * 1024 * 1024
+HEAD_BYTES = 16 * 1024
+# moov / moof をまるごと読む上限（通常は数KB〜数百KB）
+MAX_BOX_BYTES = 16 * 1024 * 1024
+# これより長い値はヘッダーが壊れているとみなす
+MAX_SECONDS = 6 * 3600
+
+
+class AudioProbeError(ValueError):
+    """コンテナのヘッダーが壊れている・想定外の形式"""
+
+
+def detect_container(head: bytes) -> Optional[str]:
+    """先頭のバイト列からコンテナ形式を判定する（webm / ogg / mp4 / wav / mp3）"""
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return "webm"
+    if head[:4] == b"OggS":
+        return "ogg"
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "wav"
+    if head[4:8] in (b"ftyp", b"moov", b"mdat", b"free", b"wide", b"skip"):
+        return "mp4"
+    if head[:3] == b"ID3" or (len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0 and head[1] & 0x06):
+        # ID3タグ、またはMPEGオーディオのフレーム同期（layer が 0 のADTSは除く）
+        return "mp3"
+    return None
+
+
+def _file_size(f: BinaryIO) -> int:
+    f.seek(0, os.SEEK_END)
+    return f.tell()
+
+
+def _read_at(f: BinaryIO, offset: int, size: int) -> bytes:
+    f.seek(offset)
+    return f.read(size)
+
+
+# ---------------------------------------------------------------- WAV
+
+
+class WavFormat(NamedTuple):
+    format_tag: int  # 1: PCM, 3: IEEE float, 0xFFFE: WAVE_FORMAT_EXTENSIBLE
+    channels: int
+    sample_rate: int
+    byte_rate: int
+    block_align: int
+    bits_per_sample: int
+    data_offset: int
+    data_size: int
+
+
+def wav_format(f: BinaryIO, size: Optional[int] = None) -> Optional[WavFormat]:
+    """WAVの fmt チャンクの内容と data チャンクの位置・サイズ（WAVでなければ None）"""
+    size = _file_size(f) if size is None else size
+    if detect_container(_read_at(f, 0, 12)) != "wav":
+        return None
+    pos = 12
+    fmt = None
+    while pos + 8 <= size:
+        header = _read_at(f, pos, 8)
+        if len(header) < 8:
+            break
+        chunk_id, chunk_size = header[:4], struct.unpack("<I", header[4:])[0]
+        if chunk_id == b"fmt ":
+            fmt = _read_at(f, pos + 8, 16)
+            if len(fmt) < 16:
+                raise AudioProbeError("truncated fmt chunk")
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise AudioProbeError("data chunk before fmt chunk")
+            available = size - (pos + 8)
+            # 録音しながら書いたWAVはサイズ欄が 0 / 0xFFFFFFFF のままのことがある
+            if chunk_size == 0 or chunk_size == 0xFFFFFFFF or chunk_size > available:
+                chunk_size = available
+            return WavFormat(*struct.unpack("<HHIIHH", fmt), pos + 8, chunk_size)
+        pos += 8 + chunk_size + (chunk_size & 1)
+    return None
+
+
+def _wav_duration(f: BinaryIO, size: int) -> Optional[float]:
+    wav = wav_format(f, size)
+    if wav is None:
+        return None
+    if not wav.byte_rate:
+        raise AudioProbeError("invalid byte rate")
+    return wav.data_size / wav.byte_rate
+
+
+# ---------------------------------------------------------------- Ogg
+
+_OGG_HEADER = struct.Struct("<4sBBqIIIB")
+
+
+def _ogg_page(buf: bytes, pos: int) -> Optional[Tuple[int, int, int]]:
+    """(granule, serial, ページ全体の長さ) を返す（ページとして不正なら None）"""
+    if pos + _OGG_HEADER.size > len(buf):
+        return None
+    capture, version, _, granule, serial, _, _, segments = _OGG_HEADER.unpack_from(buf, pos)
+    if capture != b"OggS" or version != 0:
+        return None
+    lacing_end = pos + _OGG_HEADER.size + segments
+    if lacing_end > len(buf):
+        return None
+    return granule, serial, _OGG_HEADER.size + segments + sum(buf[pos + _OGG_HEADER.size:lacing_end])
+
+
+def _ogg_duration(f: BinaryIO, size: int) -> Optional[float]:
+    head = _read_at(f, 0, min(size, 4096))
+    page = _ogg_page(head, 0)
+    if page is None:
+        raise AudioProbeError("invalid first Ogg page")
+    _, serial, _ = page
+    packet = head[_OGG_HEADER.size + head[_OGG_HEADER.size - 1]:]
+    if packet[:8] == b"OpusHead":
+        # Opusのgranuleは常に48kHz単位。先頭の pre_skip サンプルは再生されない
+        rate, pre_skip = 48000, struct.unpack("<H", packet[10:12])[0]
+    elif packet[:7] == b"\x01vorbis":
+        rate, pre_skip = struct.unpack("<I", packet[12:16])[0], 0
+    else:
+        raise AudioProbeError("unsupported Ogg codec")
+
+    # 最後のページの granule（最後のサンプル位置）を末尾から探す
+    tail_size = TAIL_BYTES
+    while True:
+        start = max(0, size - tail_size)
+        tail = _read_at(f, start, size - start)
+        pos = tail.rfind(b"OggS")
+        while pos >= 0:
+            page = _ogg_page(tail, pos)
+            if page is not None and page[1] == serial and page[0] >= 0:
+                return max(0, page[0] - pre_skip) / rate
+            pos = tail.rfind(b"OggS", 0, pos)
+        if start == 0 or tail_size >= MAX_TAIL_BYTES:
+            return None
+        tail_size *= 2
+
+
+# ---------------------------------------------------------------- WebM / Matroska
+
+_EBML = 0x1A45DFA3
+_SEGMENT = 0x18538067
+_INFO = 0x1549A966
+_TIMECODE_SCALE = 0x2AD7B1
+_DURATION = 0x4489
+_TRACKS = 0x1654AE6B
+_TRACK_ENTRY = 0xAE
+_CODEC_ID = 0x86
+_CLUSTER = 0x1F43B675
+_CLUSTER_ID_BYTES = b"\x1f\x43\xb6\x75"
+_TIMECODE = 0xE7
+_SIMPLE_BLOCK = 0xA3
+_BLOCK_GROUP = 0xA0
+_BLOCK = 0xA1
+_BLOCK_DURATION = 0x9B
+
+
+def _vint(buf: bytes, pos: int, keep_marker: bool = False) -> Tuple[Optional[int], int]:
+    """EBMLの可変長整数 (値, バイト数)。サイズが「不明」（全ビット1）なら値は None"""
+    if pos >= len(buf):
+        raise AudioProbeError("truncated EBML element")
+    first = buf[pos]
+    if first == 0:
+        raise AudioProbeError("invalid EBML vint")
+    length = 9 - first.bit_length()
+    if pos + length > len(buf):
+        raise AudioProbeError("truncated EBML element")
+    value = first if keep_marker else first & ((1 << (8 - length)) - 1)
+    for b in buf[pos + 1:pos + length]:
+        value = (value << 8) | b
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        return None, length
+    return value, length
+
+
+def _elements(buf: bytes, pos: int, end: int) -> Iterator[Tuple[int, int, Optional[int]]]:
+    """buf[pos:end] の子要素を (ID, データ開始位置, サイズ) で順に返す"""
+    while pos < end:
+        element_id, id_len = _vint(buf, pos, keep_marker=True)
+        size, size_len = _vint(buf, pos + id_len)
+        data = pos + id_len + size_len
+        yield element_id, data, size
+        if size is None:
+            return
+        pos = data + size
+
+
+def _uint(buf: bytes, pos: int, size: int) -> int:
+    return int.from_bytes(buf[pos:pos + size], "big")
+
+
+def _opus_packet_ms(packet: bytes) -> float:
+    """OpusパケットのTOCバイトから、デコードせずにパケットの長さ（ms）を求める"""
+    if not packet:
+        return 0.0
+    config = packet[0] >> 3
+    if config < 12:
+        frame_ms = (10, 20, 40, 60)[config % 4]
+    elif config < 16:
+        frame_ms = (10, 20)[config % 2]
+    else:
+        frame_ms = (2.5, 5, 10, 20)[config % 4]
+    code = packet[0] & 0x03
+    if code == 0:
+        frames = 1
+    elif code in (1, 2):
+        frames = 2
+    else:
+        frames = packet[1] & 0x3F if len(packet) > 1 else 1
+    return frame_ms * frames
+
+
+def _last_block(buf: bytes, pos: int, end: int, opus: bool) -> Optional[Tuple[int, Optional[int], bytes]]:
+    """
+    クラスター内で最も遅いブロックの (クラスターからの相対タイムコード, BlockDuration, Opusパケット)
+    """
+    latest = None
+    try:
+        for element_id, data, size in _elements(buf, pos, end):
+            if size is None or data + size > end:
+                break  # 末尾が途中で切れている（録音中に送られた）ブロック
+            if element_id == _CLUSTER:
+                break
+            block, block_size, duration = None, 0, None
+            if element_id == _SIMPLE_BLOCK:
+                block, block_size = data, size
+            elif element_id == _BLOCK_GROUP:
+                for child_id, child_data, child_size in _elements(buf, data, data + size):
+                    if child_id == _BLOCK:
+                        block, block_size = child_data, child_size
+                    elif child_id == _BLOCK_DURATION:
+                        duration = _uint(buf, child_data, child_size)
+            if block is None:
+                continue
+            _, track_len = _vint(buf, block)
+            relative = struct.unpack(">h", buf[block + track_len:block + track_len + 2])[0]
+            if latest is None or relative >= latest[0]:
+                # ブロックの中身は track番号, 相対タイムコード(2), フラグ(1) の後ろ
+                latest = (relative, duration, buf[block + track_len + 3:block + block_size] if opus else b"")
+    except AudioProbeError:
+        pass
+    return latest
+
+
+def _webm_duration(f: BinaryIO, size: int) -> Optional[float]:
+    head = _read_at(f, 0, min(size, HEAD_BYTES))
+    header_id, header_data, header_size = next(_elements(head, 0, len(head)))
+    if header_id != _EBML or header_size is None:
+        raise AudioProbeError("missing EBML header")
+    segment_id, segment, _ = next(_elements(head, header_data + header_size, len(head)))
+    if segment_id != _SEGMENT:
+        raise AudioProbeError("missing Segment")
+
+    timecode_scale = 1_000_000  # ns
+    duration = None
+    opus = False
+    first_cluster = 0
+    try:
+        for element_id, data, element_size in _elements(head, segment, len(head)):
+            if element_id == _CLUSTER:
+                for child_id, child_data, child_size in _elements(head, data, len(head)):
+                    if child_id == _TIMECODE:
+                        first_cluster = _uint(head, child_data, child_size)
+                    break
+                break
+            if element_size is None:
+                break
+            if element_id == _INFO:
+                for child_id, child_data, child_size in _elements(head, data, data + element_size):
+                    if child_id == _TIMECODE_SCALE:
+                        timecode_scale = _uint(head, child_data, child_size)
+                    elif child_id == _DURATION:
+                        fmt = ">f" if child_size == 4 else ">d"
+                        duration = struct.unpack(fmt, head[child_data:child_data + child_size])[0]
+            elif element_id == _TRACKS:
+                for entry_id, entry_data, entry_size in _elements(head, data, data + element_size):
+                    if entry_id != _TRACK_ENTRY or entry_size is None:
+                        continue
+                    for child_id, child_data, child_size in _elements(head, entry_data, entry_data + entry_size):
+                        if child_id == _CODEC_ID:
+                            opus = head[child_data:child_data + child_size].rstrip(b"\x00") == b"A_OPUS"
+    except AudioProbeError:
+        pass  # ヘッダーの後ろが HEAD_BYTES で切れている
+
+    if duration:
+        return duration * timecode_scale / 1e9
+
+    # MediaRecorderのWebMはDurationを書かないため、最後のクラスターの
+    # タイムコード + その中の最後のブロックの相対タイムコード + そのブロックの長さ を終了時刻とする
+    tail_size = TAIL_BYTES
+    while True:
+        start = max(0, size - tail_size)
+        tail = _read_at(f, start, size - start)
+        pos = tail.rfind(_CLUSTER_ID_BYTES)
+        while pos >= 0:
+            try:
+                cluster_size, size_len = _vint(tail, pos + 4)
+                body = pos + 4 + size_len
+                end = len(tail) if cluster_size is None else min(len(tail), body + cluster_size)
+                child_id, child_data, child_size = next(_elements(tail, body, end))
+                if child_id == _TIMECODE and child_size and child_size <= 8:
+                    cluster_timecode = _uint(tail, child_data, child_size)
+                    last = _last_block(tail, child_data + child_size, end, opus)
+                    if last is not None:
+                        relative, block_duration, packet = last
+                        end_ms = (cluster_timecode + relative - first_cluster) * timecode_scale / 1e6
+                        if block_duration is not None:
+                            end_ms += block_duration * timecode_scale / 1e6
+                        elif opus:
+                            end_ms += _opus_packet_ms(packet)
+                        return max(0.0, end_ms / 1000)
+            except (AudioProbeError, StopIteration, struct.error):
+                pass  # 音声データ中の偶然の一致
+            pos = tail.rfind(_CLUSTER_ID_BYTES, 0, pos)
+        if start == 0 or tail_size >= MAX_TAIL_BYTES:
+            return None
+        tail_size *= 2
+
+
+# ---------------------------------------------------------------- MP4 / M4A
+
+
+def _boxes(buf: bytes, pos: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """buf[pos:end] の子ボックスを (種類, データ開始位置, データ終了位置) で返す"""
+    while pos + 8 <= end:
+        box_size, box_type = struct.unpack(">I4s", buf[pos:pos + 8])
+        header = 8
+        if box_size == 1:
+            box_size = struct.unpack(">Q", buf[pos + 8:pos + 16])[0]
+            header = 16
+        elif box_size == 0:
+            box_size = end - pos
+        if box_size < header:
+            raise AudioProbeError("invalid MP4 box size")
+        yield box_type, pos + header, min(end, pos + box_size)
+        pos += box_size
+
+
+def _top_level_boxes(f: BinaryIO, size: int) -> Iterator[Tuple[bytes, int, int]]:
+    """ファイルの最上位ボックスを、ヘッダーだけ読んで (種類, データ開始位置, データ終了位置) で返す"""
+    pos = 0
+    while pos + 8 <= size:
+        header = _read_at(f, pos, 16)
+        box_size, box_type = struct.unpack(">I4s", header[:8])
+        header_size = 8
+        if box_size == 1:
+            box_size = struct.unpack(">Q", header[8:16])[0]
+            header_size = 16
+        elif box_size == 0:
+            box_size = size - pos
+        if box_size < header_size:
+            raise AudioProbeError("invalid MP4 box size")
+        yield box_type, pos + header_size, min(size, pos + box_size)
+        pos += box_size
+
+
+def _full_box_times(buf: bytes, pos: int) -> Tuple[int, int]:
+    """mvhd / mdhd の (timescale, duration)"""
+    version = buf[pos]
+    if version == 1:
+        return struct.unpack(">IQ", buf[pos + 20:pos + 32])
+    return struct.unpack(">II", buf[pos + 12:pos + 20])
+
+
+def _child(buf: bytes, pos: int, end: int, *path: bytes) -> Optional[Tuple[int, int]]:
+    for box_type, data, box_end in _boxes(buf, pos, end):
+        if box_type == path[0]:
+            return (data, box_end) if len(path) == 1 else _child(buf, data, box_end, *path[1:])
+    return None
+
+
+def _mp4_fragment_end(moof: bytes, default_duration: int) -> Optional[Tuple[int, bool]]:
+    """
+    moof の最初のトラックについて (断片の終了時刻, tfdtがあるか) を返す（トラックのtimescale単位）
+    tfdt がなければ終了時刻ではなく断片の長さ
+    """
+    traf = _child(moof, 0, len(moof), b"traf")
+    if traf is None:
+        return None
+    base_time, total = None, 0
+    for box_type, data, _ in _boxes(moof, *traf):
+        flags = int.from_bytes(moof[data + 1:data + 4], "big")
+        if box_type == b"tfhd":
+            offset = data + 8  # version/flags + track_ID
+            offset += 8 if flags & 0x01 else 0
+            offset += 4 if flags & 0x02 else 0
+            if flags & 0x08:
+                default_duration = struct.unpack(">I", moof[offset:offset + 4])[0]
+        elif box_type == b"tfdt":
+            fmt, width = (">Q", 8) if moof[data] == 1 else (">I", 4)
+            base_time = struct.unpack(fmt, moof[data + 4:data + 4 + width])[0]
+        elif box_type == b"trun":
+            count = struct.unpack(">I", moof[data + 4:data + 8])[0]
+            offset = data + 8
+            offset += 4 if flags & 0x01 else 0
+            offset += 4 if flags & 0x04 else 0
+            if flags & 0x100:
+                stride = 4 * bin(flags & 0xF00).count("1")
+                for i in range(count):
+                    total += struct.unpack(">I", moof[offset + i * stride:offset + i * stride + 4])[0]
+            else:
+                total += count * default_duration
+    if base_time is None:
+        return total, False
+    return base_time + total, True
+
+
+def _last_moof(f: BinaryIO, size: int) -> Optional[bytes]:
+    """ファイル末尾から最後の moof を探して中身を返す"""
+    tail_size = TAIL_BYTES
+    while True:
+        start = max(0, size - tail_size)
+        tail = _read_at(f, start, size - start)
+        pos = tail.rfind(b"moof")
+        while pos >= 4:
+            box_size = struct.unpack(">I", tail[pos - 4:pos])[0]
+            box_start = start + pos - 4
+            # mdat中の偶然の一致でないことを、サイズと先頭の子ボックス（mfhd）で確かめる
+            if 16 <= box_size <= min(MAX_BOX_BYTES, size - box_start) and tail[pos + 8:pos + 12] == b"mfhd":
+                return _read_at(f, box_start + 8, box_size - 8)
+            pos = tail.rfind(b"moof", 0, pos)
+        if start == 0 or tail_size >= MAX_TAIL_BYTES:
+            return None
+        tail_size *= 2
+
+
+def _mp4_duration(f: BinaryIO, size: int) -> Optional[float]:
+    moov = next(((data, end) for box_type, data, end in _top_level_boxes(f, size) if box_type == b"moov"), None)
+    if moov is None:
+        raise AudioProbeError("missing moov")
+    if moov[1] - moov[0] > MAX_BOX_BYTES:
+        raise AudioProbeError("moov too large")
+    buf = _read_at(f, moov[0], moov[1] - moov[0])
+
+    mvhd = _child(buf, 0, len(buf), b"mvhd")
+    if mvhd is None:
+        raise AudioProbeError("missing mvhd")
+    movie_scale, movie_duration = _full_box_times(buf, mvhd[0])
+    if movie_scale and movie_duration and movie_duration not in (0xFFFFFFFF, 0xFFFFFFFFFFFFFFFF):
+        return movie_duration / movie_scale
+
+    # 断片化MP4（SafariのMediaRecorderなど）はmvhdのdurationが0
+    mehd = _child(buf, 0, len(buf), b"mvex", b"mehd")
+    if mehd is not None and movie_scale:
+        fmt, width = (">Q", 8) if buf[mehd[0]] == 1 else (">I", 4)
+        fragment_duration = struct.unpack(fmt, buf[mehd[0] + 4:mehd[0] + 4 + width])[0]
+        if fragment_duration:
+            return fragment_duration / movie_scale
+
+    mdhd = _child(buf, 0, len(buf), b"trak", b"mdia", b"mdhd")
+    track_scale = _full_box_times(buf, mdhd[0])[0] if mdhd else movie_scale
+    if not track_scale:
+        return None
+    trex = _child(buf, 0, len(buf), b"mvex", b"trex")
+    default_duration = struct.unpack(">I", buf[trex[0] + 12:trex[0] + 16])[0] if trex else 0
+
+    # 最後の moof に tfdt（断片の開始時刻）があれば、その断片の終わりが全体の長さ
+    last = _last_moof(f, size)
+    fragment = _mp4_fragment_end(last, default_duration) if last is not None else None
+    if fragment is not None and fragment[1]:
+        return fragment[0] / track_scale
+
+    # tfdt がなければ全部の断片の長さを足す
+    total, found = 0, False
+    for box_type, data, end in _top_level_boxes(f, size):
+        if box_type != b"moof" or end - data > MAX_BOX_BYTES:
+            continue
+        fragment = _mp4_fragment_end(_read_at(f, data, end - data), default_duration)
+        if fragment is not None:
+            total += fragment[0]
+            found = True
+    return total / track_scale if found else None
+
+
+_PROBES = {"wav": _wav_duration, "ogg": _ogg_duration, "webm": _webm_duration, "mp4": _mp4_duration}
+
+
+def probe_audio(f: BinaryIO) -> Tuple[Optional[str], Optional[float]]:
+    """
+    音声ファイルの (コンテナ形式, 長さ（秒）) をヘッダーと末尾だけ読んで求める（音声はデコードしない）
+    判定できなければ長さは None。ファイル位置は先頭に戻す
+    """
+    position = f.tell()
+    try:
+        size = _file_size(f)
+        container = detect_container(_read_at(f, 0, 16))
+        probe = _PROBES.get(container)
+        if probe is None:
+            # 判定できない形式・長さを読まない形式（mp3）
+            return container, None
+        try:
+            seconds = probe(f, size)
+        except (ValueError, OverflowError, struct.error, IndexError, StopIteration) as e:
+            logger.info(f"[AudioProbe] {container} duration not found: {e}")
+            return container, None
+        if seconds is not None and not 0 <= seconds <= MAX_SECONDS:
+            # 壊れたヘッダーの値は課金に使わない
+            logger.info(f"[AudioProbe] {container} duration out of range: {seconds}")
+            return container, None
+        return container, seconds
+    finally:
+        f.seek(position)
+
+
+class AudioProbeStats:
+    """/health 表示用：サーバー側で測った長さとクライアント申告値の比較"""
+
+    def __init__(self):
+        # 長さが取れなかった場合: クライアント申告値で課金した回数 / サイズからの推定値で課金した回数
+        self._stats: Dict[str, int] = {
+            "probed": 0, "fallback_to_client": 0, "fallback_to_estimate": 0, "client_mismatch": 0,
+        }
+        self._containers: Dict[str, int] = {}
+        self._probe_time = LatencyTracker(window=500)
+
+    def record(self, container: Optional[str], seconds: Optional[float], client_seconds: float, elapsed: float):
+        self._probe_time.record(elapsed)
+        key = container or "unknown"
+        self._containers[key] = self._containers.get(key, 0) + 1
+        if seconds is None:
+            return
+        self._stats["probed"] += 1
+        if client_seconds and abs(seconds - client_seconds) > max(1.0, 0.1 * seconds):
+            self._stats["client_mismatch"] += 1
+
+    def count(self, key: str):
+        self._stats[key] += 1
+
+    def snapshot(self) -> Dict:
+        p95 = self._probe_time.percentile(95)
+        return {
+            **self._stats,
+            "containers": dict(self._containers),
+            "probe_ms_p95": round(p95 * 1000, 3) if p95 is not None else None,
+        }
+
+
+audio_probe_stats = AudioProbeStats()
+
+
+# 長さが取れなかった場合に、ファイルサイズから長さを推定するビットレート（kbps）。
+# 話し声の録音として低めの値にして、実際より短く推定しない（申告値を0にして無料で文字起こしさせない）
+_FALLBACK_KBPS = {"wav": 128, "mp3": 64, "mp4": 48, "webm": 24, "ogg": 24}
+_FALLBACK_DEFAULT_KBPS = 24
+
+
+def estimated_duration(size: int, container: Optional[str]) -> float:
+    """ファイルサイズと低めのビットレートから推定した長さ（秒）"""
+    kbps = _FALLBACK_KBPS.get(container, _FALLBACK_DEFAULT_KBPS)
+    return min(MAX_SECONDS, size * 8 / (kbps * 1000))
+
+
+def metered_duration(f: BinaryIO, client_seconds: float) -> Tuple[Optional[str], float]:
+    """
+    課金に使う音声の長さ（秒）
+    コンテナから長さが取れればその値、取れなければクライアント申告値とサイズからの推定値の大きい方を使う
+    """
+    started = time.perf_counter()
+    container, seconds = probe_audio(f)
+    audio_probe_stats.record(container, seconds, client_seconds, time.perf_counter() - started)
+    if seconds is None:
+        client_seconds = max(0.0, client_seconds)
+        position = f.tell()
+        try:
+            estimate = estimated_duration(_file_size(f), container)
+        finally:
+            f.seek(position)
+        if estimate > client_seconds:
+            audio_probe_stats.count("fallback_to_estimate")
+            logger.info(
+                f"[AudioProbe] {container or 'unknown'} duration not found; billing size estimate "
+                f"{estimate:.1f}s instead of client-reported {client_seconds:.1f}s"
+            )
+            return container, estimate
+        audio_probe_stats.count("fallback_to_client")
+        return container, client_seconds
+    if client_seconds and abs(seconds - client_seconds) > max(1.0, 0.1 * seconds):
+        logger.info(f"[AudioProbe] client reported {client_seconds:.1f}s, {container} header says {seconds:.1f}s")
+    return container, seconds
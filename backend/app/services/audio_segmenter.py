@@ -0,0 +1,224 @@
+import io
+import logging
+import os
+import struct
+import threading
+import time
+from typing import BinaryIO, Dict, List, Optional
+
+import numpy as np
+
+from app.services.audio_probe import AudioProbeError, WavFormat, wav_format
+from app.services.llm_hedging import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+# この長さ以上の録音を区間に分ける
+MIN_SEGMENTING_SECONDS = float(os.getenv("WHISPER_SEGMENT_MIN_SECONDS", "90"))
+# 1区間の目安の長さと、区切り位置（無音）を探す前後の幅
+SEGMENT_SECONDS = float(os.getenv("WHISPER_SEGMENT_SECONDS", "60"))
+SEARCH_SECONDS = float(os.getenv("WHISPER_SEGMENT_SEARCH_SECONDS", "15"))
+# 1区間の上限（Whisper APIのファイルサイズ上限 25MB より少し小さく）
+MAX_SEGMENT_BYTES = int(os.getenv("WHISPER_SEGMENT_MAX_BYTES", str(24 * 1024 * 1024)))
+
+FRAME_SECONDS = 0.03
+# 区切り位置は 0.3 秒の移動平均で最も静かなところにする（単語間の短い隙間より息継ぎ・文の切れ目を選ぶ）
+SMOOTH_FRAMES = 10
+READ_BLOCK_BYTES = 1024 * 1024
+
+# (format_tag, bits_per_sample) -> サンプルの型
+_SAMPLE_TYPES = {
+    (1, 8): np.dtype("u1"),
+    (1, 16): np.dtype("<i2"),
+    (1, 32): np.dtype("<i4"),
+    (3, 32): np.dtype("<f4"),
+}
+
+
+def _sample_type(wav: WavFormat) -> Optional[np.dtype]:
+    format_tag = wav.format_tag
+    if format_tag == 0xFFFE:
+        # WAVE_FORMAT_EXTENSIBLE: 実際の形式は拡張部分にあるが、録音アプリの出力は整数PCMがほとんど
+        format_tag = 1
+    return _SAMPLE_TYPES.get((format_tag, wav.bits_per_sample))
+
+
+def _frame_bytes(wav: WavFormat) -> int:
+    return max(1, int(wav.sample_rate * FRAME_SECONDS)) * wav.block_align
+
+
+def frame_energies(f: BinaryIO, wav: WavFormat) -> Optional[np.ndarray]:
+    """
+    data チャンクを READ_BLOCK_BYTES ずつ読み、FRAME_SECONDS ごとの平均パワー（全チャンネル）を返す
+    録音全体を配列にはしない（メモリに置くのは1ブロックとフレームごとの値だけ）
+    """
+    dtype = _sample_type(wav)
+    if dtype is None or not wav.block_align or not wav.sample_rate:
+        return None
+    frame_bytes = _frame_bytes(wav)
+    block = bytearray(max(1, READ_BLOCK_BYTES // frame_bytes) * frame_bytes)
+    view = memoryview(block)
+    energies = []
+    f.seek(wav.data_offset)
+    remaining = wav.data_size - wav.data_size % frame_bytes
+    while remaining > 0:
+        want = min(len(block), remaining)
+        filled = 0
+        while filled < want:
+            n = f.readinto(view[filled:want])
+            if not n:
+                break
+            filled += n
+        usable = filled - filled % frame_bytes
+        if usable == 0:
+            break
+        samples = np.frombuffer(block, dtype=dtype, count=usable // dtype.itemsize).astype(np.float32)
+        if dtype.kind == "u":
+            samples -= 128.0
+        energies.append(np.square(samples).reshape(usable // frame_bytes, -1).mean(axis=1))
+        remaining -= usable
+        if filled < want:
+            break
+    return np.concatenate(energies) if energies else np.zeros(0, dtype=np.float32)
+
+
+def choose_cuts(energies: np.ndarray, frames_per_segment: int, search_frames: int) -> List[int]:
+    """
+    区切るフレーム位置のリスト
+    前の区切りから frames_per_segment 前後 search_frames の範囲で、移動平均のパワーが最も小さい位置で区切る
+    """
+    total = len(energies)
+    if total <= frames_per_segment:
+        return []
+    smoothed = np.convolve(energies, np.ones(SMOOTH_FRAMES, dtype=np.float32) / SMOOTH_FRAMES, mode="same")
+    cuts = []
+    start = 0
+    # 残りが1区間＋探す幅に収まれば、最後の区間として区切らない（極端に短い区間を作らない）
+    while total - start > frames_per_segment + search_frames:
+        lo = start + max(1, frames_per_segment - search_frames)
+        hi = min(total, start + frames_per_segment + search_frames)
+        cut = lo + int(np.argmin(smoothed[lo:hi]))
+        cuts.append(cut)
+        start = cut
+    return cuts
+
+
+def _wav_header(wav: WavFormat, data_size: int) -> bytes:
+    fmt = struct.pack(
+        "<HHIIHH", wav.format_tag if wav.format_tag != 0xFFFE else 1, wav.channels, wav.sample_rate,
+        wav.byte_rate, wav.block_align, wav.bits_per_sample,
+    )
+    return b"RIFF" + struct.pack("<I", 4 + 8 + len(fmt) + 8 + data_size) + b"WAVE" \
+        + b"fmt " + struct.pack("<I", len(fmt)) + fmt + b"data" + struct.pack("<I", data_size)
+
+
+class WavSegmentReader(io.RawIOBase):
+    """
+    元のWAVファイルの [start, end) の範囲を、独立したWAVファイルとして読めるようにする
+    音声データはコピーせず、読まれた分だけ元のファイルから読む（複数の区間で同じファイルを共有してよい）
+    """
+
+    def __init__(self, f: BinaryIO, lock: threading.Lock, wav: WavFormat, start: int, end: int):
+        super().__init__()
+        self._f = f
+        self._lock = lock
+        self._start = start
+        self._header = _wav_header(wav, end - start)
+        self._size = len(self._header) + (end - start)
+        self._pos = 0
+        self.duration_seconds = (end - start) / wav.byte_rate
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._pos, os.SEEK_END: self._size}[whence]
+        self._pos = min(max(0, base + offset), self._size)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def readinto(self, b) -> int:
+        view = memoryview(b).cast("B")
+        want = min(len(view), self._size - self._pos)
+        if want <= 0:
+            return 0
+        header_len = len(self._header)
+        if self._pos < header_len:
+            n = min(want, header_len - self._pos)
+            view[:n] = self._header[self._pos:self._pos + n]
+        else:
+            with self._lock:
+                self._f.seek(self._start + self._pos - header_len)
+                n = self._f.readinto(view[:want]) or 0
+        self._pos += n
+        return n
+
+
+class SegmentationStats:
+    """/health 表示用"""
+
+    def __init__(self):
+        self._stats = {"recordings": 0, "segmented": 0, "segments": 0}
+        self._analysis_time = LatencyTracker(window=200)
+
+    def record(self, segments: int, elapsed: float):
+        self._stats["recordings"] += 1
+        self._analysis_time.record(elapsed)
+        if segments > 1:
+            self._stats["segmented"] += 1
+            self._stats["segments"] += segments
+
+    def snapshot(self) -> Dict:
+        p95 = self._analysis_time.percentile(95)
+        return {**self._stats, "analysis_ms_p95": round(p95 * 1000, 1) if p95 is not None else None}
+
+
+segmentation_stats = SegmentationStats()
+
+
+def plan_segments(f: BinaryIO) -> List[WavSegmentReader]:
+    """
+    長いWAV（PCM）録音を無音付近で区切った区間のリーダーを返す
+    区切らない場合（WAV以外・短い録音・対応していないサンプル形式）は空リスト。ファイル位置は元に戻す
+    """
+    position = f.tell()
+    started = time.perf_counter()
+    segments: List[WavSegmentReader] = []
+    try:
+        try:
+            wav = wav_format(f)
+        except (AudioProbeError, struct.error):
+            return segments
+        if wav is None or not wav.byte_rate or not wav.block_align:
+            return segments
+        duration = wav.data_size / wav.byte_rate
+        if duration < MIN_SEGMENTING_SECONDS and wav.data_size <= MAX_SEGMENT_BYTES:
+            return segments
+        energies = frame_energies(f, wav)
+        if energies is None or len(energies) == 0:
+            return segments
+
+        frame_bytes = _frame_bytes(wav)
+        search_frames = int(SEARCH_SECONDS / FRAME_SECONDS)
+        # サイズ上限を超えないよう、区間の最大（目安 + 探す幅）が MAX_SEGMENT_BYTES に収まるようにする
+        frames_per_segment = min(int(SEGMENT_SECONDS / FRAME_SECONDS), MAX_SEGMENT_BYTES // frame_bytes - search_frames)
+        if frames_per_segment < search_frames:
+            frames_per_segment = max(1, MAX_SEGMENT_BYTES // frame_bytes * 2 // 3)
+            search_frames = frames_per_segment // 2
+        cuts = choose_cuts(energies, frames_per_segment, search_frames)
+        if not cuts:
+            return segments
+
+        lock = threading.Lock()
+        bounds = [wav.data_offset] + [wav.data_offset + cut * frame_bytes for cut in cuts] \
+            + [wav.data_offset + wav.data_size]
+        segments = [WavSegmentReader(f, lock, wav, start, end) for start, end in zip(bounds, bounds[1:])]
+        return segments
+    finally:
+        f.seek(position)
+        segmentation_stats.record(len(segments), time.perf_counter() - started)
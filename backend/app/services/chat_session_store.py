@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import os
+import uuid
+import weakref
+from typing import Dict, List, Optional
+
+from app.services.session_store import MemorySessionStore, SessionStore, SqliteSessionStore
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data", "chats.db"
+)
+
+
+class ChatConversation:
+    """1つの会話の状態（古いターンの要約 + 直近のメッセージ原文）"""
+
+    def __init__(self, conversation_id: str, owner: str, lock: asyncio.Lock):
+        self.conversation_id = conversation_id
+        self.owner = owner
+        self.summary = ""
+        self.recent: List[Dict[str, str]] = []
+        self.lock = lock
+
+
+def create_chat_store() -> SessionStore:
+    """SESSION_STORE と同じ保存先の種類（sqlite / memory）で会話の保存先を作る"""
+    ttl_seconds = float(os.getenv("CHAT_SESSION_TTL_SECONDS", str(6 * 3600)))
+    if os.getenv("SESSION_STORE", "sqlite").lower() == "memory":
+        return MemorySessionStore(
+            ttl_seconds, max_sessions=int(os.getenv("CHAT_MAX_CONVERSATIONS", "5000")), shared_fields=()
+        )
+    # 同じ会話の次のターンは別のワーカーに届くことがあるため、ワーカー間で共有できるSQLiteに保存する
+    return SqliteSessionStore(ttl_seconds, path=os.getenv("CHAT_STORE_PATH") or _DEFAULT_PATH, shared_fields=())
+
+
+class ChatSessionStore:
+    """
+    /api/chat 用のサーバー側会話ストア
+
+    - 直近 recent_messages 件はそのまま保持し、それより古いターンは
+      AIService.summarize_conversation でローリング要約に畳み込む
+    - これによりプロンプトサイズは会話が長くなってもほぼ一定になる
+    - クライアントは conversation_id と新しいメッセージだけを送ればよい
+    - 会話は SessionStore に保存する（SQLiteならワーカー間・再起動後も続けられる）。
+      期限切れなどで見つからない会話は get が None を返し、クライアントに履歴を送り直してもらう
+    """
+
+    def __init__(self, ai_service, store: Optional[SessionStore] = None, recent_messages: Optional[int] = None):
+        self.ai_service = ai_service
+        self.store = store or create_chat_store()
+        self.recent_messages = recent_messages or int(os.getenv("CHAT_RECENT_MESSAGES", "6"))
+        # 同じ会話のターンと要約をプロセス内で直列にするロック（使われなくなったら自動で消える）
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self._background_tasks: set = set()
+
+    def _lock(self, conversation_id: str) -> asyncio.Lock:
+        lock = self._locks.get(conversation_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[conversation_id] = lock
+        return lock
+
+    async def _load(self, conv: ChatConversation) -> bool:
+        """保存されている最新の状態を読み込む（他のワーカーが進めたターンも反映する）"""
+        data = await self.store.aget(conv.conversation_id)
+        if data is None or data.get("owner") != conv.owner:
+            return False
+        conv.summary = data.get("summary", "")
+        conv.recent = data.get("recent", [])
+        return True
+
+    async def _save(self, conv: ChatConversation):
+        await self.store.aput(conv.conversation_id, {"owner": conv.owner, "summary": conv.summary, "recent": conv.recent})
+
+    async def get(self, owner: str, conversation_id: str) -> Optional[ChatConversation]:
+        """会話を取得（存在しない・期限切れ・他ユーザーの会話の場合は None）"""
+        conv = ChatConversation(conversation_id, owner, self._lock(conversation_id))
+        return conv if await self._load(conv) else None
+
+    async def create(self, owner: str, history: Optional[List[Dict[str, str]]] = None) -> ChatConversation:
+        """
+        新しい会話を作る
+
+        history はクライアントが持っている履歴で、旧クライアント互換と、
+        サーバー側の会話が見つからなかったときの送り直しに使う。
+        """
+        conversation_id = str(uuid.uuid4())
+        conv = ChatConversation(conversation_id, owner, self._lock(conversation_id))
+        if history:
+            conv.recent = [
+                {"role": m.get("role", "user"), "content": m.get("content", "")}
+                for m in history
+                if m.get("content")
+            ]
+        await self._save(conv)
+        return conv
+
+    async def reply(self, conv: ChatConversation, message: str) -> str:
+        """要約 + 直近履歴を文脈として応答を生成し、会話に追記する"""
+        async with conv.lock:
+            await self._load(conv)
+            response = await self.ai_service.chat_response(
+                message,
+                conv.recent,
+                summary=conv.summary or None,
+            )
+            conv.recent.append({"role": "user", "content": message})
+            conv.recent.append({"role": "assistant", "content": response})
+            await self._save(conv)
+
+        if len(conv.recent) > self.recent_messages:
+            # 要約はレスポンス返却後にバックグラウンドで実行（体感速度を落とさない）
+            task = asyncio.create_task(self._compact(conv))
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
+
+        return response
+
+    async def _compact(self, conv: ChatConversation):
+        """
+        直近枠からあふれた古いターンをローリング要約に畳み込む
+        要約の生成中はロックを持たない（次のターンを要約の完了まで待たせない）
+        """
+        async with conv.lock:
+            if not await self._load(conv):
+                return
+            overflow = len(conv.recent) - self.recent_messages
+            if overflow <= 0:
+                return
+            summary = conv.summary
+            old_messages = conv.recent[:overflow]
+
+        try:
+            new_summary = await self.ai_service.summarize_conversation(summary, old_messages)
+        except Exception as e:
+            logger.warning(f"Chat summary update failed (keeping raw history): {e}")
+            return
+
+        async with conv.lock:
+            if not await self._load(conv):
+                return
+            if conv.summary != summary or conv.recent[:overflow] != old_messages:
+                # 要約の生成中に別の要約が反映された（この結果は捨てる）
+                return
+            conv.summary = new_summary
+            conv.recent = conv.recent[overflow:]
+            await self._save(conv)
+
+    def close(self):
+        self.store.close()
@@ -0,0 +1,153 @@
+import logging
+import os
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """ドメインのブレーカーが開いているため、リクエストを送らずに諦めた"""
+
+    def __init__(self, host: str, retry_in: float):
+        super().__init__(f"circuit open for {host} (retry in {retry_in:.0f}s)")
+        self.host = host
+        self.retry_in = retry_in
+
+
+class _DomainState:
+    def __init__(self):
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.cooldown = 0.0
+        self.probe_in_flight = False
+        self.last_failure: Optional[str] = None
+        self.failures: Dict[str, int] = {}
+        self.rejected = 0
+        self.opened = 0
+
+
+class DomainCircuitBreaker:
+    """
+    スクレイピング先ドメインごとのサーキットブレーカー
+
+    - 403・タイムアウト・本文が取れない（空の抽出）が連続 failure_threshold 回で open
+    - open 中はそのドメインへのリクエストを送らない（利用者ごとに同じリトライ待ちを繰り返さない）
+    - cooldown 経過後は half_open になり、1リクエストだけ試す（probe）
+      - 成功すれば closed に戻す。失敗すれば cooldown を倍にして再び open（max_cooldown まで）
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = int(os.getenv("SCRAPE_BREAKER_FAILURE_THRESHOLD", "3")),
+        cooldown_seconds: float = float(os.getenv("SCRAPE_BREAKER_COOLDOWN_SECONDS", "300")),
+        max_cooldown_seconds: float = float(os.getenv("SCRAPE_BREAKER_MAX_COOLDOWN_SECONDS", "3600")),
+    ):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.max_cooldown_seconds = max_cooldown_seconds
+        self._domains: Dict[str, _DomainState] = {}
+
+    @staticmethod
+    def host(url: str) -> str:
+        return (urlparse(url).hostname or "").lower()
+
+    def _domain(self, host: str) -> _DomainState:
+        if host not in self._domains:
+            self._domains[host] = _DomainState()
+        return self._domains[host]
+
+    def is_open(self, url: str) -> bool:
+        """リクエストを送っても弾かれる状態か（probe 枠は消費しない）"""
+        domain = self._domains.get(self.host(url))
+        if domain is None or domain.state == CLOSED:
+            return False
+        if domain.state == OPEN:
+            return time.monotonic() < domain.open_until
+        return domain.probe_in_flight
+
+    def acquire(self, url: str):
+        """
+        リクエスト前に呼ぶ。送ってはいけない場合は CircuitOpenError
+        half_open では最初の1件だけを probe として通す
+        """
+        host = self.host(url)
+        domain = self._domain(host)
+        if domain.state == CLOSED:
+            return
+        now = time.monotonic()
+        if domain.state == OPEN and now >= domain.open_until:
+            domain.state = HALF_OPEN
+            logger.info(f"[Breaker] {host}: cooldown ended, sending a probe request")
+        if domain.state == HALF_OPEN and not domain.probe_in_flight:
+            domain.probe_in_flight = True
+            return
+        domain.rejected += 1
+        raise CircuitOpenError(host, max(0.0, domain.open_until - now))
+
+    def record_success(self, url: str):
+        host = self.host(url)
+        domain = self._domain(host)
+        if domain.state != CLOSED:
+            logger.info(f"[Breaker] {host}: probe succeeded, closing")
+        domain.state = CLOSED
+        domain.consecutive_failures = 0
+        domain.cooldown = 0.0
+        domain.probe_in_flight = False
+
+    def record_failure(self, url: str, reason: str):
+        """reason: "403" / "timeout" / "empty" など"""
+        host = self.host(url)
+        domain = self._domain(host)
+        domain.consecutive_failures += 1
+        domain.failures[reason] = domain.failures.get(reason, 0) + 1
+        domain.last_failure = reason
+
+        if domain.state == HALF_OPEN:
+            domain.cooldown = min(self.max_cooldown_seconds, (domain.cooldown or self.cooldown_seconds) * 2)
+            self._open(host, domain, reason)
+        elif domain.state == CLOSED and domain.consecutive_failures >= self.failure_threshold:
+            domain.cooldown = self.cooldown_seconds
+            self._open(host, domain, reason)
+
+    def release(self, url: str):
+        """成否を判定できなかったリクエスト（5xx・接続エラー・キャンセル等）の後始末。probe 枠だけ返す"""
+        domain = self._domains.get(self.host(url))
+        if domain is not None:
+            domain.probe_in_flight = False
+
+    def _open(self, host: str, domain: _DomainState, reason: str):
+        domain.state = OPEN
+        domain.open_until = time.monotonic() + domain.cooldown
+        domain.probe_in_flight = False
+        domain.opened += 1
+        logger.warning(
+            f"[Breaker] {host}: opened for {domain.cooldown:.0f}s "
+            f"after {domain.consecutive_failures} consecutive failures (last: {reason})"
+        )
+
+    def snapshot(self) -> Dict:
+        """/health 表示用"""
+        now = time.monotonic()
+        return {
+            host: {
+                "state": domain.state,
+                "consecutive_failures": domain.consecutive_failures,
+                "open_for_seconds": round(max(0.0, domain.open_until - now), 1) if domain.state == OPEN else 0.0,
+                "failures": domain.failures,
+                "last_failure": domain.last_failure,
+                "rejected": domain.rejected,
+                "opened": domain.opened,
+            }
+            for host, domain in self._domains.items()
+        }
+
+
+# NewsService / ArticleService / RSSポーラーで共有する（ドメインのブロック状況はプロセス全体で同じ）
+domain_breaker = DomainCircuitBreaker()
@@ -0,0 +1,107 @@
+import asyncio
+import importlib.util
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 は h2 パッケージ（httpx[http2]）が入っている場合のみ有効化する
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class SharedHttpClient:
+    """
+    アプリ全体で共有する httpx.AsyncClient（記事・RSS取得用）
+
+    - 接続プールとkeep-aliveにより、同じホストへの取得でDNS/TCP/TLSハンドシェイクを繰り返さない
+    - HTTP/2対応サイトでは1接続で多重化する
+    - ホストごとの同時リクエスト数を制限する（httpxのLimitsはプール全体の上限のみのため）
+    - アプリのlifespanで start/aclose する。lifespan外（CLIスクリプトなど）では初回利用時に生成する
+    """
+
+    def __init__(
+        self,
+        max_connections: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "50")),
+        max_keepalive_connections: int = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20")),
+        keepalive_expiry: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "30")),
+        per_host_limit: int = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "6")),
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.per_host_limit = per_host_limit
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._requests = 0
+
+    def _create(self) -> httpx.AsyncClient:
+        logger.info(f"[HTTP] creating shared client (http2={_HTTP2_AVAILABLE}, limits={self.limits})")
+        return httpx.AsyncClient(
+            verify=False,
+            http2=_HTTP2_AVAILABLE,
+            limits=self.limits,
+            timeout=15.0,
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = self._create()
+        return self._client
+
+    async def start(self):
+        _ = self.client
+
+    async def aclose(self):
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+        self._host_slots.clear()
+
+    @asynccontextmanager
+    async def host_slot(self, url: str):
+        host = urlparse(url).netloc
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = asyncio.Semaphore(self.per_host_limit)
+        async with slot:
+            yield
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        """ホストごとの同時数制限付きでGET（kwargsは httpx.AsyncClient.get と同じ）"""
+        async with self.host_slot(url):
+            self._requests += 1
+            return await self.client.get(url, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """ホストごとの同時数制限付きのストリーミングリクエスト（本文は呼び出し側で逐次読む）"""
+        async with self.host_slot(url):
+            self._requests += 1
+            async with self.client.stream(method, url, **kwargs) as response:
+                yield response
+
+    def snapshot(self) -> Dict:
+        """/health 表示用"""
+        return {
+            "http2": _HTTP2_AVAILABLE,
+            "open": self._client is not None and not self._client.is_closed,
+            "requests": self._requests,
+            "per_host_limit": self.per_host_limit,
+            "busy_hosts": {
+                host: self.per_host_limit - slot._value
+                for host, slot in self._host_slots.items()
+                if slot._value < self.per_host_limit
+            },
+        }
+
+
+# NewsService / ArticleService が共有するプロセス全体のクライアント
+shared_http_client = SharedHttpClient()
@@ -0,0 +1,136 @@
+import asyncio
+import hashlib
+import logging
+import os
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from app.services.session_store import MemorySessionStore, SessionStore, SqliteSessionStore
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data", "transcriptions.db"
+)
+
+MAX_KEY_LENGTH = 200
+
+
+class AudioHasher:
+    """受信しながら音声の内容のハッシュを計算する（再送の判定用）"""
+
+    def __init__(self):
+        self._hash = hashlib.blake2b(digest_size=16)
+
+    def update(self, chunk: bytes):
+        self._hash.update(chunk)
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+
+def idempotency_key(user_email: str, client_key: Optional[str] = None, audio_hash: Optional[str] = None) -> str:
+    """
+    ユーザーごとの再送判定キー
+    クライアントが Idempotency-Key を付けていればそれを、なければ音声の内容のハッシュを使う
+    """
+    if client_key:
+        if len(client_key) > MAX_KEY_LENGTH:
+            raise ValueError("Idempotency-Key が長すぎます")
+        return f"{user_email}:key:{client_key}"
+    return f"{user_email}:sha:{audio_hash}"
+
+
+class IdempotentResults:
+    """
+    同じ録音の再送（モバイルで接続が切れた後のリトライなど）に前回の結果を返す
+
+    - 完了した結果は store に ttl_seconds の間だけ保存し、同じキーの再送にはそのまま返す
+      （Whisperを呼び直さず、使用量も記録し直さない）
+    - 処理中に同じキーが届いた場合は、最初の処理の終了を待って同じ結果（または同じエラー）を返す
+      （最初の処理が切断で取り消された場合は、待っていたリクエストが処理し直す）
+    - 失敗した結果は保存しない（次の再送で処理し直す）
+    """
+
+    def __init__(self, store: SessionStore):
+        self.store = store
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._stats = {"requests": 0, "replayed": 0, "coalesced": 0, "retried_after_cancel": 0, "saved_minutes": 0.0}
+
+    async def run(self, key: str, fn: Callable[[], Awaitable[Dict]]) -> Tuple[Dict, bool]:
+        """(結果, 保存済みの結果を返したか) を返す"""
+        self._stats["requests"] += 1
+        while True:
+            cached = await self.store.aget(key)
+            if cached is not None:
+                self._record_replay(cached, "replayed")
+                return cached, True
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            try:
+                result = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if inflight.cancelled() and not asyncio.current_task().cancelling():
+                    # 最初のリクエストが切断などで取り消された（この再送は取り消されていない）ため、処理し直す
+                    self._stats["retried_after_cancel"] += 1
+                    continue
+                raise
+            self._record_replay(result, "coalesced")
+            return result, True
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # 待っている再送がなくても警告を出さない
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        try:
+            await self.store.aput(key, result)
+        except Exception as e:
+            logger.warning(f"[Idempotency] result store failed: {e}")
+        future.set_result(result)
+        return result, False
+
+    def _record_replay(self, result: Dict, kind: str):
+        self._stats[kind] += 1
+        self._stats["saved_minutes"] += float(result.get("usage_minutes") or 0.0)
+
+    def close(self):
+        self.store.close()
+
+    async def asnapshot(self) -> Dict:
+        """/health 表示用"""
+        stored = (await self.store.asnapshot())["sessions"]
+        return {
+            **self._stats,
+            "saved_minutes": round(self._stats["saved_minutes"], 2),
+            "inflight": len(self._inflight),
+            "stored": stored,
+            "ttl_seconds": self.store.ttl_seconds,
+        }
+
+
+def create_transcription_results() -> IdempotentResults:
+    """SESSION_STORE と同じ保存先の種類（sqlite / memory）で作る"""
+    ttl_seconds = float(os.getenv("WHISPER_IDEMPOTENCY_TTL_SECONDS", "600"))
+    if os.getenv("SESSION_STORE", "sqlite").lower() == "memory":
+        store: SessionStore = MemorySessionStore(ttl_seconds, max_sessions=1000, shared_fields=())
+    else:
+        # 再送は別のワーカーに届くことがあるため、ワーカー間で共有できるSQLiteに保存する
+        store = SqliteSessionStore(
+            ttl_seconds, path=os.getenv("WHISPER_IDEMPOTENCY_PATH") or _DEFAULT_PATH, shared_fields=()
+        )
+    return IdempotentResults(store)
+
+
+# /api/whisper のルートとヘルスチェックで共有する
+transcription_results = create_transcription_results()
@@ -0,0 +1,270 @@
+import asyncio
+import copy
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.services.near_duplicates import NearDuplicateIndex
+from app.services.session_store import MemorySessionStore, SessionStore, SqliteSessionStore
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data", "lessons.db"
+)
+
+
+def create_lesson_store() -> SessionStore:
+    """SESSION_STORE と同じ保存先の種類（sqlite / memory）で、レッスンセットと配信記録の保存先を作る"""
+    ttl_seconds = float(os.getenv("LESSON_STORE_TTL_SECONDS", str(2 * 24 * 3600)))
+    if os.getenv("SESSION_STORE", "sqlite").lower() == "memory":
+        return MemorySessionStore(
+            ttl_seconds, max_sessions=int(os.getenv("LESSON_STORE_MAX_ENTRIES", "50000")), shared_fields=()
+        )
+    # 同じ日・同じユーザーのリクエストは別のワーカーに届くことがあるため、ワーカー間で共有できるSQLiteに保存する
+    return SqliteSessionStore(ttl_seconds, path=os.getenv("LESSON_STORE_PATH") or _DEFAULT_PATH, shared_fields=())
+
+
+class LessonVariantStore:
+    """
+    1つの記事から生成したレベル別レッスン（1/2/3）をまとめて保持するストア
+
+    - 初回リクエスト時に記事を1回だけ取得し、全レベルを並行生成する
+    - 以降のレベル切り替えは保存済みのバリアントを返すだけ（追加のAI呼び出しなし）
+    - 同じキーへの同時リクエストは生成中のタスクを共有する
+    - 生成したセット（記事 + 全レベル）は store にも保存し、他のワーカーはそれを読み込んで使う。
+      生成中の印も store に置き、複数のワーカーに同時に届いても生成するのは1つだけ
+      （他のワーカーは最大 generation_wait_seconds だけ完了を待ち、待ち切れなければ自分で生成する）
+    - 別ソースの同じニュース（本文がほぼ同じ記事）は、生成済みのレッスンを使い回す
+    - どのユーザーにどのレッスンを返したかを store に記録する（mark_served。Notionへの保存を1人1回にする）
+    """
+
+    LEVELS = (1, 2, 3)
+    POLL_SECONDS = 0.5
+
+    def __init__(
+        self,
+        ai_service,
+        news_service,
+        max_sets: int = 64,
+        store: Optional[SessionStore] = None,
+        generation_wait_seconds: float = float(os.getenv("LESSON_GENERATION_WAIT_SECONDS", "120")),
+    ):
+        self.ai_service = ai_service
+        self.news_service = news_service
+        self.max_sets = max_sets
+        self.store = store or create_lesson_store()
+        self.generation_wait_seconds = generation_wait_seconds
+        self._sets: "OrderedDict[str, Dict]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._level_locks: Dict[str, asyncio.Lock] = {}
+        # 記事本文のMinHash（キーは self._sets と同じ）
+        self.similar = NearDuplicateIndex()
+
+    @staticmethod
+    def daily_key(now: Optional[datetime] = None, category: Optional[str] = None) -> str:
+        key = f"daily:{(now or datetime.now()).date().isoformat()}"
+        return f"{key}:{category}" if category else key
+
+    @staticmethod
+    def url_key(url: str) -> str:
+        return f"url:{url}"
+
+    @classmethod
+    def article_key(cls, article: Dict) -> str:
+        return cls.url_key(article.get("url") or article["title"])
+
+    async def mark_served(self, key: str, level: int, user_email: str) -> bool:
+        """
+        このユーザーにこのレッスン（キー・レベル）を初めて返すときだけ True を返す
+        記録は store にあるため、同じユーザーのリクエストが別のワーカーに届いても2回目は False になる
+        """
+        return await self.store.aadd(f"served:{key}:{level}:{user_email}", {"served_at": time.time()})
+
+    async def get_daily_lessons(
+        self, level: int, category: Optional[str] = None, now: Optional[datetime] = None
+    ) -> List[Dict]:
+        """今日の記事のレッスンを指定レベルで返す（記事はランダム取得、1日1記事・カテゴリーごと）"""
+        return await self.get_lessons(
+            self.daily_key(now, category),
+            lambda: self.news_service.fetch_random_news(category=category),
+            level,
+        )
+
+    async def get_url_lessons(self, url: str, level: int) -> List[Dict]:
+        """指定URLの記事のレッスンを指定レベルで返す"""
+        return await self.get_lessons(self.url_key(url), lambda: self.news_service.scrape_article(url), level)
+
+    async def get_article_lessons(self, article: Dict, level: int) -> List[Dict]:
+        """
+        取得済みの記事のレッスンを指定レベルで返す（/generate/auto 用）
+        同じ記事・ほぼ同じ本文の記事のレッスンが生成済みならそれを返し、なければこのレベルだけ生成する
+        """
+        key = self.article_key(article)
+        variant_set = self._sets.get(key)
+        if variant_set is not None:
+            self._sets.move_to_end(key)
+        else:
+            variant_set = self._find_similar(key, article)
+            if variant_set is None:
+                variant_set = {"article": article, "variants": {}, "created_at": datetime.now().isoformat()}
+                self.similar.add(key, article["content"])
+            self._store(key, variant_set)
+        return await self._level_lessons(key, variant_set, level)
+
+    async def get_lessons(
+        self,
+        key: str,
+        load_article: Callable[[], Awaitable[Optional[Dict]]],
+        level: int,
+    ) -> List[Dict]:
+        variant_set = await self._get_or_generate(key, load_article)
+        if variant_set is None:
+            return []
+        return await self._level_lessons(key, variant_set, level, shared=True)
+
+    async def _level_lessons(self, key: str, variant_set: Dict, level: int, shared: bool = False) -> List[Dict]:
+        lessons = variant_set["variants"].get(level)
+        if not lessons:
+            # 初回生成でこのレベルだけ失敗していた場合は、そのレベルのみ再生成する
+            lock = self._level_locks.setdefault(f"{key}:{level}", asyncio.Lock())
+            async with lock:
+                if shared and not variant_set["variants"].get(level):
+                    # 他のワーカーが再生成済みならそれを使う
+                    stored = await self._fetch_shared(key)
+                    if stored is not None and stored["variants"].get(level):
+                        variant_set["variants"][level] = stored["variants"][level]
+                lessons = variant_set["variants"].get(level)
+                if not lessons:
+                    article = variant_set["article"]
+                    lessons = await self.ai_service.generate_english_lesson(
+                        japanese_content=article["content"],
+                        japanese_title=article["title"],
+                        level=level,
+                    )
+                    variant_set["variants"][level] = lessons
+                    if shared and lessons:
+                        await self._save_shared(key, variant_set)
+        # 呼び出し側での変更が共有データに波及しないようコピーを返す
+        return copy.deepcopy(lessons)
+
+    def _find_similar(self, key: str, article: Dict) -> Optional[Dict]:
+        """ほぼ同じ本文の記事から生成済みのレッスンセットを探す"""
+        match = self.similar.find(article["content"])
+        if match is None or match[0] not in self._sets:
+            return None
+        similar_key, score, _ = match
+        logger.info(f"[LessonVariants] {key}: near-duplicate of {similar_key} (similarity={score:.2f}), reusing lessons")
+        return self._sets[similar_key]
+
+    def _store(self, key: str, variant_set: Dict):
+        self._sets[key] = variant_set
+        self._sets.move_to_end(key)
+        while len(self._sets) > self.max_sets:
+            evicted, _ = self._sets.popitem(last=False)
+            self.similar.remove(evicted)
+            for level in self.LEVELS:
+                self._level_locks.pop(f"{evicted}:{level}", None)
+
+    async def _get_or_generate(
+        self,
+        key: str,
+        load_article: Callable[[], Awaitable[Optional[Dict]]],
+    ) -> Optional[Dict]:
+        if key in self._sets:
+            self._sets.move_to_end(key)
+            return self._sets[key]
+
+        inflight = self._inflight.get(key)
+        if inflight is None:
+            inflight = asyncio.ensure_future(self._load_or_generate(key, load_article))
+            self._inflight[key] = inflight
+            inflight.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shieldで保護し、1人がリクエストを中断しても他の待機者の生成は続ける
+        return await asyncio.shield(inflight)
+
+    async def _fetch_shared(self, key: str) -> Optional[Dict]:
+        """store に保存されたセットを読む（JSONで文字列になったレベルのキーを数値に戻す）"""
+        data = await self.store.aget(f"set:{key}")
+        if data is None:
+            return None
+        return {**data, "variants": {int(level): lessons for level, lessons in data["variants"].items()}}
+
+    async def _save_shared(self, key: str, variant_set: Dict):
+        # 保存はスレッドで行うため、この時点の内容を別のdictにして渡す
+        await self.store.aput(f"set:{key}", {**variant_set, "variants": dict(variant_set["variants"])})
+
+    async def _load_or_generate(
+        self,
+        key: str,
+        load_article: Callable[[], Awaitable[Optional[Dict]]],
+    ) -> Optional[Dict]:
+        """他のワーカーが生成したセットがあればそれを使い、なければ生成中の印を取れたワーカーだけが生成する"""
+        claim = f"generating:{key}"
+        deadline = time.monotonic() + self.generation_wait_seconds
+        claimed = False
+        while True:
+            variant_set = await self._fetch_shared(key)
+            if variant_set is not None:
+                if key not in self.similar:
+                    self.similar.add(key, variant_set["article"]["content"])
+                self._store(key, variant_set)
+                return variant_set
+            claimed = await self.store.aadd(claim, {"pid": os.getpid(), "started_at": time.time()})
+            if claimed:
+                break
+            if time.monotonic() >= deadline:
+                # 印を取ったワーカーが落ちた・生成が極端に遅いなど。利用者を待たせ続けないよう自分で生成する
+                logger.warning(f"[LessonVariants] {key}: waited {self.generation_wait_seconds:.0f}s for another worker, generating here")
+                break
+            await asyncio.sleep(self.POLL_SECONDS)
+
+        try:
+            variant_set = await self._generate_set(key, load_article)
+            if variant_set is not None:
+                # 印を消す前に保存する（待っているワーカーが印の消えた隙に生成し直さないように）
+                await self._save_shared(key, variant_set)
+            return variant_set
+        finally:
+            # 失敗した場合も印を消し、待っているワーカー（または次のリクエスト）が生成し直せるようにする
+            if claimed:
+                await self.store.adelete(claim)
+
+    async def _generate_set(
+        self,
+        key: str,
+        load_article: Callable[[], Awaitable[Optional[Dict]]],
+    ) -> Optional[Dict]:
+        article = await load_article()
+        if not article:
+            return None
+
+        similar = self._find_similar(key, article)
+        if similar is not None:
+            self._store(key, similar)
+            return similar
+
+        started = time.monotonic()
+        variants = await self.ai_service.generate_lesson_variants(
+            japanese_content=article["content"],
+            japanese_title=article["title"],
+            levels=self.LEVELS,
+        )
+        logger.info(
+            f"[LessonVariants] {key}: generated levels "
+            f"{[lv for lv, lessons in variants.items() if lessons]} in {time.monotonic() - started:.1f}s"
+        )
+        if not any(variants.values()):
+            # 全滅した場合は保存せず、次のリクエストで記事取得からやり直す
+            return None
+
+        variant_set = {"article": article, "variants": variants, "created_at": datetime.now().isoformat()}
+        self.similar.add(key, article["content"])
+        self._store(key, variant_set)
+        return variant_set
+
+    def close(self):
+        self.store.close()
@@ -0,0 +1,225 @@
+import asyncio
+import io
+import logging
+import os
+import re
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from app.services.audio_probe import metered_duration
+from app.services.llm_hedging import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+# 文末（. ! ? の後に閉じ引用符・括弧が続いてもよい）の直後の空白で区切る
+_SENTENCE_END = re.compile(r"(?<=[.!?])[\"')\]]*\s+")
+
+MAX_SEGMENT_BYTES = int(os.getenv("LIVE_MAX_SEGMENT_BYTES", str(5 * 1024 * 1024)))
+TRANSCRIBE_CONCURRENCY = int(os.getenv("LIVE_TRANSCRIBE_CONCURRENCY", "3"))
+# 文字起こし待ち（実行中を含む）の区間の上限。超えたら空くまで次の区間を受け付けない
+MAX_PENDING_SEGMENTS = int(os.getenv("LIVE_MAX_PENDING_SEGMENTS", "6"))
+AUDIO_FORMATS = ("webm", "ogg", "mp4", "m4a", "wav", "mp3")
+
+
+def split_sentences(text: str) -> Tuple[List[str], str]:
+    """(文末まで確定した文のリスト, 末尾のまだ終わっていない部分) に分ける"""
+    sentences = []
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        sentence = text[start:match.end()].strip()
+        if sentence:
+            sentences.append(sentence)
+        start = match.end()
+    rest = text[start:].strip()
+    # Whisperは区間の最後の文にも句点を付けるため、文末記号で終わっていれば確定扱い
+    if rest and rest.rstrip("\"')]")[-1:] in (".", "!", "?"):
+        sentences.append(rest)
+        rest = ""
+    return sentences, rest
+
+
+class LivePracticeStats:
+    """/health 表示用：ライブ練習で、話し終わった時点でどれだけフィードバックが済んでいたか"""
+
+    def __init__(self):
+        self._stats = {
+            "sessions": 0, "segments": 0, "transcribe_errors": 0, "feedback_batches": 0, "backpressure_waits": 0,
+        }
+        self._pending_at_stop = LatencyTracker(window=200)
+        self._stop_to_done = LatencyTracker(window=200)
+
+    def count(self, key: str, n: int = 1):
+        self._stats[key] += n
+
+    def record_stop(self, pending_ratio: float, stop_to_done: float):
+        self._pending_at_stop.record(pending_ratio)
+        self._stop_to_done.record(stop_to_done)
+
+    def snapshot(self) -> Dict:
+        pending_p50 = self._pending_at_stop.percentile(50)
+        done_p50 = self._stop_to_done.percentile(50)
+        done_p95 = self._stop_to_done.percentile(95)
+        return {
+            **self._stats,
+            "pending_feedback_ratio_at_stop_p50": round(pending_p50, 2) if pending_p50 is not None else None,
+            "stop_to_done_ms_p50": round(done_p50 * 1000, 1) if done_p50 is not None else None,
+            "stop_to_done_ms_p95": round(done_p95 * 1000, 1) if done_p95 is not None else None,
+        }
+
+
+live_practice_stats = LivePracticeStats()
+
+
+class LivePractice:
+    """
+    WebSocketのライブ練習1回分の状態
+
+    - 話している間に届く音声を区間（segment_end まで）ごとにまとめ、区間ごとに並行して文字起こしする
+      （文字起こし待ちの区間が max_pending_segments に達したら、空くまで end_segment が待つ）
+    - 文字起こしは届いた順ではなく区間の順に繋げ、文末まで確定した文だけをフィードバックに回す
+      （区間の途中で切れた文は次の区間のテキストと繋げてから判定する）
+    - フィードバックは確定した文のまとまりごとに並行して実行し、終わったものから send で返す
+    - finish() は残りの文字起こし・フィードバックを待って、文の順に並べた結果を返す
+
+    transcribe(audio, index, fmt) / analyze(text) / send(message) は呼び出し側が渡す
+    """
+
+    def __init__(
+        self,
+        transcribe: Callable[[bytes, int, str], Awaitable[str]],
+        analyze: Callable[[str], Awaitable[List[Dict]]],
+        send: Callable[[Dict], Awaitable[None]],
+        max_segment_bytes: int = MAX_SEGMENT_BYTES,
+        concurrency: int = TRANSCRIBE_CONCURRENCY,
+        max_pending_segments: int = MAX_PENDING_SEGMENTS,
+    ):
+        self._transcribe = transcribe
+        self._analyze = analyze
+        self._send = send
+        self.max_segment_bytes = max_segment_bytes
+        self._slots = asyncio.Semaphore(max(1, concurrency))
+        self.max_pending_segments = max(1, max_pending_segments)
+        self._buffer = bytearray()
+        self._tasks: Set[asyncio.Task] = set()
+        self._feedback_tasks: Set[asyncio.Task] = set()
+        # 区間番号 -> 文字起こし（前の区間がまだ終わっていないため繋げられないもの）
+        self._transcripts: Dict[int, str] = {}
+        self._segments = 0
+        self._next_to_join = 0
+        self._tail = ""
+        self.sentences: List[str] = []
+        # 文のまとまりの番号 -> フィードバック
+        self._feedback: Dict[int, List[Dict]] = {}
+        self._batches = 0
+        self.duration_seconds = 0.0
+        live_practice_stats.count("sessions")
+
+    def add_audio(self, chunk: bytes):
+        if len(self._buffer) + len(chunk) > self.max_segment_bytes:
+            raise ValueError(f"音声区間が大きすぎます（上限 {self.max_segment_bytes // 1024 // 1024}MB）")
+        self._buffer.extend(chunk)
+
+    @property
+    def has_audio(self) -> bool:
+        return bool(self._buffer)
+
+    async def end_segment(self, duration_seconds: float, fmt: str = "webm") -> Optional[int]:
+        """
+        ここまでの音声を1区間として文字起こしを始め、区間番号を返す（音声が空なら None）
+        文字起こし待ちの区間が多すぎる場合は、空くまで待つ（その間は次の音声を受信しないため、
+        1接続が保持する音声は max_pending_segments 区間分までになる）
+        """
+        if not self._buffer:
+            return None
+        while len(self._tasks) >= self.max_pending_segments:
+            live_practice_stats.count("backpressure_waits")
+            await asyncio.wait(list(self._tasks), return_when=asyncio.FIRST_COMPLETED)
+        audio = bytes(self._buffer)
+        self._buffer.clear()
+        index = self._segments
+        self._segments += 1
+        # 課金に使う長さは区間の音声のヘッダーから求める（取れなければクライアント申告値とサイズからの推定値の大きい方）
+        _, duration_seconds = metered_duration(io.BytesIO(audio), duration_seconds)
+        self.duration_seconds += duration_seconds
+        live_practice_stats.count("segments")
+        self._spawn(self._tasks, self._transcribe_segment(index, audio, fmt if fmt in AUDIO_FORMATS else "webm"))
+        return index
+
+    def _spawn(self, tasks: Set[asyncio.Task], coro):
+        task = asyncio.create_task(coro)
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    async def _transcribe_segment(self, index: int, audio: bytes, fmt: str):
+        async with self._slots:
+            try:
+                text = (await self._transcribe(audio, index, fmt)).strip()
+            except Exception as e:
+                # 1区間の失敗で練習全体は止めない（その区間は空として続ける）
+                logger.warning(f"[LivePractice] segment {index} transcription failed: {e}")
+                live_practice_stats.count("transcribe_errors")
+                text = ""
+                await self._send({"type": "error", "segment": index, "detail": "文字起こしに失敗しました"})
+        await self._send({"type": "transcript", "segment": index, "text": text})
+        self._transcripts[index] = text
+        self._join()
+
+    def _join(self):
+        # 前の区間から順に繋げられるところまで繋げる
+        while self._next_to_join in self._transcripts:
+            text = self._transcripts.pop(self._next_to_join)
+            self._next_to_join += 1
+            self._tail = f"{self._tail} {text}".strip()
+        sentences, self._tail = split_sentences(self._tail)
+        if sentences:
+            self._start_feedback(sentences)
+
+    def _start_feedback(self, sentences: List[str]):
+        batch = self._batches
+        self._batches += 1
+        self.sentences.extend(sentences)
+        live_practice_stats.count("feedback_batches")
+        self._spawn(self._feedback_tasks, self._feedback_batch(batch, sentences))
+
+    async def _feedback_batch(self, batch: int, sentences: List[str]):
+        try:
+            items = await self._analyze(" ".join(sentences))
+        except Exception as e:
+            logger.warning(f"[LivePractice] feedback for batch {batch} failed: {e}")
+            items = []
+        self._feedback[batch] = items
+        await self._send({"type": "feedback", "batch": batch, "sentences": sentences, "feedback_items": items})
+
+    @property
+    def pending_feedback(self) -> int:
+        return len(self._feedback_tasks)
+
+    async def finish(self) -> Dict:
+        """残りの文字起こしとフィードバックを待ち、練習全体の結果を返す"""
+        stopped = time.perf_counter()
+        # 話し終わった時点で、文字起こし待ちの区間とフィードバック待ちの文のまとまりの割合
+        outstanding = len(self._tasks) + len(self._feedback_tasks)
+        expected = outstanding + len(self._feedback)
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks))
+        if self._tail:
+            # 文末記号のないまま終わった最後の発話
+            tail, self._tail = self._tail, ""
+            self._start_feedback([tail])
+        while self._feedback_tasks:
+            await asyncio.gather(*list(self._feedback_tasks))
+        live_practice_stats.record_stop(outstanding / expected if expected else 0.0, time.perf_counter() - stopped)
+        feedback_items = [item for batch in sorted(self._feedback) for item in self._feedback[batch]]
+        return {
+            "transcript": " ".join(self.sentences),
+            "feedback_items": feedback_items,
+            "duration_seconds": self.duration_seconds,
+            "segments": self._segments,
+        }
+
+    async def aclose(self):
+        """切断時：実行中の文字起こし・フィードバックを取り消す"""
+        tasks = list(self._tasks) + list(self._feedback_tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
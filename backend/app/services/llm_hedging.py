@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+import openai
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LatencyTracker:
+    """直近N件のレイテンシを保持し、パーセンタイルを計算する"""
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, int(round(p / 100.0 * len(ordered))) - 1))
+        return ordered[index]
+
+
+class HedgePolicy:
+    """メソッドごとのレイテンシ予算とヘッジ設定"""
+
+    def __init__(self, budget_seconds: float, default_hedge_after: float, max_attempts: int = 2):
+        self.budget_seconds = budget_seconds
+        self.default_hedge_after = default_hedge_after
+        self.max_attempts = max_attempts
+
+
+# (予算秒, 統計が溜まるまでのヘッジ開始秒)
+_DEFAULT_POLICIES: Dict[str, HedgePolicy] = {
+    "generate_question": HedgePolicy(12.0, 4.0),
+    "analyze_speech": HedgePolicy(30.0, 10.0),
+    "summarize_article": HedgePolicy(12.0, 4.0),
+    "generate_english_lesson": HedgePolicy(45.0, 20.0),
+    "chat_response": HedgePolicy(15.0, 5.0),
+    "summarize_conversation": HedgePolicy(15.0, 5.0),
+}
+
+_RETRYABLE_ERRORS = (
+    asyncio.TimeoutError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+class _MethodStats:
+    def __init__(self):
+        self.latency = LatencyTracker()
+        self.calls = 0
+        self.hedges_fired = 0
+        self.hedge_wins = 0
+        self.retries = 0
+        self.deadline_exceeded = 0
+
+
+class HedgedCaller:
+    """
+    LLM呼び出しのヘッジング＋デッドライン管理
+
+    - メソッドごとのレイテンシ予算（デッドライン）内で完了させる
+    - 観測済みp95を過ぎても応答がなければ同一リクエストをもう1本発行し、
+      先に返った方を採用して残りはキャンセルする
+    - 失敗時のリトライは残り時間の範囲内でのみ行う
+    """
+
+    MIN_SAMPLES_FOR_P95 = 20
+
+    def __init__(self):
+        self._policies = dict(_DEFAULT_POLICIES)
+        self._stats: Dict[str, _MethodStats] = {}
+
+    def policy(self, method: str) -> HedgePolicy:
+        base = self._policies.get(method) or HedgePolicy(30.0, 10.0)
+        # 環境変数で上書き可能: LLM_BUDGET_GENERATE_ENGLISH_LESSON=40
+        budget = os.getenv(f"LLM_BUDGET_{method.upper()}")
+        if budget:
+            return HedgePolicy(float(budget), min(base.default_hedge_after, float(budget)), base.max_attempts)
+        return base
+
+    def _method_stats(self, method: str) -> _MethodStats:
+        if method not in self._stats:
+            self._stats[method] = _MethodStats()
+        return self._stats[method]
+
+    def hedge_delay(self, method: str) -> float:
+        stats = self._method_stats(method)
+        if len(stats.latency) >= self.MIN_SAMPLES_FOR_P95:
+            return stats.latency.percentile(95)
+        return self.policy(method).default_hedge_after
+
+    async def call(self, method: str, factory: Callable[[float], Awaitable[T]]) -> T:
+        """
+        factory(timeout) は1回分のリクエストを表すコルーチンを返す関数。
+        timeout には残り時間（秒）が渡される。
+        """
+        policy = self.policy(method)
+        stats = self._method_stats(method)
+        stats.calls += 1
+        deadline = time.monotonic() + policy.budget_seconds
+        last_error: Optional[BaseException] = None
+
+        for attempt in range(policy.max_attempts):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if attempt > 0:
+                stats.retries += 1
+            try:
+                return await self._hedged_attempt(method, stats, factory, deadline)
+            except _RETRYABLE_ERRORS as e:
+                last_error = e
+                logger.warning(f"[LLM] {method} attempt {attempt + 1} failed: {type(e).__name__}: {e}")
+                # 残り時間を超えない範囲で短くバックオフ
+                backoff = min(0.5 * (2 ** attempt), max(0.0, deadline - time.monotonic() - 0.1))
+                if backoff > 0:
+                    await asyncio.sleep(backoff)
+
+        stats.deadline_exceeded += 1
+        if last_error is not None:
+            raise last_error
+        raise asyncio.TimeoutError(f"{method} exceeded its {policy.budget_seconds:.0f}s budget")
+
+    async def _hedged_attempt(
+        self,
+        method: str,
+        stats: _MethodStats,
+        factory: Callable[[float], Awaitable[T]],
+        deadline: float,
+    ) -> T:
+        started = time.monotonic()
+        primary = asyncio.ensure_future(factory(deadline - started))
+        tasks = {primary}
+        hedge: Optional[asyncio.Future] = None
+
+        try:
+            hedge_after = self.hedge_delay(method)
+            done, _ = await asyncio.wait(tasks, timeout=min(hedge_after, max(0.0, deadline - started)))
+
+            if not done and time.monotonic() < deadline:
+                stats.hedges_fired += 1
+                logger.info(f"[LLM] {method} exceeded {hedge_after:.1f}s, issuing hedged request")
+                hedge = asyncio.ensure_future(factory(deadline - time.monotonic()))
+                tasks.add(hedge)
+
+            last_error: Optional[BaseException] = None
+            while tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError(f"{method} exceeded its deadline")
+                done, tasks = await asyncio.wait(tasks, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise asyncio.TimeoutError(f"{method} exceeded its deadline")
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            stats.hedge_wins += 1
+                        stats.latency.record(time.monotonic() - started)
+                        return task.result()
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """/health 表示用の統計"""
+        result = {}
+        for method, stats in self._stats.items():
+            p95 = stats.latency.percentile(95)
+            result[method] = {
+                "calls": stats.calls,
+                "hedges_fired": stats.hedges_fired,
+                "hedge_rate": round(stats.hedges_fired / stats.calls, 3) if stats.calls else 0.0,
+                "hedge_wins": stats.hedge_wins,
+                "retries": stats.retries,
+                "deadline_exceeded": stats.deadline_exceeded,
+                "p95_seconds": round(p95, 3) if p95 is not None else None,
+            }
+        return result
+
+
+# ルートごとにAIServiceが生成されるため、統計はプロセス全体で共有する
+llm_hedger = HedgedCaller()
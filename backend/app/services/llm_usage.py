@@ -0,0 +1,73 @@
+import logging
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+
+def _cached_tokens(usage: Any) -> int:
+    """usage.prompt_tokens_details.cached_tokens を取得（SDKのバージョン差を吸収）"""
+    details = getattr(usage, "prompt_tokens_details", None)
+    if details is None:
+        details = (getattr(usage, "model_extra", None) or {}).get("prompt_tokens_details")
+    if isinstance(details, dict):
+        return int(details.get("cached_tokens") or 0)
+    return int(getattr(details, "cached_tokens", 0) or 0)
+
+
+class PromptCacheStats:
+    """メソッドごとのプロンプトトークン数とキャッシュヒットしたトークン数を集計"""
+
+    def __init__(self):
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def record(self, method: str, usage: Any):
+        if usage is None:
+            return
+        prompt_tokens = int(getattr(usage, "prompt_tokens", 0) or 0)
+        cached = _cached_tokens(usage)
+        stats = self._stats.setdefault(method, {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0})
+        stats["requests"] += 1
+        stats["prompt_tokens"] += prompt_tokens
+        stats["cached_tokens"] += cached
+        logger.debug(f"[LLM] {method} prompt_tokens={prompt_tokens} cached_tokens={cached}")
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """/health 表示用の統計"""
+        return {
+            method: {
+                **stats,
+                "cached_ratio": round(stats["cached_tokens"] / stats["prompt_tokens"], 3) if stats["prompt_tokens"] else 0.0,
+            }
+            for method, stats in self._stats.items()
+        }
+
+
+# ルートごとにAIServiceが生成されるため、統計はプロセス全体で共有する
+prompt_cache_stats = PromptCacheStats()
+
+
+class StructuredOutputStats:
+    """メソッドごとのJSON出力のパース結果（そのまま成功 / ローカル修復 / 失敗）と、スキーマ不一致で除外した項目数を集計"""
+
+    def __init__(self):
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def record(self, method: str, outcome: str, dropped_items: int = 0):
+        stats = self._stats.setdefault(method, {"ok": 0, "repaired": 0, "failed": 0, "dropped_items": 0})
+        stats[outcome] += 1
+        stats["dropped_items"] += dropped_items
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """/health 表示用の統計"""
+        result = {}
+        for method, stats in self._stats.items():
+            total = stats["ok"] + stats["repaired"] + stats["failed"]
+            result[method] = {
+                **stats,
+                "repair_rate": round(stats["repaired"] / total, 3) if total else 0.0,
+                "failure_rate": round(stats["failed"] / total, 3) if total else 0.0,
+            }
+        return result
+
+
+structured_output_stats = StructuredOutputStats()
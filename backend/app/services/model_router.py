@@ -0,0 +1,172 @@
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from app.services.llm_hedging import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+
+# タスクごとの候補モデル（先頭が優先）。OPENAI_MODEL_ROUTES(JSON)で上書き可能
+# 既定は1モデルのみ（上位モデルへのフェイルオーバーはコストが大きく上がるため、設定で明示した場合だけ行う）
+_DEFAULT_ROUTES: Dict[str, List[str]] = {
+    "generate_question": ["gpt-4o-mini"],
+    "summarize_article": ["gpt-4o-mini"],
+    "summarize_conversation": ["gpt-4o-mini"],
+    "chat_response": ["gpt-4o-mini"],
+    "analyze_speech": ["gpt-4o-mini"],
+    "generate_english_lesson": ["gpt-4o-mini"],
+}
+
+# モデルごとのp95レイテンシSLO（秒）。OPENAI_MODEL_SLO_P95(JSON)で上書き可能
+_DEFAULT_SLO_P95: Dict[str, float] = {
+    "gpt-4o-mini": 20.0,
+    "gpt-4o": 30.0,
+}
+
+
+class _ModelHealth:
+    def __init__(self):
+        self.latency = LatencyTracker(window=100)
+        self.outcomes: Deque[bool] = deque(maxlen=100)
+        self.unhealthy_until = 0.0
+        self.timeouts = 0
+        self.cancelled = 0
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def reset(self):
+        self.latency = LatencyTracker(window=100)
+        self.outcomes.clear()
+
+
+class ModelRouter:
+    """
+    AIServiceのタスクごとに使用するモデルを選択するルーター
+
+    - タスクごとの候補モデルは設定（環境変数）から読み込む
+    - モデルごとにレイテンシとエラー率を観測し、p95がSLOを超えるか
+      エラー率が閾値を超えたら一定時間そのモデルを避けて次の候補へフェイルオーバーする
+    - クールダウン後は観測値をリセットして優先モデルに戻す
+    """
+
+    MIN_SAMPLES = 10
+
+    def __init__(self):
+        self.routes = dict(_DEFAULT_ROUTES)
+        self.routes.update(self._load_json_env("OPENAI_MODEL_ROUTES"))
+        self.slo_p95 = dict(_DEFAULT_SLO_P95)
+        self.slo_p95.update({k: float(v) for k, v in self._load_json_env("OPENAI_MODEL_SLO_P95").items()})
+        self.max_error_rate = float(os.getenv("OPENAI_MODEL_MAX_ERROR_RATE", "0.3"))
+        self.cooldown_seconds = float(os.getenv("OPENAI_MODEL_COOLDOWN_SECONDS", "300"))
+        self._health: Dict[str, _ModelHealth] = {}
+        self._decisions: Dict[str, Dict[str, int]] = {}
+        self._last_choice: Dict[str, str] = {}
+
+    @staticmethod
+    def _load_json_env(name: str) -> Dict:
+        raw = os.getenv(name)
+        if not raw:
+            return {}
+        try:
+            value = json.loads(raw)
+            return value if isinstance(value, dict) else {}
+        except json.JSONDecodeError:
+            logger.warning(f"[ModelRouter] {name} is not valid JSON, ignoring")
+            return {}
+
+    def _model_health(self, model: str) -> _ModelHealth:
+        if model not in self._health:
+            self._health[model] = _ModelHealth()
+        return self._health[model]
+
+    def primary_model(self, task: str) -> str:
+        return (self.routes.get(task) or ["gpt-4o-mini"])[0]
+
+    def _is_healthy(self, model: str, now: float) -> bool:
+        health = self._model_health(model)
+        if health.unhealthy_until:
+            if now < health.unhealthy_until:
+                return False
+            # クールダウン明け: 古い観測値を捨てて再評価する
+            health.unhealthy_until = 0.0
+            health.reset()
+            logger.info(f"[ModelRouter] {model} cooldown ended, eligible again")
+
+        if len(health.outcomes) < self.MIN_SAMPLES:
+            return True
+        p95 = health.latency.percentile(95)
+        slo = self.slo_p95.get(model)
+        breached_slo = slo is not None and p95 is not None and p95 > slo
+        breached_errors = health.error_rate() > self.max_error_rate
+        if breached_slo or breached_errors:
+            health.unhealthy_until = now + self.cooldown_seconds
+            p95_text = f"{p95:.2f}s" if p95 is not None else "n/a"
+            slo_text = f"{slo}s" if slo is not None else "n/a"
+            logger.warning(
+                f"[ModelRouter] {model} marked unhealthy for {self.cooldown_seconds:.0f}s "
+                f"(p95={p95_text} slo={slo_text} error_rate={health.error_rate():.0%})"
+            )
+            return False
+        return True
+
+    def choose(self, task: str) -> str:
+        """タスクに使うモデルを選択（健全な候補のうち最優先のもの）"""
+        candidates = self.routes.get(task) or ["gpt-4o-mini"]
+        now = time.monotonic()
+        chosen: Optional[str] = next((m for m in candidates if self._is_healthy(m, now)), None)
+        if chosen is None:
+            # 全候補が不健全な場合は、クールダウンが最も早く明けるものを使う
+            chosen = min(candidates, key=lambda m: self._model_health(m).unhealthy_until)
+
+        decisions = self._decisions.setdefault(task, {})
+        decisions[chosen] = decisions.get(chosen, 0) + 1
+        if self._last_choice.get(task) != chosen:
+            if task in self._last_choice:
+                logger.info(f"[ModelRouter] {task}: routing changed {self._last_choice[task]} -> {chosen}")
+            self._last_choice[task] = chosen
+        return chosen
+
+    def record(self, model: str, seconds: float, ok: bool, timed_out: bool = False):
+        """
+        1回の呼び出しの結果を記録する
+        timed_out: 試行自身のデッドラインに達した試行。失敗として数え、打ち切りまでの時間を
+        レイテンシの下限として記録する（遅いモデルの試行が完了しないまま観測から漏れないように）
+        """
+        health = self._model_health(model)
+        health.outcomes.append(ok)
+        if ok or timed_out:
+            health.latency.record(seconds)
+        if timed_out:
+            health.timeouts += 1
+
+    def record_cancelled(self, model: str):
+        """デッドライン前に取り消された試行（ヘッジの負け・切断）。エラー率・レイテンシには含めない"""
+        self._model_health(model).cancelled += 1
+
+    def snapshot(self) -> Dict:
+        """/health 表示用のルーティング状況"""
+        now = time.monotonic()
+        models = {}
+        for model, health in self._health.items():
+            p95 = health.latency.percentile(95)
+            models[model] = {
+                "p95_seconds": round(p95, 3) if p95 is not None else None,
+                "slo_p95_seconds": self.slo_p95.get(model),
+                "error_rate": round(health.error_rate(), 3),
+                "samples": len(health.outcomes),
+                "timeouts": health.timeouts,
+                "cancelled": health.cancelled,
+                "unhealthy_for_seconds": round(max(0.0, health.unhealthy_until - now), 1),
+            }
+        return {"models": models, "decisions": self._decisions}
+
+
+# ルートごとにAIServiceが生成されるため、観測値はプロセス全体で共有する
+model_router = ModelRouter()
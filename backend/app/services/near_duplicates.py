@@ -0,0 +1,178 @@
+import hashlib
+import os
+import random
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# 記号・空白を除いた「文字」だけを比較対象にする（句読点や改行位置の違いを無視）
+_NON_WORD = re.compile(r"[\W_]+")
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _shingles(text: str, size: int = 3) -> List[str]:
+    """
+    比較用のシングル（連続するトークンの組）を作る
+    日本語は単語区切りがないため文字単位、英語など空白区切りの言語は単語単位
+
+    言語によってシングルの作り方が違うため、検出できるのは同じ言語の記事どうしだけ
+    （BBCの英語記事とNHK・毎日の日本語記事は同じニュースでも共通のシングルがなく、類似度はほぼ0）。
+    別言語の同じニュースは別記事として索引に入る（レッスンの素材としてはむしろ両方あってよい）
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    ascii_ratio = sum(1 for c in text if c.isascii()) / len(text) if text else 1.0
+    if ascii_ratio > 0.8:
+        tokens = _WORD.findall(text)
+        sep = " "
+    else:
+        tokens = list(_NON_WORD.sub("", text))
+        sep = ""
+    if len(tokens) < size:
+        return [sep.join(tokens)] if tokens else []
+    return list({sep.join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)})
+
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def _permutations(count: int, seed: int = 1) -> List[Tuple[int, int]]:
+    """MinHash用のハッシュ関数 (a, b)。プロセスを再起動しても同じ値になるよう固定シードで作る"""
+    rng = random.Random(seed)
+    return [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(count)]
+
+
+def minhash(text: str, permutations: List[Tuple[int, int]], shingle_size: int = 3) -> Tuple[int, ...]:
+    """本文のMinHash署名（2つの署名で一致する要素の割合が、シングル集合のJaccard係数の推定値になる）"""
+    shingles = _shingles(text, shingle_size)
+    if not shingles:
+        return tuple(_MAX_HASH for _ in permutations)
+    hashes = [
+        int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "big")
+        for s in shingles
+    ]
+    return tuple(
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in permutations
+    )
+
+
+def similarity(a: Tuple[int, ...], b: Tuple[int, ...]) -> float:
+    """MinHash署名から推定したJaccard係数"""
+    if not a:
+        return 0.0
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+class NearDuplicateIndex:
+    """
+    最近取得した記事本文のMinHash索引（ニュースソースをまたいだ同一ニュースの検出用）
+
+    - 推定Jaccard係数が threshold 以上なら同じニュースとみなす
+    - 署名を rows_per_band 個ずつの帯に分けたLSHで候補を絞り、全件とは比較しない
+      （帯が1つでも一致した記事だけ署名全体で類似度を計算する）
+    - window_hours より古い署名と、max_entries を超えた古い署名は捨てる
+    """
+
+    def __init__(
+        self,
+        threshold: float = float(os.getenv("NEAR_DUP_THRESHOLD", "0.5")),
+        num_perm: int = int(os.getenv("NEAR_DUP_NUM_PERM", "64")),
+        rows_per_band: int = int(os.getenv("NEAR_DUP_ROWS_PER_BAND", "2")),
+        window_hours: float = float(os.getenv("NEAR_DUP_WINDOW_HOURS", "72")),
+        max_entries: int = int(os.getenv("NEAR_DUP_MAX_ENTRIES", "5000")),
+        shingle_size: int = int(os.getenv("NEAR_DUP_SHINGLE_SIZE", "3")),
+    ):
+        self.threshold = threshold
+        self.rows_per_band = max(1, rows_per_band)
+        self.window_seconds = window_hours * 3600
+        self.max_entries = max_entries
+        self.shingle_size = shingle_size
+        self._permutations = _permutations(num_perm)
+        # key -> (signature, added_at, payload)
+        self._entries: "OrderedDict[str, Tuple[Tuple[int, ...], float, Any]]" = OrderedDict()
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], set] = {}
+        self._stats = {"lookups": 0, "duplicates": 0}
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        return minhash(text, self._permutations, self.shingle_size)
+
+    def _bands(self, signature: Tuple[int, ...]):
+        r = self.rows_per_band
+        for i in range(0, len(signature), r):
+            yield (i, signature[i:i + r])
+
+    def find(self, text: str = "", signature: Optional[Tuple[int, ...]] = None) -> Optional[Tuple[str, float, Any]]:
+        """
+        同じニュースとみなせる記事があれば (key, 推定類似度, payload) を返す（最も類似度が高いもの）
+        """
+        self._expire()
+        self._stats["lookups"] += 1
+        sig = self.signature(text) if signature is None else signature
+        candidates = set()
+        for band in self._bands(sig):
+            candidates.update(self._buckets.get(band, ()))
+
+        best: Optional[Tuple[str, float, Any]] = None
+        for key in candidates:
+            other, _, payload = self._entries[key]
+            score = similarity(sig, other)
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (key, score, payload)
+        if best is not None:
+            self._stats["duplicates"] += 1
+        return best
+
+    def add(
+        self,
+        key: str,
+        text: str = "",
+        payload: Any = None,
+        signature: Optional[Tuple[int, ...]] = None,
+    ) -> Tuple[int, ...]:
+        """署名を登録して返す（同じ key は置き換え）"""
+        sig = self.signature(text) if signature is None else signature
+        self.remove(key)
+        self._entries[key] = (sig, time.time(), payload)
+        for band in self._bands(sig):
+            self._buckets.setdefault(band, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self.remove(next(iter(self._entries)))
+        return sig
+
+    def remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for band in self._bands(entry[0]):
+            keys = self._buckets.get(band)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._buckets[band]
+
+    def _expire(self):
+        cutoff = time.time() - self.window_seconds
+        # 登録順に並んでいるため、先頭から古いものだけ見ればよい
+        while self._entries:
+            key, (_, added_at, _) = next(iter(self._entries.items()))
+            if added_at >= cutoff:
+                break
+            self.remove(key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def snapshot(self) -> Dict:
+        """/health 表示用"""
+        return {
+            **self._stats,
+            "entries": len(self._entries),
+            "threshold": self.threshold,
+            "window_hours": round(self.window_seconds / 3600, 1),
+        }
@@ -1,17 +1,97 @@
 import httpx
-from bs4 import BeautifulSoup
-from typing import Optional, Dict, List
+from typing import Awaitable, Callable, Optional, Dict, List, Tuple, Union
 import random
 import time
 import asyncio
 import logging
-from urllib.parse import urlparse
+import os
+from urllib.parse import urljoin, urlparse
 import xml.etree.ElementTree as ET
 
+from app.services.article_extractors import fetch_and_extract, find_links
+from app.services.article_cache import NOT_MODIFIED, FetchResult, article_cache
+from app.services.article_index import ArticleIndex, article_index
+from app.services.circuit_breaker import CircuitOpenError, domain_breaker
+from app.services.http_client import SharedHttpClient, shared_http_client
+from app.services.llm_hedging import LatencyTracker
+from app.services.parse_pool import parse_pool
+
 logger = logging.getLogger(__name__)
 
+
+class NewsSourceStats:
+    """ニュースソースごとの試行数・成功数・採用数（勝率）・レイテンシを集計"""
+
+    def __init__(self):
+        self._stats: Dict[str, Dict] = {}
+
+    def _source(self, name: str) -> Dict:
+        if name not in self._stats:
+            self._stats[name] = {
+                "attempts": 0, "successes": 0, "failures": 0, "wins": 0, "cancelled": 0,
+                "latency": LatencyTracker(window=100),
+            }
+        return self._stats[name]
+
+    def record_attempt(self, name: str):
+        self._source(name)["attempts"] += 1
+
+    def record_success(self, name: str, seconds: float):
+        stats = self._source(name)
+        stats["successes"] += 1
+        stats["latency"].record(seconds)
+
+    def record_failure(self, name: str):
+        self._source(name)["failures"] += 1
+
+    def record_cancelled(self, name: str):
+        self._source(name)["cancelled"] += 1
+
+    def record_win(self, name: str):
+        self._source(name)["wins"] += 1
+
+    def success_rate(self, name: str) -> float:
+        stats = self._source(name)
+        finished = stats["successes"] + stats["failures"]
+        # 観測が少ないうちは0.5に寄せる（ラプラス補正）
+        return (stats["successes"] + 1) / (finished + 2)
+
+    def weighted_order(self, sources: List[Tuple[str, Callable]], weights: Dict[str, float]) -> List[Tuple[str, Callable]]:
+        """重み×成功率に比例した確率で、重複なしのランダム順に並べる"""
+        remaining = list(sources)
+        ordered = []
+        while remaining:
+            scores = [weights.get(name, 1.0) * self.success_rate(name) for name, _ in remaining]
+            picked = random.choices(range(len(remaining)), weights=scores)[0]
+            ordered.append(remaining.pop(picked))
+        return ordered
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """/health 表示用の統計"""
+        result = {}
+        for name, stats in self._stats.items():
+            p50 = stats["latency"].percentile(50)
+            p95 = stats["latency"].percentile(95)
+            result[name] = {
+                **{k: v for k, v in stats.items() if k != "latency"},
+                "win_rate": round(stats["wins"] / stats["attempts"], 3) if stats["attempts"] else 0.0,
+                "p50_seconds": round(p50, 2) if p50 is not None else None,
+                "p95_seconds": round(p95, 2) if p95 is not None else None,
+            }
+        return result
+
+
+# ルートごとにNewsServiceが生成されるため、統計はプロセス全体で共有する
+news_source_stats = NewsSourceStats()
+
 class NewsService:
     """複数のニュースソースから記事を取得するサービス"""
+
+    def __init__(self, http: Optional[SharedHttpClient] = None, index: Optional[ArticleIndex] = None):
+        # 接続プールはアプリ全体で共有する（lifespanで生成・破棄）
+        self.http = http or shared_http_client
+        # RSSポーラーが先読みした記事の索引（あればライブ取得より優先する）
+        self.index = index or article_index
     
     def _get_headers(self, *, referer: Optional[str] = None, accept_language: Optional[str] = None) -> Dict[str, str]:
         """403エラー対策のためのヘッダーを取得"""
@@ -20,7 +100,6 @@ class NewsService:
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
             "Accept-Language": accept_language or "ja,en-US;q=0.9,en;q=0.8",
             "Accept-Encoding": "gzip, deflate, br",
-            "Connection": "keep-alive",
             "Upgrade-Insecure-Requests": "1",
         }
         if referer:
@@ -39,6 +118,7 @@ class NewsService:
     async def scrape_article(self, url: str, max_retries: int = 3) -> Optional[Dict[str, str]]:
         """
         指定されたURLの記事をスクレイピング（403エラー対策付き）
+        同じURLの記事はキャッシュから返し、TTL経過後は条件付きGETで再検証する
         
         Args:
             url: スクレイピングする記事のURL
@@ -47,82 +127,75 @@ class NewsService:
         Returns:
             Dict with keys: title, content, url
         """
-        headers = self._get_headers(referer=self._guess_referer(url))
+        return await article_cache.fetch(
+            "news",
+            url,
+            lambda validators: self._download_article(url, max_retries, validators),
+        )
+
+    async def _download_article(
+        self,
+        url: str,
+        max_retries: int,
+        validators: Dict[str, str],
+    ) -> Union[FetchResult, object, None]:
+        """記事をダウンロードして抽出（validators があれば条件付きGET、304なら NOT_MODIFIED）"""
+        headers = {**self._get_headers(referer=self._guess_referer(url)), **validators}
         
         for attempt in range(max_retries):
             try:
-                async with httpx.AsyncClient(verify=False, headers=headers, timeout=15.0) as client:
-                    response = await client.get(url, follow_redirects=True)
-                    
-                    # 403エラーの場合
-                    if response.status_code == 403:
-                        if attempt < max_retries - 1:
-                            # 指数バックオフでリトライ
-                            wait_time = 2 ** attempt
-                            logger.info(f"403エラー発生。{wait_time}秒待機してリトライ... (試行 {attempt + 1}/{max_retries})")
-                            await asyncio.sleep(wait_time)
-                            continue
-                        else:
-                            raise Exception(f"403 Forbiddenエラー: 記事の取得に失敗しました (URL: {url})")
-                    
-                    response.raise_for_status()
-                    
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    
-                    # タイトル取得（複数のパターンを試す）
-                    title_tag = (
-                        soup.find('h1', class_='title') or
-                        soup.find('h1', id='title') or
-                        soup.find('h1') or
-                        soup.find('title')
-                    )
-                    title = title_tag.get_text(strip=True) if title_tag else "タイトル不明"
-                    
-                    # 本文取得（複数のパターンを試す）
-                    body = (
-                        soup.find('section', class_='main-text') or 
-                        soup.find('div', class_='main-text') or 
-                        soup.find('div', id='main-text') or
-                        soup.find('div', class_='article-body') or
-                        soup.find('article') or
-                        soup.find('div', class_='article-content')
-                    )
-                    
-                    content = ""
-                    if body:
-                        # 不要な要素を削除
-                        for script in body.find_all(['script', 'style', 'nav', 'footer', 'aside']):
-                            script.decompose()
-                        content = body.get_text(strip=True, separator='\n')
+                # 本文コンテナが閉じたら残りはダウンロードしない（サイズ上限付きのストリーミング取得）
+                response, extraction = await fetch_and_extract(self.http, url, headers=headers)
+
+                if response.status_code == 304:
+                    return NOT_MODIFIED
+                
+                # 403エラーの場合（ブレーカーが開いたら同じドメインへのリトライはしない）
+                if response.status_code == 403:
+                    if attempt < max_retries - 1 and not domain_breaker.is_open(url):
+                        # 指数バックオフでリトライ
+                        wait_time = 2 ** attempt
+                        logger.info(f"403エラー発生。{wait_time}秒待機してリトライ... (試行 {attempt + 1}/{max_retries})")
+                        await asyncio.sleep(wait_time)
+                        continue
                     else:
-                        # フォールバック: 長いPタグを集める
-                        paragraphs = soup.find_all('p')
-                        long_ps = [p.get_text(strip=True) for p in paragraphs if len(p.get_text(strip=True)) > 20]
-                        content = '\n'.join(long_ps[:15])  # より多くの段落を取得
-                    
-                    if not content or len(content) < 50:
-                        if attempt < max_retries - 1:
-                            wait_time = 2 ** attempt
-                            logger.info(f"コンテンツが取得できませんでした。{wait_time}秒待機してリトライ... (試行 {attempt + 1}/{max_retries})")
-                            await asyncio.sleep(wait_time)
-                            continue
-                        return None
-                    
-                    return {
+                        raise Exception(f"403 Forbiddenエラー: 記事の取得に失敗しました (URL: {url})")
+                
+                response.raise_for_status()
+                
+                title = (extraction.title if extraction else "") or "タイトル不明"
+                content = extraction.text("\n") if extraction else ""
+                
+                if not content or len(content) < 50:
+                    if attempt < max_retries - 1 and not domain_breaker.is_open(url):
+                        wait_time = 2 ** attempt
+                        logger.info(f"コンテンツが取得できませんでした。{wait_time}秒待機してリトライ... (試行 {attempt + 1}/{max_retries})")
+                        await asyncio.sleep(wait_time)
+                        continue
+                    return None
+                
+                return FetchResult(
+                    {
                         "title": title,
                         "content": content,
                         "url": url
-                    }
-                    
+                    },
+                    etag=response.headers.get("etag"),
+                    last_modified=response.headers.get("last-modified"),
+                )
+                
+            except CircuitOpenError as e:
+                logger.info(f"スキップ: {e} (URL: {url})")
+                return None
             except httpx.HTTPStatusError as e:
-                if e.response.status_code == 403 and attempt < max_retries - 1:
+                if e.response.status_code == 403 and attempt < max_retries - 1 and not domain_breaker.is_open(url):
                     wait_time = 2 ** attempt
                     logger.warning(f"HTTPステータスエラー: {e.response.status_code}。{wait_time}秒待機してリトライ...")
                     await asyncio.sleep(wait_time)
                     continue
                 raise
             except Exception as e:
-                if attempt < max_retries - 1:
+                if attempt < max_retries - 1 and not domain_breaker.is_open(url):
                     wait_time = 2 ** attempt
                     logger.warning(f"エラー発生: {str(e)}。{wait_time}秒待機してリトライ... (試行 {attempt + 1}/{max_retries})")
                     await asyncio.sleep(wait_time)
@@ -141,187 +214,344 @@ class NewsService:
         """
         base_url = "https://mainichi.jp/"
         headers = self._get_headers(referer=base_url)
+        if domain_breaker.is_open(base_url):
+            logger.info(f"スキップ: {domain_breaker.host(base_url)} のブレーカーが開いています")
+            return None
         
         try:
-            async with httpx.AsyncClient(verify=False, headers=headers, timeout=15.0) as client:
-                # 1. トップページ取得
-                response = await client.get(base_url, timeout=10.0)
-                response.raise_for_status()
-                
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # 2. 記事リンクを探す
-                # 複数のパターンでトップ記事のリンクを探す
-                articles = soup.select('section.box-secondary article a') or soup.find_all('a', class_='index-link')
-                
-                target_url = ""
-                if articles:
-                     target_url = articles[0].get('href')
-                else:
-                    # フォールバック: /articles/ を含むリンクを探す
-                    links = soup.find_all('a')
-                    valid_links = [l.get('href') for l in links if l.get('href') and '/articles/' in l.get('href')]
-                    if valid_links:
-                        target_url = valid_links[0]
-                
-                if not target_url:
-                    raise Exception("記事リンクが見つかりませんでした")
-                
-                # 相対パスなら絶対パスに変換
-                if target_url.startswith('//'):
-                    target_url = "https:" + target_url
-                elif not target_url.startswith('http'):
-                    target_url = "https://mainichi.jp" + target_url.lstrip('/')
-                
-                # 3. 記事詳細取得
-                article_res = await client.get(target_url, timeout=10.0)
-                article_soup = BeautifulSoup(article_res.text, 'html.parser')
-                
-                # タイトル取得
-                title_tag = article_soup.find('h1')
-                title = title_tag.get_text(strip=True) if title_tag else "タイトル不明"
-                
-                # 本文取得
-                body = (
-                    article_soup.find('section', class_='main-text') or 
-                    article_soup.find('div', class_='main-text') or 
-                    article_soup.find('div', id='main-text') or
-                    article_soup.find('div', class_='article-body')
-                )
-                
-                content = ""
-                if body:
-                    content = body.get_text(strip=True)
-                else:
-                    # フォールバック: 長いPタグを集める
-                    paragraphs = article_soup.find_all('p')
-                    long_ps = [p.get_text(strip=True) for p in paragraphs if len(p.get_text(strip=True)) > 20]
-                    content = '\n'.join(long_ps[:10])  # 十分な量を取得
+            # 1. トップページ取得
+            response = await self.http.get(base_url, headers=headers, timeout=10.0)
+            response.raise_for_status()
+            
+            # 2. 記事リンクを探す
+            # 複数のパターンでトップ記事のリンクを探す（フォールバック: /articles/ を含むリンク）
+            links = await parse_pool.run(find_links, response.content, [
+                "//section[contains(concat(' ', @class, ' '), ' box-secondary ')]//article//a/@href",
+                "//a[contains(concat(' ', @class, ' '), ' index-link ')]/@href",
+                "//a[contains(@href, '/articles/')]/@href",
+            ])
+            target_url = links[0] if links else ""
+            
+            if not target_url:
+                raise Exception("記事リンクが見つかりませんでした")
+            
+            # 相対パスなら絶対パスに変換
+            target_url = urljoin(base_url, target_url)
+            
+            # 3. 記事詳細取得
+            _, extraction = await fetch_and_extract(self.http, target_url, headers=headers, timeout=10.0)
+            title = (extraction.title if extraction else "") or "タイトル不明"
+            content = extraction.text("\n") if extraction else ""
+            
+            if not content:
+                return None
                 
-                if not content:
-                    return None
-                    
-                return {
-                    "title": title,
-                    "content": content,
-                    "url": target_url
-                }
+            return {
+                "title": title,
+                "content": content,
+                "url": target_url
+            }
         
         except Exception as e:
             logger.error(f"Error fetching news: {e}")
             return None
     
-    async def fetch_random_news(self) -> Optional[Dict[str, str]]:
-        """
-        複数のニュースソースからランダムに記事を取得
-        毎日新聞が取得できない場合は、他のソースを試す
-        """
-        # ニュースソースのリスト（優先順位順）
-        sources = [
+    # fetch_random_news の各ソースの優先度（重み）。観測した成功率で補正して起動順を決める
+    SOURCE_WEIGHTS = {
+        "mainichi": 3.0,
+        "nhk_rss": 2.0,
+        "bbc_rss": 2.0,
+        "bbc": 1.0,
+        "nhk": 1.0,
+    }
+
+    def _news_sources(self) -> List[Tuple[str, Callable[[], Awaitable[Optional[Dict[str, str]]]]]]:
+        return [
             ("mainichi", self.fetch_top_news),
             ("nhk_rss", self._fetch_nhk_rss),
             ("bbc_rss", self._fetch_bbc_rss),
             ("bbc", self._fetch_bbc_news),
             ("nhk", self._fetch_nhk_news),
         ]
+
+    async def fetch_random_news(
+        self,
+        race: Optional[bool] = None,
+        category: Optional[str] = None,
+        max_age_hours: Optional[float] = None,
+    ) -> Optional[Dict[str, str]]:
+        """
+        複数のニュースソースからランダムに記事を取得
+
+        まずRSSポーラーが先読みした索引から、カテゴリーと新しさ（max_age_hours、既定 NEWS_INDEX_MAX_AGE_HOURS）
+        で絞り込んだ記事を選ぶ。索引に該当がなければライブ取得する。
+        race=True（既定、NEWS_RACE=0で無効化）の場合は複数ソースを時間差で並行に取得し、
+        最初に有効な記事を返したソースを採用して残りはキャンセルする。
+        race=False の場合は従来通り毎日新聞を優先して1つずつ順番に試す。
+        """
+        indexed = self.fetch_indexed_news(category=category, max_age_hours=max_age_hours)
+        if indexed:
+            return indexed
+        if category:
+            logger.info(f"索引にカテゴリー {category} の記事がないため、ライブ取得します（カテゴリー指定なし）")
+
+        if race is None:
+            race = os.getenv("NEWS_RACE", "1") != "0"
+        if race:
+            return await self._race_sources()
+
+        # ニュースソースのリスト（優先順位順）
+        sources = self._news_sources()
         
         # ランダムにソースを選ぶ（最初は毎日新聞を優先）
         shuffled_sources = [sources[0]] + random.sample(sources[1:], len(sources) - 1)
         
         for source_name, fetch_func in shuffled_sources:
-            try:
-                logger.info(f"ニュース取得を試行: {source_name}")
-                news_data = await fetch_func()
-                if news_data:
-                    logger.info(f"ニュース取得成功: {source_name} - {news_data.get('title', 'Unknown')}")
-                    return news_data
-            except Exception as e:
-                logger.warning(f"{source_name}からの取得に失敗: {e}")
-                continue
+            news_data = await self._timed_fetch(source_name, fetch_func)
+            if self._is_valid_article(news_data):
+                news_source_stats.record_win(source_name)
+                return news_data
         
         logger.error("すべてのニュースソースからの取得に失敗")
         return None
 
-    async def _fetch_nhk_rss(self) -> Optional[Dict[str, str]]:
+    def fetch_indexed_news(
+        self,
+        category: Optional[str] = None,
+        max_age_hours: Optional[float] = None,
+    ) -> Optional[Dict[str, str]]:
+        """索引から条件に合う記事を1件選ぶ（ネットワークアクセスなし）"""
+        if max_age_hours is None:
+            max_age_hours = float(os.getenv("NEWS_INDEX_MAX_AGE_HOURS", "48"))
+        try:
+            row = self.index.pick(category=category, max_age_hours=max_age_hours)
+        except Exception as e:
+            logger.warning(f"記事索引の検索に失敗: {e}")
+            return None
+        if not row:
+            return None
+        logger.info(f"索引から記事を選択: {row['source']}/{row['category']} - {row['title']}")
+        return {
+            "title": row["title"],
+            "content": row["content"],
+            "url": row["url"],
+            "category": row["category"],
+        }
+
+    @staticmethod
+    def _is_valid_article(news_data: Optional[Dict[str, str]]) -> bool:
+        return bool(news_data and len((news_data.get("content") or "").strip()) >= 50)
+
+    async def _timed_fetch(
+        self,
+        source_name: str,
+        fetch_func: Callable[[], Awaitable[Optional[Dict[str, str]]]],
+    ) -> Optional[Dict[str, str]]:
+        """1ソースの取得（例外はNoneに変換）。所要時間と成否を記録する"""
+        started = time.monotonic()
+        news_source_stats.record_attempt(source_name)
+        try:
+            logger.info(f"ニュース取得を試行: {source_name}")
+            news_data = await fetch_func()
+        except asyncio.CancelledError:
+            news_source_stats.record_cancelled(source_name)
+            raise
+        except Exception as e:
+            logger.warning(f"{source_name}からの取得に失敗: {e}")
+            news_data = None
+
+        elapsed = time.monotonic() - started
+        if self._is_valid_article(news_data):
+            news_source_stats.record_success(source_name, elapsed)
+            logger.info(f"ニュース取得成功: {source_name} ({elapsed:.1f}s) - {news_data.get('title', 'Unknown')}")
+            return news_data
+        news_source_stats.record_failure(source_name)
+        return None
+
+    async def _race_sources(self) -> Optional[Dict[str, str]]:
         """
-        NHK RSSから記事を取得（ページ取得が弾かれる環境のフォールバック）
-        - RSSのdescriptionは要約なので、記事本文が取れない場合はdescriptionをcontentとして返す
+        ソースを重み付きランダム順に時間差で起動し、最初に有効な記事を返したものを採用
+        - 先に起動したソースが失敗した場合は、待たずに次のソースを起動する
+        - 全体の上限時間（NEWS_RACE_TIMEOUT_SECONDS）を超えたら諦める
         """
-        rss_url = "https://www3.nhk.or.jp/rss/news/cat0.xml"
-        headers = self._get_headers(referer="https://www3.nhk.or.jp/news/")
+        stagger = float(os.getenv("NEWS_RACE_STAGGER_SECONDS", "1.0"))
+        deadline = time.monotonic() + float(os.getenv("NEWS_RACE_TIMEOUT_SECONDS", "25"))
+        order = news_source_stats.weighted_order(self._news_sources(), self.SOURCE_WEIGHTS)
+        running: Dict[asyncio.Task, str] = {}
+        next_index = 0
 
-        try:
-            async with httpx.AsyncClient(verify=False, headers=headers, timeout=15.0) as client:
-                res = await client.get(rss_url, follow_redirects=True)
-                res.raise_for_status()
-
-            # Railway環境ではlxmlが入らないことがあるため、標準ライブラリでRSS(XML)を解析する
-            root = ET.fromstring(res.text)
-            channel = root.find("channel")
-            if channel is None:
-                return None
-            item = channel.find("item")
-            if item is None:
-                return None
+        def _launch():
+            nonlocal next_index
+            source_name, fetch_func = order[next_index]
+            next_index += 1
+            running[asyncio.ensure_future(self._timed_fetch(source_name, fetch_func))] = source_name
 
-            def _txt(tag: str) -> str:
-                el = item.find(tag)
-                return (el.text or "").strip() if el is not None else ""
+        try:
+            _launch()
+            while running or next_index < len(order):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.error("ニュース取得がタイムアウトしました（全ソース）")
+                    return None
+                if not running:
+                    _launch()
+                    continue
 
-            title = _txt("title") or "NHK News"
-            link = _txt("link")
-            desc = _txt("description")
+                wait_for = min(stagger, remaining) if next_index < len(order) else remaining
+                done, _ = await asyncio.wait(running.keys(), timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # 時間差起動: 先行ソースがまだ終わらなければ次のソースも走らせる
+                    if next_index < len(order):
+                        _launch()
+                    continue
 
-            if link:
-                article = await self.scrape_article(link)
-                if article and article.get("content"):
-                    return article
+                for task in done:
+                    source_name = running.pop(task)
+                    news_data = task.result()
+                    if news_data:
+                        news_source_stats.record_win(source_name)
+                        return news_data
+                    if next_index < len(order):
+                        _launch()
 
-            # フォールバック：RSSのdescriptionを返す
-            if desc:
-                return {"title": title, "content": desc, "url": link or rss_url}
-            return None
-        except Exception as e:
-            logger.warning(f"NHK RSS取得エラー: {e}")
+            logger.error("すべてのニュースソースからの取得に失敗")
             return None
+        finally:
+            # 採用されなかった取得はキャンセル
+            for task in running:
+                task.cancel()
 
-    async def _fetch_bbc_rss(self) -> Optional[Dict[str, str]]:
+    # スイープ・定期取得の対象となるRSSフィード
+    # category は <category> を持たないフィードの既定カテゴリー
+    RSS_FEEDS = {
+        "nhk": {
+            "url": "https://www3.nhk.or.jp/rss/news/cat0.xml",
+            "referer": "https://www3.nhk.or.jp/news/",
+            "accept_language": None,
+            "category": "News",
+        },
+        "nhk_science": {
+            "url": "https://www3.nhk.or.jp/rss/news/cat3.xml",
+            "referer": "https://www3.nhk.or.jp/news/",
+            "accept_language": None,
+            "category": "Science",
+        },
+        "nhk_economy": {
+            "url": "https://www3.nhk.or.jp/rss/news/cat5.xml",
+            "referer": "https://www3.nhk.or.jp/news/",
+            "accept_language": None,
+            "category": "Business",
+        },
+        "nhk_sports": {
+            "url": "https://www3.nhk.or.jp/rss/news/cat7.xml",
+            "referer": "https://www3.nhk.or.jp/news/",
+            "accept_language": None,
+            "category": "Sports",
+        },
+        "bbc": {
+            "url": "https://feeds.bbci.co.uk/news/rss.xml",
+            "referer": "https://www.bbc.com/news",
+            "accept_language": "en-US,en;q=0.9",
+            "category": "News",
+        },
+        "bbc_tech": {
+            "url": "https://feeds.bbci.co.uk/news/technology/rss.xml",
+            "referer": "https://www.bbc.com/news",
+            "accept_language": "en-US,en;q=0.9",
+            "category": "Technology",
+        },
+        "mainichi": {
+            "url": "https://mainichi.jp/rss/etc/mainichi-flash.rss",
+            "referer": "https://mainichi.jp/",
+            "accept_language": None,
+            "category": "News",
+        },
+    }
+
+    # RSS 1.0(RDF) 形式のフィード用の名前空間
+    _RSS1_NS = "{http://purl.org/rss/1.0/}"
+    _DC_NS = "{http://purl.org/dc/elements/1.1/}"
+
+    async def fetch_rss_items(self, source: str, limit: Optional[int] = None) -> List[Dict[str, str]]:
         """
-        BBC RSSから記事を取得（ページ取得が弾かれる環境のフォールバック）
+        RSSフィードの<item>一覧を取得
+
+        Returns:
+            List of dicts with keys: title, link, description, pub_date, category
         """
-        rss_url = "https://feeds.bbci.co.uk/news/rss.xml"
-        headers = self._get_headers(referer="https://www.bbc.com/news", accept_language="en-US,en;q=0.9")
+        feed = self.RSS_FEEDS[source]
+        headers = self._get_headers(referer=feed["referer"], accept_language=feed["accept_language"])
 
-        try:
-            async with httpx.AsyncClient(verify=False, headers=headers, timeout=15.0) as client:
-                res = await client.get(rss_url, follow_redirects=True)
-                res.raise_for_status()
-
-            # Railway環境ではlxmlが入らないことがあるため、標準ライブラリでRSS(XML)を解析する
-            root = ET.fromstring(res.text)
-            channel = root.find("channel")
-            if channel is None:
-                return None
-            item = channel.find("item")
-            if item is None:
-                return None
+        res = await self.http.get(feed["url"], headers=headers, follow_redirects=True)
+        res.raise_for_status()
+
+        # Railway環境ではlxmlが入らないことがあるため、標準ライブラリでRSS(XML)を解析する
+        root = await parse_pool.run(ET.fromstring, res.text)
+        channel = root.find("channel")
+        if channel is not None and channel.findall("item"):
+            ns = ""
+            raw_items = channel.findall("item")
+        else:
+            # RSS 1.0 は <item> が <channel> の外（ルート直下）に並ぶ
+            ns = self._RSS1_NS
+            raw_items = root.findall(f"{ns}item")
+        if not raw_items:
+            return []
+
+        items = []
+        for item in raw_items[:limit]:
+            def _txt(*tags: str) -> str:
+                for tag in tags:
+                    el = item.find(tag)
+                    if el is not None and (el.text or "").strip():
+                        return el.text.strip()
+                return ""
+
+            items.append({
+                "title": _txt(f"{ns}title"),
+                "link": _txt(f"{ns}link"),
+                "description": _txt(f"{ns}description"),
+                "pub_date": _txt("pubDate", f"{self._DC_NS}date"),
+                "category": _txt("category", f"{self._DC_NS}subject") or feed.get("category", ""),
+            })
+        return items
+
+    async def _fetch_rss_first_article(self, source: str, default_title: str) -> Optional[Dict[str, str]]:
+        """
+        RSSの先頭記事を取得（ページ取得が弾かれる環境のフォールバック）
+        - RSSのdescriptionは要約なので、記事本文が取れない場合はdescriptionをcontentとして返す
+        """
+        items = await self.fetch_rss_items(source, limit=1)
+        if not items:
+            return None
+        item = items[0]
 
-            def _txt(tag: str) -> str:
-                el = item.find(tag)
-                return (el.text or "").strip() if el is not None else ""
+        title = item["title"] or default_title
+        link = item["link"]
+        desc = item["description"]
 
-            title = _txt("title") or "BBC News"
-            link = _txt("link")
-            desc = _txt("description")
+        if link:
+            article = await self.scrape_article(link)
+            if article and article.get("content"):
+                return article
 
-            if link:
-                article = await self.scrape_article(link)
-                if article and article.get("content"):
-                    return article
+        # フォールバック：RSSのdescriptionを返す
+        if desc:
+            return {"title": title, "content": desc, "url": link or self.RSS_FEEDS[source]["url"]}
+        return None
 
-            if desc:
-                return {"title": title, "content": desc, "url": link or rss_url}
+    async def _fetch_nhk_rss(self) -> Optional[Dict[str, str]]:
+        """NHK RSSから記事を取得"""
+        try:
+            return await self._fetch_rss_first_article("nhk", "NHK News")
+        except Exception as e:
+            logger.warning(f"NHK RSS取得エラー: {e}")
             return None
+
+    async def _fetch_bbc_rss(self) -> Optional[Dict[str, str]]:
+        """BBC RSSから記事を取得"""
+        try:
+            return await self._fetch_rss_first_article("bbc", "BBC News")
         except Exception as e:
             logger.warning(f"BBC RSS取得エラー: {e}")
             return None
@@ -334,33 +564,35 @@ class NewsService:
             # BBC Newsのトップページから記事を取得
             url = "https://www.bbc.com/news"
             headers = self._get_headers(referer=url, accept_language="en-US,en;q=0.9")
+            if domain_breaker.is_open(url):
+                return None
             
-            async with httpx.AsyncClient(verify=False, headers=headers, timeout=15.0) as client:
-                response = await client.get(url, follow_redirects=True)
-                response.raise_for_status()
-                
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # 記事リンクを探す
-                article_links = soup.find_all('a', {'data-testid': 'internal-link'}) or \
-                               soup.select('a[href*="/news/"]')
-                
-                if not article_links:
-                    return None
-                
-                # 最初の有効な記事リンクを取得
-                for link in article_links[:10]:  # 最初の10個を試す
-                    href = link.get('href', '')
-                    if href and '/news/' in href and href.count('/') >= 4:
-                        if not href.startswith('http'):
-                            href = f"https://www.bbc.com{href}"
-                        
-                        # 記事詳細を取得
-                        article = await self.scrape_article(href)
-                        if article:
-                            return article
-                
+            response = await self.http.get(url, headers=headers, follow_redirects=True)
+            response.raise_for_status()
+            
+            # 記事リンクを探す
+            article_links = await parse_pool.run(find_links, response.content, [
+                "//a[@data-testid='internal-link']/@href",
+                "//a[contains(@href, '/news/')]/@href",
+            ])
+            
+            if not article_links:
                 return None
+            
+            # 最初の有効な記事リンクを取得
+            for href in article_links[:10]:  # 最初の10個を試す
+                if href and '/news/' in href and href.count('/') >= 4:
+                    if not href.startswith('http'):
+                        href = f"https://www.bbc.com{href}"
+                    
+                    # 記事詳細を取得
+                    article = await self.scrape_article(href)
+                    if article:
+                        return article
+                    if domain_breaker.is_open(href):
+                        break
+            
+            return None
         except Exception as e:
             logger.warning(f"BBC News取得エラー: {e}")
             return None
@@ -372,33 +604,32 @@ class NewsService:
         try:
             url = "https://www3.nhk.or.jp/news/"
             headers = self._get_headers(referer=url)
+            if domain_breaker.is_open(url):
+                return None
             
-            async with httpx.AsyncClient(verify=False, headers=headers, timeout=15.0) as client:
-                response = await client.get(url, follow_redirects=True)
-                response.raise_for_status()
-                
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # 記事リンクを探す
-                article_links = soup.select('a[href*="/news/html/"]') or \
-                              soup.find_all('a', href=lambda x: x and '/news/html/' in x)
-                
-                if not article_links:
-                    return None
-                
-                # 最初の有効な記事リンクを取得
-                for link in article_links[:5]:
-                    href = link.get('href', '')
-                    if href:
-                        if not href.startswith('http'):
-                            href = f"https://www3.nhk.or.jp{href}"
-                        
-                        # 記事詳細を取得
-                        article = await self.scrape_article(href)
-                        if article:
-                            return article
-                
+            response = await self.http.get(url, headers=headers, follow_redirects=True)
+            response.raise_for_status()
+            
+            # 記事リンクを探す
+            article_links = await parse_pool.run(find_links, response.content, ["//a[contains(@href, '/news/html/')]/@href"])
+            
+            if not article_links:
                 return None
+            
+            # 最初の有効な記事リンクを取得
+            for href in article_links[:5]:
+                if href:
+                    if not href.startswith('http'):
+                        href = f"https://www3.nhk.or.jp{href}"
+                    
+                    # 記事詳細を取得
+                    article = await self.scrape_article(href)
+                    if article:
+                        return article
+                    if domain_breaker.is_open(href):
+                        break
+            
+            return None
         except Exception as e:
             logger.warning(f"NHK News取得エラー: {e}")
             return None
@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, TypeVar
+
+from app.services.llm_hedging import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ParsePool:
+    """
+    HTML/XMLのパースをイベントループの外（スレッドプール）で実行する
+
+    - lxmlはパース中にGILを解放するため、スレッドでも他のリクエストの処理を止めない
+      （プロセスプールだと逐次パーサーの状態を持ち越せず、HTML全体のコピーも必要になる）
+    - lxmlの逐次パーサーは作成したスレッド以外から feed するとメモリが壊れるため、
+      ワーカーは1スレッドずつの「レーン」にし、同じ文書のジョブは lane() で固定したレーンで実行する
+    - 同時に投入できるジョブ数を max_pending に制限し、超えた分は空きが出るまで待たせる
+    - 待ち行列の長さ・待ち時間・パース時間を /health に出す
+    """
+
+    def __init__(
+        self,
+        workers: int = int(os.getenv("HTML_PARSE_WORKERS", "2")),
+        max_pending: int = int(os.getenv("HTML_PARSE_MAX_PENDING", "32")),
+    ):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._lanes: List[ThreadPoolExecutor] = []
+        self._lane_pending: List[int] = [0] * workers
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._slots_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._stats = {"jobs": 0, "errors": 0, "max_queue_depth": 0}
+        self._parse_time = LatencyTracker(window=500)
+        self._wait_time = LatencyTracker(window=500)
+
+    def _lane_executor(self, lane: int) -> ThreadPoolExecutor:
+        if not self._lanes:
+            self._lanes = [
+                ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"html-parse-{i}")
+                for i in range(self.workers)
+            ]
+        return self._lanes[lane]
+
+    def lane(self) -> int:
+        """ジョブの少ないレーンを選ぶ（逐次パーサーを使う一連のジョブはこのレーンに固定する）"""
+        return min(range(self.workers), key=lambda i: self._lane_pending[i])
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # イベントループごとに作り直す（CLIスクリプトで asyncio.run を複数回呼ぶ場合など）
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self.max_pending)
+            self._slots_loop = loop
+        return self._slots
+
+    async def run(self, fn: Callable[..., T], *args, lane: Optional[int] = None) -> T:
+        """fn(*args) をワーカースレッドで実行して結果を返す（lane 省略時は空いているレーン）"""
+        enqueued = time.perf_counter()
+        with self._lock:
+            self._queued += 1
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._queued)
+
+        def _job() -> T:
+            started = time.perf_counter()
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+            self._wait_time.record(started - enqueued)
+            try:
+                return fn(*args)
+            finally:
+                self._parse_time.record(time.perf_counter() - started)
+                with self._lock:
+                    self._running -= 1
+
+        slots = self._semaphore()
+        try:
+            await slots.acquire()
+        except BaseException:
+            with self._lock:
+                self._queued -= 1
+            raise
+        loop = asyncio.get_running_loop()
+        if lane is None:
+            lane = self.lane()
+        with self._lock:
+            self._lane_pending[lane] += 1
+        try:
+            future = self._lane_executor(lane).submit(_job)
+        except BaseException:
+            with self._lock:
+                self._queued -= 1
+                self._lane_pending[lane] -= 1
+            slots.release()
+            raise
+
+        def _done(f):
+            with self._lock:
+                self._lane_pending[lane] -= 1
+            if f.cancelled():
+                # 開始前にキャンセルされたジョブ（呼び出し側のキャンセル）
+                with self._lock:
+                    self._queued -= 1
+            # 呼び出し側がキャンセルされても、実行中のジョブが終わるまで枠は返さない
+            try:
+                loop.call_soon_threadsafe(slots.release)
+            except RuntimeError:
+                pass  # イベントループが既に閉じている
+
+        future.add_done_callback(_done)
+        self._stats["jobs"] += 1
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._stats["errors"] += 1
+            raise
+
+    def shutdown(self):
+        for executor in self._lanes:
+            executor.shutdown(wait=False, cancel_futures=True)
+        self._lanes = []
+        self._lane_pending = [0] * self.workers
+
+    def snapshot(self) -> Dict:
+        """/health 表示用"""
+        parse_p50 = self._parse_time.percentile(50)
+        parse_p95 = self._parse_time.percentile(95)
+        wait_p95 = self._wait_time.percentile(95)
+        return {
+            **self._stats,
+            "workers": self.workers,
+            "queue_depth": self._queued,
+            "running": self._running,
+            "parse_ms_p50": round(parse_p50 * 1000, 2) if parse_p50 is not None else None,
+            "parse_ms_p95": round(parse_p95 * 1000, 2) if parse_p95 is not None else None,
+            "wait_ms_p95": round(wait_p95 * 1000, 2) if wait_p95 is not None else None,
+        }
+
+
+# 記事本文の抽出・リンク抽出・RSS解析で共有する
+parse_pool = ParsePool()
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional
+
+from app.services.article_index import ArticleIndex
+from app.services.near_duplicates import NearDuplicateIndex
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_pub_date(value: str) -> Optional[float]:
+    """RSSの pubDate（RFC 822）/ dc:date（ISO 8601）をUNIX時刻に変換"""
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        pass
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+class RssPoller:
+    """
+    RSSフィードを定期的に取得し、新着記事を先読みしてローカル索引に保存するバックグラウンドタスク
+
+    - 既に索引にあるURLはスクレイピングしない
+    - 別ソースの同じニュース（本文がほぼ同じ記事）は索引に入れない
+    - 本文のスクレイピングはホスト負荷を考えて同時数を制限する
+    - 古い記事は retention_days を過ぎたら削除する
+    """
+
+    def __init__(
+        self,
+        news_service,
+        index: ArticleIndex,
+        feeds: Optional[List[str]] = None,
+        interval_seconds: float = float(os.getenv("RSS_POLL_INTERVAL_SECONDS", "900")),
+        scrape_concurrency: int = int(os.getenv("RSS_POLL_SCRAPE_CONCURRENCY", "3")),
+        items_per_feed: int = int(os.getenv("RSS_POLL_ITEMS_PER_FEED", "20")),
+        retention_days: float = float(os.getenv("ARTICLE_INDEX_RETENTION_DAYS", "14")),
+    ):
+        self.news_service = news_service
+        self.index = index
+        env_feeds = os.getenv("RSS_POLL_FEEDS")
+        self.feeds = feeds or (env_feeds.split(",") if env_feeds else list(news_service.RSS_FEEDS))
+        self.interval_seconds = interval_seconds
+        self.scrape_concurrency = scrape_concurrency
+        self.items_per_feed = items_per_feed
+        self.retention_days = retention_days
+        self._task: Optional[asyncio.Task] = None
+        self._stats: Dict[str, Dict] = {}
+        self._last_poll_at: Optional[float] = None
+        self.duplicates = NearDuplicateIndex()
+        self._duplicates_seeded = False
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.poll_once()
+            except Exception as e:
+                logger.error(f"[RssPoller] poll failed: {e}", exc_info=True)
+            await asyncio.sleep(self.interval_seconds)
+
+    async def poll_once(self) -> int:
+        """全フィードを1回取得し、新着記事を索引に追加。追加件数を返す"""
+        started = time.monotonic()
+        if not self._duplicates_seeded:
+            # 再起動前に索引へ入れた記事の署名を作り直す（CPU処理のためスレッドで）
+            await asyncio.get_running_loop().run_in_executor(None, self._seed_duplicates)
+            self._duplicates_seeded = True
+        sem = asyncio.Semaphore(self.scrape_concurrency)
+        results = await asyncio.gather(
+            *[self._poll_feed(feed, sem) for feed in self.feeds],
+            return_exceptions=True,
+        )
+        added = 0
+        for feed, result in zip(self.feeds, results):
+            stats = self._stats.setdefault(feed, {"polls": 0, "errors": 0, "added": 0})
+            stats["polls"] += 1
+            if isinstance(result, BaseException):
+                stats["errors"] += 1
+                stats["last_error"] = str(result)[:200]
+                logger.warning(f"[RssPoller] {feed}: {result}")
+            else:
+                stats["added"] += result
+                added += result
+
+        pruned = self.index.prune(self.retention_days)
+        self._last_poll_at = time.time()
+        logger.info(f"[RssPoller] added {added} articles (pruned {pruned}) in {time.monotonic() - started:.1f}s")
+        return added
+
+    async def _poll_feed(self, feed: str, sem: asyncio.Semaphore) -> int:
+        items = await self.news_service.fetch_rss_items(feed, limit=self.items_per_feed)
+        # 重複として見送った記事も署名は残っているため、次回以降はスクレイピングしない
+        new_items = [
+            item for item in items
+            if item["link"] and item["link"] not in self.duplicates and not self.index.has(item["link"])
+        ]
+
+        async def _ingest(item: Dict[str, str]) -> bool:
+            async with sem:
+                article = await self.news_service.scrape_article(item["link"], max_retries=1)
+            if not article or len(article.get("content") or "") < 50:
+                return False
+            signature = self.duplicates.signature(article["content"])
+            match = self.duplicates.find(signature=signature)
+            self.duplicates.add(item["link"], signature=signature)
+            if match is not None:
+                logger.info(f"[RssPoller] {item['link']}: near-duplicate of {match[0]} (similarity={match[1]:.2f}), skipped")
+                return False
+            return self.index.add(
+                url=item["link"],
+                source=feed.split("_")[0],
+                category=item.get("category", ""),
+                title=item["title"] or article["title"],
+                content=article["content"],
+                published_at=_parse_pub_date(item["pub_date"]),
+            )
+
+        added = await asyncio.gather(*[_ingest(item) for item in new_items])
+        return sum(1 for ok in added if ok)
+
+    def _seed_duplicates(self):
+        window_hours = self.duplicates.window_seconds / 3600
+        rows = self.index.search(max_age_hours=window_hours, limit=self.duplicates.max_entries)
+        # 新しい順に返るため、古いものから登録する（上限を超えたら古い方から捨てられるように）
+        for row in reversed(rows):
+            self.duplicates.add(row["url"], row["content"])
+        logger.info(f"[RssPoller] seeded {len(rows)} article fingerprints")
+
+    def snapshot(self) -> Dict:
+        """/health 表示用"""
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "interval_seconds": self.interval_seconds,
+            "last_poll_age_seconds": round(time.time() - self._last_poll_at) if self._last_poll_at else None,
+            "feeds": self._stats,
+            "near_duplicates": self.duplicates.snapshot(),
+        }
@@ -0,0 +1,369 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data", "sessions.db")
+
+
+# 同じレッスンを練習する全員で同一になる項目（記事本文・質問・レッスン情報）。
+# セッションごとにはコピーせず、内容のハッシュで共有テーブルを参照する
+SHARED_FIELDS = ("article_url", "article_title", "article_content", "question", "topic", "lesson_data")
+
+
+def content_key(value: Dict) -> str:
+    return hashlib.blake2b(
+        json.dumps(value, sort_keys=True, ensure_ascii=False).encode("utf-8"), digest_size=16
+    ).hexdigest()
+
+
+class ContentTable:
+    """内容のハッシュ → 値 の参照カウント付きテーブル（参照がなくなったら捨てる）"""
+
+    def __init__(self):
+        # key -> [value, 参照数]
+        self._items: Dict[str, list] = {}
+        self._refs = 0
+
+    def acquire(self, value: Dict) -> str:
+        key = content_key(value)
+        item = self._items.get(key)
+        if item is None:
+            self._items[key] = [value, 1]
+        else:
+            item[1] += 1
+        self._refs += 1
+        return key
+
+    def get(self, key: str) -> Optional[Dict]:
+        item = self._items.get(key)
+        return item[0] if item is not None else None
+
+    def release(self, key: Optional[str]):
+        item = self._items.get(key) if key else None
+        if item is None:
+            return
+        self._refs -= 1
+        item[1] -= 1
+        if item[1] <= 0:
+            del self._items[key]
+
+    def snapshot(self) -> Dict:
+        return {"contents": len(self._items), "references": self._refs}
+
+
+class SessionStore(ABC):
+    """
+    /api/session の会話セッション（記事本文・質問・レッスン情報）の保存先
+
+    - get / put / add / delete は同期処理（どの実装も1件あたり1ms未満）。
+      async のハンドラーからは aget / aput / aadd / adelete / asnapshot を使う（SQLite実装は、他ワーカーの
+      書き込みのロック待ちでイベントループを止めないよう、ストア専用のスレッドで実行する）
+    - 最後に使われてから ttl_seconds を過ぎたセッションは見つからない扱いにする
+    - shared_fields の項目は内容ごとに1つだけ保存し、セッションはそのハッシュを持つ
+      （get が返す dict の共有部分は他のセッションと同じオブジェクトのため、書き換えないこと）
+    """
+
+    def __init__(self, ttl_seconds: float, shared_fields: Sequence[str] = SHARED_FIELDS):
+        self.ttl_seconds = ttl_seconds
+        self.shared_fields = tuple(shared_fields)
+        self._stats = {"hits": 0, "misses": 0, "puts": 0, "expired": 0}
+
+    def _split(self, data: Dict) -> Tuple[Dict, Optional[Dict]]:
+        """(セッション固有の項目, 共有する項目) に分ける"""
+        shared = {k: data[k] for k in self.shared_fields if k in data}
+        own = {k: v for k, v in data.items() if k not in shared}
+        return own, (shared or None)
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def put(self, session_id: str, data: Dict):
+        ...
+
+    @abstractmethod
+    def add(self, session_id: str, data: Dict) -> bool:
+        """
+        まだない（または期限切れの）ときだけ保存し、保存したら True を返す
+        （複数のワーカーで1回だけ行う処理の印に使う）
+        """
+        ...
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        ...
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    async def _offload(self, fn: Callable, *args):
+        """同期処理を実行する（メモリ上の実装はそのまま、I/Oのある実装はスレッドで）"""
+        return fn(*args)
+
+    async def aget(self, session_id: str) -> Optional[Dict]:
+        return await self._offload(self.get, session_id)
+
+    async def aput(self, session_id: str, data: Dict):
+        await self._offload(self.put, session_id, data)
+
+    async def aadd(self, session_id: str, data: Dict) -> bool:
+        return await self._offload(self.add, session_id, data)
+
+    async def adelete(self, session_id: str):
+        await self._offload(self.delete, session_id)
+
+    async def asnapshot(self) -> Dict:
+        return await self._offload(self.snapshot)
+
+    def close(self):
+        pass
+
+    def snapshot(self) -> Dict:
+        """/health 表示用"""
+        return {
+            "backend": type(self).__name__,
+            "sessions": len(self),
+            "ttl_seconds": self.ttl_seconds,
+            **self._stats,
+        }
+
+
+class MemorySessionStore(SessionStore):
+    """
+    プロセス内のLRU + TTLストア（1ワーカー構成・開発用）
+
+    max_sessions を超えたら最も長く使われていないセッションから捨てる。
+    再起動で消え、複数ワーカー間では共有されない。
+    """
+
+    def __init__(self, ttl_seconds: float, max_sessions: int, shared_fields: Sequence[str] = SHARED_FIELDS):
+        super().__init__(ttl_seconds, shared_fields)
+        self.max_sessions = max_sessions
+        self.contents = ContentTable()
+        # session_id -> (最終アクセス時刻, 共有部分のキー, セッション固有の項目)
+        self._sessions: "OrderedDict[str, Tuple[float, Optional[str], Dict]]" = OrderedDict()
+
+    def _drop(self, session_id: str):
+        entry = self._sessions.pop(session_id, None)
+        if entry is not None:
+            self.contents.release(entry[1])
+
+    def _evict_expired(self, now: float):
+        # 最終アクセス順に並んでいるため、先頭から期限切れのものだけ見ればよい
+        while self._sessions:
+            session_id, (touched_at, _, _) = next(iter(self._sessions.items()))
+            if now - touched_at <= self.ttl_seconds:
+                break
+            self._drop(session_id)
+            self._stats["expired"] += 1
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        now = time.time()
+        self._evict_expired(now)
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            self._stats["misses"] += 1
+            return None
+        self._stats["hits"] += 1
+        _, key, own = entry
+        self._sessions[session_id] = (now, key, own)
+        self._sessions.move_to_end(session_id)
+        shared = self.contents.get(key) if key else None
+        return {**shared, **own} if shared else dict(own)
+
+    def put(self, session_id: str, data: Dict):
+        now = time.time()
+        self._evict_expired(now)
+        self._stats["puts"] += 1
+        own, shared = self._split(data)
+        key = self.contents.acquire(shared) if shared else None
+        self._drop(session_id)
+        self._sessions[session_id] = (now, key, own)
+        while len(self._sessions) > self.max_sessions:
+            self._drop(next(iter(self._sessions)))
+
+    def add(self, session_id: str, data: Dict) -> bool:
+        self._evict_expired(time.time())
+        if session_id in self._sessions:
+            return False
+        self.put(session_id, data)
+        return True
+
+    def delete(self, session_id: str):
+        self._drop(session_id)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def snapshot(self) -> Dict:
+        return {**super().snapshot(), "max_sessions": self.max_sessions, **self.contents.snapshot()}
+
+
+class SqliteSessionStore(SessionStore):
+    """
+    SQLiteファイルに保存するストア（複数のuvicornワーカー・再起動をまたいで共有）
+
+    - WALモードで、読み込みは他ワーカーの書き込みを待たない
+    - 共有部分は contents テーブルに内容のハッシュをキーとして1行だけ保存する
+    - 期限切れの行は get 時に無視し、put のついでに定期的に削除する（どのセッションからも
+      参照されなくなった contents の行もこのとき削除する）
+    """
+
+    PRUNE_INTERVAL_SECONDS = 300
+
+    def __init__(self, ttl_seconds: float, path: Optional[str] = None, shared_fields: Sequence[str] = SHARED_FIELDS):
+        super().__init__(ttl_seconds, shared_fields)
+        self.path = path or os.getenv("SESSION_STORE_PATH") or _DEFAULT_PATH
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        # 接続はロックで1つずつ使うため、実行するスレッドも1本にする（既定のスレッドプールのNotion保存などを待たない）
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-store")
+
+    async def _offload(self, fn: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _connection(self) -> sqlite3.Connection:
+        # 初回利用時に接続（import時にファイルを作らないため）
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "id TEXT PRIMARY KEY, data TEXT NOT NULL, touched_at REAL NOT NULL, content_hash TEXT)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+            if "content_hash" not in columns:
+                # 共有テーブル導入前に作ったDB
+                conn.execute("ALTER TABLE sessions ADD COLUMN content_hash TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_touched ON sessions(touched_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_content ON sessions(content_hash)")
+            conn.execute("CREATE TABLE IF NOT EXISTS contents (hash TEXT PRIMARY KEY, data TEXT NOT NULL)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT s.data, c.data FROM sessions s LEFT JOIN contents c ON c.hash = s.content_hash "
+                "WHERE s.id = ? AND s.touched_at >= ?",
+                (session_id, now - self.ttl_seconds),
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE sessions SET touched_at = ? WHERE id = ?", (now, session_id))
+                conn.commit()
+        if row is None:
+            self._stats["misses"] += 1
+            return None
+        self._stats["hits"] += 1
+        own = json.loads(row[0])
+        return {**json.loads(row[1]), **own} if row[1] else own
+
+    def put(self, session_id: str, data: Dict):
+        now = time.time()
+        own, shared = self._split(data)
+        key = content_key(shared) if shared else None
+        with self._lock:
+            conn = self._connection()
+            if shared:
+                conn.execute(
+                    "INSERT OR IGNORE INTO contents (hash, data) VALUES (?, ?)",
+                    (key, json.dumps(shared, ensure_ascii=False)),
+                )
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (id, data, touched_at, content_hash) VALUES (?, ?, ?, ?)",
+                (session_id, json.dumps(own, ensure_ascii=False), now, key),
+            )
+            if now - self._last_prune > self.PRUNE_INTERVAL_SECONDS:
+                cur = conn.execute("DELETE FROM sessions WHERE touched_at < ?", (now - self.ttl_seconds,))
+                self._stats["expired"] += cur.rowcount
+                conn.execute(
+                    "DELETE FROM contents WHERE hash NOT IN "
+                    "(SELECT content_hash FROM sessions WHERE content_hash IS NOT NULL)"
+                )
+                self._last_prune = now
+            conn.commit()
+        self._stats["puts"] += 1
+
+    def add(self, session_id: str, data: Dict) -> bool:
+        now = time.time()
+        own, shared = self._split(data)
+        key = content_key(shared) if shared else None
+        with self._lock:
+            conn = self._connection()
+            if shared:
+                conn.execute(
+                    "INSERT OR IGNORE INTO contents (hash, data) VALUES (?, ?)",
+                    (key, json.dumps(shared, ensure_ascii=False)),
+                )
+            # 期限切れの行だけ上書きする（有効な行があれば何もせず rowcount は0）
+            cur = conn.execute(
+                "INSERT INTO sessions (id, data, touched_at, content_hash) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET data = excluded.data, touched_at = excluded.touched_at, "
+                "content_hash = excluded.content_hash WHERE sessions.touched_at < ?",
+                (session_id, json.dumps(own, ensure_ascii=False), now, key, now - self.ttl_seconds),
+            )
+            conn.commit()
+        added = cur.rowcount > 0
+        if added:
+            self._stats["puts"] += 1
+        return added
+
+    def delete(self, session_id: str):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection().execute(
+                "SELECT COUNT(*) FROM sessions WHERE touched_at >= ?",
+                (time.time() - self.ttl_seconds,),
+            ).fetchone()[0]
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            contents = self._connection().execute("SELECT COUNT(*) FROM contents").fetchone()[0]
+        return {**super().snapshot(), "path": self.path, "contents": contents}
+
+
+def create_session_store(backend: Optional[str] = None) -> SessionStore:
+    """SESSION_STORE（sqlite / memory）に応じたストアを作る"""
+    backend = (backend or os.getenv("SESSION_STORE", "sqlite")).lower()
+    ttl_seconds = float(os.getenv("SESSION_TTL_SECONDS", str(24 * 3600)))
+    if backend == "memory":
+        return MemorySessionStore(ttl_seconds, int(os.getenv("SESSION_MAX_SESSIONS", "10000")))
+    if backend != "sqlite":
+        logger.warning(f"[SessionStore] unknown SESSION_STORE={backend!r}, using sqlite")
+    return SqliteSessionStore(ttl_seconds)
+
+
+# /api/session のルートとヘルスチェックで共有する
+session_store = create_session_store()
@@ -0,0 +1,171 @@
+import copy
+import json
+import logging
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+from app.models.schemas import FeedbackItem, LessonOption
+
+logger = logging.getLogger(__name__)
+
+
+def _strictify(node: Any) -> Any:
+    """Pydanticのスキーマを Structured Outputs の strict モードで使える形に変換"""
+    if isinstance(node, list):
+        return [_strictify(n) for n in node]
+    if not isinstance(node, dict):
+        return node
+    out = {}
+    for key, value in node.items():
+        if key in ("title", "default"):
+            # スキーマのキーワード（表示名・既定値）は strict モードで使えないため除く
+            continue
+        if key in ("properties", "$defs") and isinstance(value, dict):
+            # プロパティ名・定義名はキーワードではない（"title" という名前のプロパティも残す）
+            out[key] = {name: _strictify(sub) for name, sub in value.items()}
+        else:
+            out[key] = _strictify(value)
+    if out.get("type") == "object" and "properties" in out:
+        # strict モードでは全プロパティ必須・追加プロパティ禁止
+        out["required"] = list(out["properties"].keys())
+        out["additionalProperties"] = False
+    return out
+
+
+def _model_schema(model: Type[BaseModel], exclude: Iterable[str]) -> Dict:
+    """モデルのJSONスキーマから、バックエンド側で付与するフィールドを除いたもの"""
+    schema = copy.deepcopy(model.model_json_schema())
+    for field in exclude:
+        schema["properties"].pop(field, None)
+    return _strictify(schema)
+
+
+def _response_format(name: str, list_key: str, model: Type[BaseModel], exclude: Iterable[str]) -> Dict:
+    item_schema = _model_schema(model, exclude)
+    defs = item_schema.pop("$defs", None)
+    root = {
+        "type": "object",
+        "properties": {list_key: {"type": "array", "items": item_schema}},
+        "required": [list_key],
+        "additionalProperties": False,
+    }
+    if defs:
+        root["$defs"] = defs
+    return {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": root}}
+
+
+# date / japanese_title はプロンプトに含めずパース後に付与する（プレフィックスキャッシュのため）
+LESSON_BACKEND_FIELDS = ("date", "japanese_title")
+# status / session_id はセッション側で付与する
+FEEDBACK_BACKEND_FIELDS = ("status", "session_id")
+
+LESSON_RESPONSE_FORMAT = _response_format("english_lessons", "lessons", LessonOption, LESSON_BACKEND_FIELDS)
+FEEDBACK_RESPONSE_FORMAT = _response_format("speech_feedback", "feedback", FeedbackItem, FEEDBACK_BACKEND_FIELDS)
+
+
+def _strip_fences(text: str) -> str:
+    text = text.strip()
+    m = re.search(r"```(?:json)?\s*(.*?)(?:```|$)", text, re.DOTALL)
+    if m and not text.startswith(("{", "[")):
+        text = m.group(1).strip()
+    # JSONの前置き文章を除く
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    return text[min(starts):] if starts else text
+
+
+def _close(text: str, stack: List[str], in_string: bool) -> str:
+    closing = '"' if in_string else ""
+    return text + closing + "".join("}" if c == "{" else "]" for c in reversed(stack))
+
+
+def _scan(text: str) -> Tuple[List[str], bool, List[Tuple[int, List[str]]]]:
+    """
+    括弧の対応と文字列の状態を追跡し、末尾の状態と
+    「ここで切れば直前の要素までが完結している」位置（文字列外のカンマ）を返す
+    """
+    stack: List[str] = []
+    in_string = False
+    escaped = False
+    cut_points: List[Tuple[int, List[str]]] = []
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append(ch)
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+        elif ch == ",":
+            cut_points.append((i, list(stack)))
+    return stack, in_string, cut_points
+
+
+def repair_json(text: str, max_attempts: int = 50) -> Optional[Any]:
+    """
+    途中で切れた/軽微に壊れたJSONをローカルで修復してパースする
+    （コードフェンス・前置き文・末尾カンマ・閉じ括弧の欠落・途中で切れた最後の要素）
+    修復できなければ None
+    """
+    text = _strip_fences(text)
+    # 末尾カンマ（,} ,]）を除去
+    text = re.sub(r",\s*([}\]])", r"\1", text)
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+
+    stack, in_string, cut_points = _scan(text)
+    candidates = [_close(text.rstrip().rstrip(","), stack, in_string)]
+    # 最後の要素が途中で切れている場合は、完結している要素までで切って閉じる
+    for pos, cut_stack in reversed(cut_points[-max_attempts:]):
+        candidates.append(_close(text[:pos], cut_stack, False))
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+def parse_json_output(content: str, method: str) -> Tuple[Optional[Any], str]:
+    """
+    LLMのJSON出力をパース。失敗時はローカル修復を試みる
+    Returns: (データ, "ok" | "repaired" | "failed")
+    """
+    try:
+        return json.loads(content), "ok"
+    except json.JSONDecodeError as e:
+        data = repair_json(content)
+        if data is None:
+            logger.warning(f"[StructuredOutput] {method}: unrepairable JSON ({e}); head={content[:120]!r}")
+            return None, "failed"
+        logger.info(f"[StructuredOutput] {method}: repaired malformed JSON ({e})")
+        return data, "repaired"
+
+
+def validate_items(model: Type[BaseModel], items: List[Any], defaults: Optional[Dict] = None) -> List[Dict]:
+    """
+    スキーマに合わない項目を除外（途中で切れて必須キーが欠けた最後の要素など）
+    defaults はバックエンド側で後から付与するフィールドの仮の値
+    """
+    valid = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            model.model_validate({**(defaults or {}), **item})
+        except ValidationError as e:
+            logger.info(f"[StructuredOutput] dropped invalid {model.__name__}: {e.error_count()} errors")
+            continue
+        valid.append(item)
+    return valid
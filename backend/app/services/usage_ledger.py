@@ -0,0 +1,323 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data", "usage.db"
+)
+
+MONTH_PROPERTY = "Whisper Usage Minutes (This Month)"
+TOTAL_PROPERTY = "Whisper Usage Minutes (Total)"
+LAST_USED_PROPERTY = "Last Whisper Usage Date"
+
+
+def _month(now: Optional[datetime] = None) -> str:
+    return (now or datetime.now()).strftime("%Y-%m")
+
+
+class UsageLedger:
+    """
+    Whisper使用分数の台帳（SQLite）。Notionのユーザーには、まとめて後から書き込む
+
+    - 加算は1つのUPDATE文（minutes = minutes + ?）で行うため、同時のリクエスト・複数ワーカーでも失われない
+    - ユーザーごとに今月の分数と累計を持ち、Notionの値を読むのはユーザーごとに最初の1回だけ（台帳の初期値）
+    - Notionへは「差分」ではなく台帳の値そのもの（今月・累計・最終利用日時）を書くため、
+      何回分の加算でも1回の pages.update にまとまり、同じ値を2回書いても壊れない
+    - 書き込みは flush_interval_seconds ごと、またはユーザーの未反映分が flush_threshold_minutes を超えたとき
+    - Notionが読めなかったユーザーの加算も台帳には記録し、Notionの初期値が読めるまで書き込みを保留する
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        flush_interval_seconds: float = float(os.getenv("USAGE_FLUSH_INTERVAL_SECONDS", "60")),
+        flush_threshold_minutes: float = float(os.getenv("USAGE_FLUSH_THRESHOLD_MINUTES", "5")),
+    ):
+        self.path = path or os.getenv("USAGE_LEDGER_PATH") or _DEFAULT_PATH
+        self.flush_interval_seconds = flush_interval_seconds
+        self.flush_threshold_minutes = flush_threshold_minutes
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        # SQLiteの処理は専用スレッドで実行する（他ワーカーの書き込みのロック待ちでイベントループを止めない）
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="usage-ledger")
+        self._client = None
+        self._seed_locks: Dict[str, asyncio.Lock] = {}
+        self._seed_failed_at: Dict[str, float] = {}
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {
+            "adds": 0, "flushes": 0, "notion_writes": 0, "coalesced_adds": 0,
+            "flush_errors": 0, "seeds": 0, "seed_errors": 0,
+        }
+
+    # ------------------------------------------------------------ SQLite
+
+    def _connection(self) -> sqlite3.Connection:
+        # 初回利用時に接続（import時にファイルを作らないため）
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS usage ("
+                "email TEXT PRIMARY KEY, month TEXT NOT NULL, "
+                "month_minutes REAL NOT NULL DEFAULT 0, total_minutes REAL NOT NULL DEFAULT 0, "
+                "last_used_at TEXT, page_id TEXT, seeded INTEGER NOT NULL DEFAULT 0, "
+                "version INTEGER NOT NULL DEFAULT 0, flushed_version INTEGER NOT NULL DEFAULT 0, "
+                "unflushed_minutes REAL NOT NULL DEFAULT 0)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    async def _offload(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _row(self, email: str) -> Optional[tuple]:
+        with self._lock:
+            return self._connection().execute(
+                "SELECT month, month_minutes, seeded, unflushed_minutes FROM usage WHERE email = ?", (email,)
+            ).fetchone()
+
+    # ------------------------------------------------------------ Notion
+
+    def _notion(self):
+        if self._client is None:
+            from notion_client import Client
+            self._client = Client(auth=os.getenv("NOTION_TOKEN"))
+        return self._client
+
+    def _fetch_user(self, email: str) -> Tuple[Optional[str], float, float, Optional[str]]:
+        """Notionのユーザーの (page_id, 今月の分数, 累計, 最終利用日時)（見つからなければ page_id は None）"""
+        response = self._notion().databases.query(
+            database_id=os.getenv("NOTION_USER_DATABASE_ID"),
+            filter={"property": "Email", "rich_text": {"equals": email}},
+        )
+        if not response.get("results"):
+            return None, 0.0, 0.0, None
+        user = response["results"][0]
+        props = user["properties"]
+        month_minutes = props.get(MONTH_PROPERTY, {}).get("number") or 0.0
+        total_minutes = props.get(TOTAL_PROPERTY, {}).get("number") or 0.0
+        last_used = (props.get(LAST_USED_PROPERTY, {}).get("date") or {}).get("start")
+        return user["id"], float(month_minutes), float(total_minutes), last_used
+
+    def _write_user(self, page_id: str, month_minutes: float, total_minutes: float, last_used_at: Optional[str]):
+        properties = {
+            MONTH_PROPERTY: {"number": round(month_minutes, 4)},
+            TOTAL_PROPERTY: {"number": round(total_minutes, 4)},
+        }
+        if last_used_at:
+            properties[LAST_USED_PROPERTY] = {"date": {"start": last_used_at}}
+        self._notion().pages.update(page_id=page_id, properties=properties)
+
+    # ------------------------------------------------------------ 台帳
+
+    async def _ensure_seeded(self, email: str):
+        """Notionにある今までの使用量を台帳の初期値として取り込む（ユーザーごとに1回）"""
+        row = await self._offload(self._row, email)
+        if row is not None and row[2]:
+            return
+        failed_at = self._seed_failed_at.get(email)
+        if failed_at is not None and time.monotonic() - failed_at < self.flush_interval_seconds:
+            return  # Notionが失敗したばかり（リクエストごとに待たせない）
+
+        lock = self._seed_locks.setdefault(email, asyncio.Lock())
+        async with lock:
+            row = await self._offload(self._row, email)
+            if row is not None and row[2]:
+                return
+            try:
+                page_id, notion_month, notion_total, last_used = await asyncio.get_running_loop().run_in_executor(
+                    None, self._fetch_user, email
+                )
+            except Exception as e:
+                logger.error(f"[UsageLedger] Notion read failed for {email}: {e}")
+                self._stats["seed_errors"] += 1
+                self._seed_failed_at[email] = time.monotonic()
+                return
+            finally:
+                self._seed_locks.pop(email, None)
+            self._seed_failed_at.pop(email, None)
+
+            await self._offload(self._apply_seed, email, page_id, notion_month, notion_total, last_used)
+            self._stats["seeds"] += 1
+
+    def _apply_seed(
+        self, email: str, page_id: Optional[str], notion_month: float, notion_total: float, last_used: Optional[str]
+    ):
+        month = _month()
+        # Notionの「今月」は最終利用日が今月のときだけ今月分として数える（月替わりのリセット前の値を持ち越さない）
+        if last_used and last_used[:7] != month:
+            notion_month = 0.0
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR IGNORE INTO usage (email, month) VALUES (?, ?)", (email, month)
+            )
+            # seeded = 0 の行にだけ足す（他のワーカーが先に取り込んでいれば何もしない）
+            conn.execute(
+                "UPDATE usage SET month_minutes = month_minutes + CASE WHEN month = ? THEN ? ELSE 0 END, "
+                "total_minutes = total_minutes + ?, page_id = ?, seeded = 1 WHERE email = ? AND seeded = 0",
+                (month, notion_month, notion_total, page_id, email),
+            )
+            conn.commit()
+
+    async def add(self, email: str, minutes: float):
+        """使用分数を加算する（Notionへの反映は後でまとめて行う）"""
+        await self._ensure_seeded(email)
+        unflushed = await self._offload(self._apply_add, email, minutes)
+        self._stats["adds"] += 1
+        if unflushed >= self.flush_threshold_minutes and self._wakeup is not None:
+            self._wakeup.set()
+
+    def _apply_add(self, email: str, minutes: float) -> float:
+        """加算して、そのユーザーのNotion未反映の分数を返す"""
+        now = datetime.now()
+        month = _month(now)
+        with self._lock:
+            conn = self._connection()
+            conn.execute("INSERT OR IGNORE INTO usage (email, month) VALUES (?, ?)", (email, month))
+            conn.execute(
+                "UPDATE usage SET "
+                "month_minutes = CASE WHEN month = ? THEN month_minutes + ? ELSE ? END, month = ?, "
+                "total_minutes = total_minutes + ?, last_used_at = ?, "
+                "version = version + 1, unflushed_minutes = unflushed_minutes + ? WHERE email = ?",
+                (month, minutes, minutes, month, minutes, now.isoformat(), minutes, email),
+            )
+            conn.commit()
+            return conn.execute(
+                "SELECT unflushed_minutes FROM usage WHERE email = ?", (email,)
+            ).fetchone()[0]
+
+    async def month_minutes(self, email: str) -> float:
+        """今月の使用分数"""
+        await self._ensure_seeded(email)
+        row = await self._offload(self._row, email)
+        if row is None or row[0] != _month():
+            return 0.0
+        return float(row[1])
+
+    async def flush(self) -> int:
+        """未反映のユーザーの値をNotionに書き込み、書き込んだユーザー数を返す"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            rows = await self._offload(self._dirty_rows)
+            if not rows:
+                return 0
+            self._stats["flushes"] += 1
+            loop = asyncio.get_running_loop()
+            written = 0
+            for email, version, flushed_version, month, month_minutes, total_minutes, last_used_at, page_id, unflushed in rows:
+                try:
+                    if page_id is None:
+                        # 台帳の作成時にはNotionにいなかったユーザー（後から登録された場合など）
+                        page_id = (await loop.run_in_executor(None, self._fetch_user, email))[0]
+                    if page_id is not None:
+                        if month != _month():
+                            month_minutes = 0.0
+                        await loop.run_in_executor(
+                            None, self._write_user, page_id, month_minutes, total_minutes, last_used_at
+                        )
+                        self._stats["notion_writes"] += 1
+                        self._stats["coalesced_adds"] += version - flushed_version - 1
+                        written += 1
+                except Exception as e:
+                    logger.error(f"[UsageLedger] Notion write failed for {email}: {e}")
+                    self._stats["flush_errors"] += 1
+                    continue
+                await self._offload(self._mark_flushed, email, version, page_id, unflushed)
+            logger.info(f"[UsageLedger] flushed {written}/{len(rows)} users to Notion")
+            return written
+
+    def _dirty_rows(self) -> list:
+        with self._lock:
+            return self._connection().execute(
+                "SELECT email, version, flushed_version, month, month_minutes, total_minutes, last_used_at, "
+                "page_id, unflushed_minutes FROM usage WHERE seeded = 1 AND version > flushed_version"
+            ).fetchall()
+
+    def _mark_flushed(self, email: str, version: int, page_id: Optional[str], unflushed: float):
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "UPDATE usage SET flushed_version = ?, page_id = COALESCE(page_id, ?), "
+                "unflushed_minutes = MAX(0, unflushed_minutes - ?) WHERE email = ? AND flushed_version < ?",
+                (version, page_id, unflushed, email, version),
+            )
+            conn.commit()
+
+    # ------------------------------------------------------------ バックグラウンド
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wakeup = None
+        # 終了前に残りを書き込む
+        try:
+            await asyncio.wait_for(self.flush(), timeout=10.0)
+        except Exception as e:
+            logger.error(f"[UsageLedger] final flush failed: {e}")
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"[UsageLedger] flush failed: {e}", exc_info=True)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    async def asnapshot(self) -> Dict:
+        return await self._offload(self.snapshot)
+
+    def snapshot(self) -> Dict:
+        """/health 表示用"""
+        with self._lock:
+            users, pending, unflushed = self._connection().execute(
+                "SELECT COUNT(*), SUM(version > flushed_version), COALESCE(SUM(unflushed_minutes), 0) FROM usage"
+            ).fetchone()
+        return {
+            **self._stats,
+            "users": users,
+            "pending_users": pending or 0,
+            "unflushed_minutes": round(unflushed, 2),
+            "flush_interval_seconds": self.flush_interval_seconds,
+            "path": self.path,
+        }
+
+
+# UsageService（各ルートのインスタンス）とヘルスチェックで共有する
+usage_ledger = UsageLedger()
@@ -4,6 +4,8 @@ from datetime import datetime, timedelta
 from typing import Dict, Optional
 import logging
 
+from app.services.usage_ledger import usage_ledger
+
 logger = logging.getLogger(__name__)
 
 
@@ -96,71 +98,21 @@ class UsageService:
             }
     
     async def get_whisper_usage_this_month(self, email: str) -> float:
-        """今月のWhisper使用分数を取得"""
+        """今月のWhisper使用分数を取得（使用量台帳から。Notionへの反映前の分も含む）"""
         try:
-            response = self.client.databases.query(
-                database_id=self.user_db_id,
-                filter={
-                    "property": "Email",
-                    "rich_text": {
-                        "equals": email
-                    }
-                }
-            )
-            
-            if not response.get("results"):
-                return 0.0
-            
-            user = response["results"][0]
-            props = user["properties"]
-            
-            # Whisper使用量を取得
-            usage_prop = props.get("Whisper Usage Minutes (This Month)", {}).get("number")
-            return float(usage_prop) if usage_prop is not None else 0.0
+            return await usage_ledger.month_minutes(email)
         except Exception as e:
             logger.error(f"Error getting Whisper usage: {e}")
             return 0.0
     
     async def add_whisper_usage(self, email: str, minutes: float):
-        """Whisper使用分数を追加"""
+        """
+        Whisper使用分数を追加
+        使用量台帳に加算するだけで、Notionへはまとめて後から書き込む（usage_ledger）
+        """
         try:
-            response = self.client.databases.query(
-                database_id=self.user_db_id,
-                filter={
-                    "property": "Email",
-                    "rich_text": {
-                        "equals": email
-                    }
-                }
-            )
-            
-            if not response.get("results"):
-                logger.warning(f"User not found: {email}")
-                return
-            
-            user_id = response["results"][0]["id"]
-            props = response["results"][0]["properties"]
-            
-            # 現在の使用量を取得
-            current_usage = props.get("Whisper Usage Minutes (This Month)", {}).get("number", 0.0) or 0.0
-            current_total = props.get("Whisper Usage Minutes (Total)", {}).get("number", 0.0) or 0.0
-            
-            # 使用量を更新
-            new_usage = current_usage + minutes
-            new_total = current_total + minutes
-            
-            update_props = {
-                "Whisper Usage Minutes (This Month)": {"number": new_usage},
-                "Whisper Usage Minutes (Total)": {"number": new_total},
-                "Last Whisper Usage Date": {"date": {"start": datetime.now().isoformat()}}
-            }
-            
-            self.client.pages.update(
-                page_id=user_id,
-                properties=update_props
-            )
-            
-            logger.info(f"Updated Whisper usage for {email}: +{minutes:.2f} minutes (total this month: {new_usage:.2f})")
+            await usage_ledger.add(email, minutes)
+            logger.info(f"Recorded Whisper usage for {email}: +{minutes:.2f} minutes")
         except Exception as e:
             logger.error(f"Error adding Whisper usage: {e}")
             raise
@@ -1,10 +1,17 @@
 from openai import AsyncOpenAI
+import asyncio
 import os
 import base64
 import io
-from typing import Dict, Optional
+from typing import BinaryIO, Dict, Optional
 import logging
 
+from app.services.audio_probe import metered_duration
+from app.services.audio_segmenter import plan_segments
+
+# 長い録音を区間に分けたとき、同時に文字起こしする区間数
+SEGMENT_CONCURRENCY = int(os.getenv("WHISPER_SEGMENT_CONCURRENCY", "4"))
+
 logger = logging.getLogger(__name__)
 
 
@@ -17,7 +24,8 @@ class WhisperService:
             logger.warning("OPENAI_API_KEY not configured, WhisperService will not work")
             self.client = None
         else:
-            self.client = AsyncOpenAI(api_key=api_key)
+            # OPENAI_API_BASE で接続先を差し替え可能（負荷試験用のfake_openai_server.pyなど）
+            self.client = AsyncOpenAI(api_key=api_key, base_url=os.getenv("OPENAI_API_BASE") or None)
     
     async def transcribe_audio(
         self,
@@ -81,6 +89,68 @@ class WhisperService:
             logger.error(f"Whisper transcription error: {e}")
             raise ValueError(f"Whisper transcription failed: {str(e)}")
     
+    async def transcribe_file(
+        self,
+        audio_file: BinaryIO,
+        filename: str,
+        user_email: str,
+        content_type: Optional[str] = None
+    ) -> str:
+        """
+        ファイルオブジェクトの音声をWhisper APIで文字起こしし、テキストだけを返す
+        ファイルは先頭から64KBずつ読みながら送信するため、全体をメモリに読み込まない
+        （使用量の記録は呼び出し元で行う）
+        """
+        if not self.client:
+            raise ValueError("OpenAI API key not configured")
+        
+        file = (filename, audio_file, content_type) if content_type else (filename, audio_file)
+        try:
+            response = await self.client.audio.transcriptions.create(
+                model="whisper-1",
+                file=file,
+                language="en"  # 英語に固定
+            )
+        except Exception as e:
+            logger.error(f"Whisper transcription error ({filename}, {user_email}): {e}")
+            raise ValueError(f"Whisper transcription failed: {str(e)}")
+        return response.text
+    
+    async def transcribe_recording(
+        self,
+        audio_file: BinaryIO,
+        filename: str,
+        user_email: str,
+        content_type: Optional[str] = None
+    ) -> str:
+        """
+        録音全体を文字起こしする
+        長いWAV録音は無音付近で区間に分け（audio_segmenter）、区間ごとに並行して文字起こしして順に繋げる。
+        区間は元のファイルの範囲を読むだけなので、音声データのコピーは作らない
+        """
+        loop = asyncio.get_running_loop()
+        # パワー計算（NumPy）はイベントループを止めないようスレッドで行う
+        segments = await loop.run_in_executor(None, plan_segments, audio_file)
+        if len(segments) <= 1:
+            return await self.transcribe_file(audio_file, filename, user_email, content_type)
+        
+        logger.info(f"Transcribing {filename} in {len(segments)} segments for user: {user_email}")
+        slots = asyncio.Semaphore(SEGMENT_CONCURRENCY)
+        
+        async def _segment(index: int, segment: BinaryIO) -> str:
+            async with slots:
+                return await self.transcribe_file(segment, f"segment-{index}.wav", user_email, "audio/wav")
+        
+        texts = await asyncio.gather(*(_segment(i, segment) for i, segment in enumerate(segments)))
+        return " ".join(text.strip() for text in texts if text.strip())
+    
+    async def transcribe_bytes(self, audio_bytes: bytes, user_email: str, filename: str = "recording.webm") -> str:
+        """
+        音声データ（バイト列）をWhisper APIで文字起こしし、テキストだけを返す
+        ライブ練習の区間ごとの文字起こしで使う（使用量の記録は呼び出し元で行う）
+        """
+        return await self.transcribe_file(io.BytesIO(audio_bytes), filename, user_email)
+    
     async def transcribe_audio_with_duration(
         self,
         audio_base64: str,
@@ -93,7 +163,7 @@ class WhisperService:
         
         Args:
             audio_base64: base64エンコードされた音声データ
-            duration_seconds: 音声の長さ（秒）
+            duration_seconds: 音声の長さ（秒、クライアント申告値。ヘッダーから長さが取れない場合に使う）
             user_email: ユーザーのメールアドレス
             is_trial: 無料体験中かどうか
         
@@ -113,18 +183,12 @@ class WhisperService:
             audio_bytes = base64.b64decode(audio_base64)
             audio_file = io.BytesIO(audio_bytes)
             
-            # ファイル拡張子を推測（WebMが一般的）
-            audio_file.name = "recording.webm"
+            # 課金に使う長さはコンテナのヘッダーから求める（取れなければクライアント申告値とサイズからの推定値の大きい方）
+            container, duration_seconds = metered_duration(audio_file, duration_seconds)
             
-            # 2. Whisper API呼び出し
-            logger.info(f"Calling Whisper API for user: {user_email}, duration: {duration_seconds}s")
-            response = await self.client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file,
-                language="en"  # 英語に固定
-            )
-            
-            transcript = response.text
+            # 2. Whisper API呼び出し（ファイル拡張子はコンテナ形式に合わせる。不明ならWebMが一般的）
+            logger.info(f"Calling Whisper API for user: {user_email}, duration: {duration_seconds:.1f}s")
+            transcript = await self.transcribe_recording(audio_file, f"recording.{container or 'webm'}", user_email)
             
             # 3. 使用分数計算
             usage_minutes = duration_seconds / 60.0
@@ -137,6 +201,8 @@ class WhisperService:
                 "usage_minutes": usage_minutes,
                 "remaining_minutes": None  # UsageServiceで計算
             }
+        except ValueError:
+            raise
         except Exception as e:
             logger.error(f"Whisper transcription error: {e}")
             raise ValueError(f"Whisper transcription failed: {str(e)}")
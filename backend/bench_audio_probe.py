@@ -0,0 +1,226 @@
+"""
+音声の長さ取得（app/services/audio_probe.py）の精度・速度の計測
+
+WebM（MediaRecorder形式: Durationなし / ffmpeg形式: Durationあり）、Ogg/Opus、
+MP4（通常 / 断片化）、WAV（通常 / サイズ欄未記入）の音声ファイルを指定の長さで作り、
+- 求めた長さと実際の長さの差
+- 1ファイルあたりの処理時間と、読んだバイト数（ファイルサイズとの比較）
+を表示します。音声の中身は無音・ダミーのパケットです（ヘッダー構造は実際の録音と同じ）。
+--files で実際の録音ファイルを渡すと、その長さも表示します。
+
+使い方:
+  python bench_audio_probe.py --seconds 5 60 600
+  python bench_audio_probe.py --files recording.webm recording.mp4
+"""
+import argparse
+import io
+import os
+import struct
+import tempfile
+import time
+import zlib
+
+from app.services.audio_probe import probe_audio
+
+
+class CountingReader(io.RawIOBase):
+    """読んだバイト数を数えるファイルラッパー"""
+
+    def __init__(self, f):
+        self._f = f
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self._f.seek(offset, whence)
+
+    def tell(self):
+        return self._f.tell()
+
+    def read(self, size=-1):
+        data = self._f.read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+# ---------------------------------------------------------------- WAV
+
+def make_wav(seconds: float, streaming: bool = False) -> bytes:
+    rate, channels, width = 16000, 1, 2
+    data = bytes(int(seconds * rate) * channels * width)
+    fmt = struct.pack("<HHIIHH", 1, channels, rate, rate * channels * width, channels * width, width * 8)
+    data_size = 0xFFFFFFFF if streaming else len(data)
+    riff_size = 0xFFFFFFFF if streaming else 4 + 8 + len(fmt) + 8 + len(data)
+    return b"RIFF" + struct.pack("<I", riff_size) + b"WAVE" + b"fmt " + struct.pack("<I", len(fmt)) + fmt \
+        + b"data" + struct.pack("<I", data_size) + data
+
+
+# ---------------------------------------------------------------- Ogg/Opus
+
+def _ogg_crc(data: bytes) -> int:
+    crc = 0
+    for byte in data:
+        crc ^= byte << 24
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x04C11DB7) & 0xFFFFFFFF if crc & 0x80000000 else (crc << 1) & 0xFFFFFFFF
+    return crc
+
+
+def _ogg_page(packets, granule: int, serial: int, sequence: int, header_type: int = 0) -> bytes:
+    lacing = b""
+    for packet in packets:
+        lacing += b"\xff" * (len(packet) // 255) + bytes([len(packet) % 255])
+    header = struct.pack("<4sBBqIIIB", b"OggS", 0, header_type, granule, serial, sequence, 0, len(lacing))
+    page = header + lacing + b"".join(packets)
+    return page[:22] + struct.pack("<I", _ogg_crc(page)) + page[26:]
+
+
+def make_ogg_opus(seconds: float) -> bytes:
+    serial, pre_skip = 0x5EED, 312
+    head = b"OpusHead" + struct.pack("<BBHIhB", 1, 1, pre_skip, 48000, 0, 0)
+    tags = b"OpusTags" + struct.pack("<I", 5) + b"bench" + struct.pack("<I", 0)
+    pages = [_ogg_page([head], 0, serial, 0, 0x02), _ogg_page([tags], 0, serial, 1)]
+    packet = b"\xf8" + bytes(60)  # CELT 20ms
+    total = pre_skip + int(seconds * 48000)
+    samples, sequence = 0, 2
+    while samples < total:
+        count = min(50, -(-(total - samples) // 960))
+        samples += count * 960
+        last = samples >= total
+        pages.append(_ogg_page([packet] * count, total if last else samples, serial, sequence, 0x04 if last else 0))
+        sequence += 1
+    return b"".join(pages)
+
+
+# ---------------------------------------------------------------- WebM
+
+def _ebml(element_id: bytes, payload: bytes) -> bytes:
+    return element_id + b"\x01" + len(payload).to_bytes(7, "big") + payload
+
+
+_UNKNOWN_SIZE = b"\x01\xff\xff\xff\xff\xff\xff\xff"
+
+
+def make_webm(seconds: float, with_duration: bool = False) -> bytes:
+    header = _ebml(b"\x1a\x45\xdf\xa3", _ebml(b"\x42\x82", b"webm") + _ebml(b"\x42\x87", b"\x04"))
+    info = _ebml(b"\x2a\xd7\xb1", (1_000_000).to_bytes(3, "big")) + _ebml(b"\x4d\x80", b"bench")
+    if with_duration:
+        info += _ebml(b"\x44\x89", struct.pack(">d", seconds * 1000))
+    track = _ebml(b"\xd7", b"\x01") + _ebml(b"\x86", b"A_OPUS") + _ebml(b"\x83", b"\x02")
+    body = _ebml(b"\x15\x49\xa9\x66", info) + _ebml(b"\x16\x54\xae\x6b", _ebml(b"\xae", track))
+    packet = b"\xf8" + bytes(60)  # CELT 20ms
+    blocks = int(seconds * 50)
+    clusters = []
+    # MediaRecorderと同様、約5秒ごとにサイズ不明のクラスターを作る
+    for first in range(0, blocks, 250):
+        cluster_ms = first * 20
+        content = _ebml(b"\xe7", cluster_ms.to_bytes(4, "big"))
+        for n in range(first, min(blocks, first + 250)):
+            content += _ebml(b"\xa3", b"\x81" + struct.pack(">hB", n * 20 - cluster_ms, 0x80) + packet)
+        if with_duration:
+            clusters.append(_ebml(b"\x1f\x43\xb6\x75", content))
+        else:
+            clusters.append(b"\x1f\x43\xb6\x75" + _UNKNOWN_SIZE + content)
+    return header + b"\x18\x53\x80\x67" + _UNKNOWN_SIZE + body + b"".join(clusters)
+
+
+# ---------------------------------------------------------------- MP4
+
+def _box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def _full_box(box_type: bytes, version: int, flags: int, payload: bytes) -> bytes:
+    return _box(box_type, struct.pack(">I", (version << 24) | flags) + payload)
+
+
+def _moov(movie_scale: int, movie_duration: int, fragmented: bool) -> bytes:
+    mvhd = _full_box(b"mvhd", 0, 0, struct.pack(">IIII", 0, 0, movie_scale, movie_duration) + bytes(80))
+    mdhd = _full_box(b"mdhd", 0, 0, struct.pack(">IIIIHH", 0, 0, 48000, 0 if fragmented else movie_duration * 48, 0x55C4, 0))
+    hdlr = _full_box(b"hdlr", 0, 0, bytes(4) + b"soun" + bytes(12) + b"\x00")
+    trak = _box(b"trak", _box(b"mdia", mdhd + hdlr))
+    mvex = _box(b"mvex", _full_box(b"trex", 0, 0, struct.pack(">IIIII", 1, 1, 1024, 0, 0))) if fragmented else b""
+    return _box(b"moov", mvhd + trak + mvex)
+
+
+def make_mp4(seconds: float, fragmented: bool = False) -> bytes:
+    ftyp = _box(b"ftyp", b"M4A " + struct.pack(">I", 0) + b"isomM4A ")
+    if not fragmented:
+        # moovが末尾にある（faststartしていない）ファイル
+        mdat = _box(b"mdat", bytes(int(seconds * 4000)))
+        return ftyp + mdat + _moov(1000, int(seconds * 1000), False)
+
+    # SafariのMediaRecorderと同様の断片化MP4（約1秒ごとの moof + mdat、mvhdのdurationは0）
+    out = [ftyp, _moov(1000, 0, True)]
+    total = -(-int(seconds * 48000) // 1024)
+    done, sequence = 0, 1
+    while done < total:
+        count = min(47, total - done)
+        tfhd = _full_box(b"tfhd", 0, 0x020000, struct.pack(">I", 1))
+        tfdt = _full_box(b"tfdt", 1, 0, struct.pack(">Q", done * 1024))
+        trun = _full_box(b"trun", 0, 0x000301, struct.pack(">Ii", count, 0) + struct.pack(">II", 1024, 80) * count)
+        moof = _box(b"moof", _full_box(b"mfhd", 0, 0, struct.pack(">I", sequence)) + _box(b"traf", tfhd + tfdt + trun))
+        out += [moof, _box(b"mdat", bytes(80 * count))]
+        done += count
+        sequence += 1
+    return b"".join(out)
+
+
+FORMATS = {
+    "webm (MediaRecorder)": lambda s: (make_webm(s), s),
+    "webm (Duration)": lambda s: (make_webm(s, with_duration=True), s),
+    "ogg/opus": lambda s: (make_ogg_opus(s), s),
+    "mp4": lambda s: (make_mp4(s), s),
+    "mp4 (fragmented)": lambda s: (make_mp4(s, fragmented=True), -(-int(s * 48000) // 1024) * 1024 / 48000),
+    "wav": lambda s: (make_wav(s), s),
+    "wav (streaming)": lambda s: (make_wav(s, streaming=True), s),
+}
+
+
+def _probe_file(path: str, repeat: int):
+    with open(path, "rb") as raw:
+        reader = CountingReader(raw)
+        container, seconds = probe_audio(reader)
+        bytes_read = reader.bytes_read
+        started = time.perf_counter()
+        for _ in range(repeat):
+            probe_audio(raw)
+        elapsed_us = (time.perf_counter() - started) / repeat * 1e6
+    return container, seconds, bytes_read, elapsed_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audio duration probe benchmark")
+    parser.add_argument("--seconds", type=float, nargs="+", default=[5, 60, 600])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--files", nargs="*", default=[])
+    args = parser.parse_args()
+
+    print(f"{'format':<22}{'length(s)':>10}{'size(KB)':>10}{'probed(s)':>11}{'error(ms)':>10}{'read(KB)':>10}{'probe(us)':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, make in FORMATS.items():
+            for length in args.seconds:
+                data, expected = make(length)
+                path = os.path.join(tmp, "fixture")
+                with open(path, "wb") as f:
+                    f.write(data)
+                _, seconds, bytes_read, elapsed_us = _probe_file(path, args.repeat)
+                error = f"{(seconds - expected) * 1000:.1f}" if seconds is not None else "-"
+                probed = f"{seconds:.3f}" if seconds is not None else "None"
+                print(
+                    f"{name:<22}{length:>10.0f}{len(data) / 1024:>10.0f}{probed:>11}{error:>10}"
+                    f"{bytes_read / 1024:>10.1f}{elapsed_us:>11.1f}"
+                )
+
+    for path in args.files:
+        container, seconds, bytes_read, elapsed_us = _probe_file(path, args.repeat)
+        print(f"{path}: {container} {seconds!r}s (read {bytes_read / 1024:.1f}KB of {os.path.getsize(path) / 1024:.0f}KB, {elapsed_us:.1f}us)")
+
+
+if __name__ == "__main__":
+    main()
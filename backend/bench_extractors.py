@@ -0,0 +1,152 @@
+"""
+記事本文抽出のベンチマーク（BeautifulSoup + html.parser と ドメイン別lxml抽出の比較）
+
+fixtures/html/ に保存したHTML（manifest.json にURL・正解タイトル・正解段落）を使い、
+1ページあたりのCPU時間と、抽出結果が正解と一致しているかを表示します。
+最後に、全ページを並行に抽出したときのイベントループの停止時間（パースをループ内で行う場合と
+スレッドプール parse_pool で行う場合）を表示します。
+
+使い方:
+  python bench_extractors.py --iterations 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Dict, Tuple
+
+from bs4 import BeautifulSoup
+
+from app.services.article_extractors import ArticleParser, extract_article
+from app.services.parse_pool import parse_pool
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "html")
+
+
+def legacy_extract(html: str) -> Tuple[str, str]:
+    """変更前の scrape_article の抽出処理（比較用に再現）"""
+    soup = BeautifulSoup(html, 'html.parser')
+    title_tag = (
+        soup.find('h1', class_='title') or
+        soup.find('h1', id='title') or
+        soup.find('h1') or
+        soup.find('title')
+    )
+    title = title_tag.get_text(strip=True) if title_tag else "タイトル不明"
+    body = (
+        soup.find('section', class_='main-text') or
+        soup.find('div', class_='main-text') or
+        soup.find('div', id='main-text') or
+        soup.find('div', class_='article-body') or
+        soup.find('article') or
+        soup.find('div', class_='article-content')
+    )
+    if body:
+        for script in body.find_all(['script', 'style', 'nav', 'footer', 'aside']):
+            script.decompose()
+        content = body.get_text(strip=True, separator='\n')
+    else:
+        paragraphs = soup.find_all('p')
+        long_ps = [p.get_text(strip=True) for p in paragraphs if len(p.get_text(strip=True)) > 20]
+        content = '\n'.join(long_ps[:15])
+    return title, content
+
+
+def lxml_extract(url: str, html: bytes) -> Tuple[str, str]:
+    extraction = extract_article(url, html, encoding="utf-8")
+    if extraction is None:
+        return "", ""
+    return extraction.title, extraction.text()
+
+
+def _cpu_ms_per_page(fn, iterations: int) -> float:
+    started = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - started) / iterations * 1000
+
+
+def _accuracy(expected: Dict, title: str, content: str) -> str:
+    lines = [line.strip() for line in content.split("\n") if line.strip()]
+    found = sum(1 for p in expected["paragraphs"] if p in content)
+    noise = sum(1 for line in lines if not any(line in p or p in line for p in expected["paragraphs"]))
+    title_ok = "ok" if title == expected["title"] else "NG"
+    return f"title={title_ok} paras={found}/{len(expected['paragraphs'])} noise_lines={noise}"
+
+
+async def _pooled_extract(url: str, html: bytes):
+    """fetch_and_extract と同じく、作成・feed・close を同じレーンで実行する"""
+    lane = parse_pool.lane()
+    parser = await parse_pool.run(ArticleParser, url, "utf-8", lane=lane)
+    for start in range(0, len(html), 64 * 1024):
+        if await parse_pool.run(parser.feed, html[start:start + 64 * 1024], lane=lane):
+            break
+    return await parse_pool.run(parser.close, lane=lane)
+
+
+async def _inline_extract(url: str, html: bytes):
+    await asyncio.sleep(0)
+    return extract_article(url, html, encoding="utf-8")
+
+
+async def _loop_stall_ms(extract, pages, copies: int) -> float:
+    """並行に抽出している間、1ms間隔のタイマーが最大で何ms遅れたか"""
+    gaps = []
+    stop = asyncio.Event()
+
+    async def ticker():
+        last = time.perf_counter()
+        while not stop.is_set():
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    await asyncio.gather(*[extract(url, raw) for url, raw in pages * copies])
+    stop.set()
+    await task
+    return max(gaps) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Article extraction benchmark")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    with open(os.path.join(args.fixtures, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    print(f"{'page':<10}{'size(KB)':>9}{'bs4(ms)':>10}{'lxml(ms)':>10}{'speedup':>9}  accuracy (bs4 | lxml)")
+    total_legacy = total_lxml = 0.0
+    for name, expected in manifest.items():
+        with open(os.path.join(args.fixtures, expected["file"]), "rb") as f:
+            raw = f.read()
+        html = raw.decode("utf-8")
+
+        legacy_ms = _cpu_ms_per_page(lambda: legacy_extract(html), args.iterations)
+        lxml_ms = _cpu_ms_per_page(lambda: lxml_extract(expected["url"], raw), args.iterations)
+        total_legacy += legacy_ms
+        total_lxml += lxml_ms
+
+        legacy_acc = _accuracy(expected, *legacy_extract(html))
+        lxml_acc = _accuracy(expected, *lxml_extract(expected["url"], raw))
+        print(f"{name:<10}{len(raw) / 1024:>9.0f}{legacy_ms:>10.2f}{lxml_ms:>10.2f}{legacy_ms / lxml_ms:>8.1f}x  {legacy_acc} | {lxml_acc}")
+
+    print(f"{'total':<10}{'':>9}{total_legacy:>10.2f}{total_lxml:>10.2f}{total_legacy / total_lxml:>8.1f}x")
+
+    pages = []
+    for expected in manifest.values():
+        with open(os.path.join(args.fixtures, expected["file"]), "rb") as f:
+            pages.append((expected["url"], f.read()))
+    inline_ms = asyncio.run(_loop_stall_ms(_inline_extract, pages, copies=4))
+    pooled_ms = asyncio.run(_loop_stall_ms(_pooled_extract, pages, copies=4))
+    parse_pool.shutdown()
+    print(f"max event-loop stall ({len(pages) * 4} pages concurrently): inline={inline_ms:.1f}ms parse_pool={pooled_ms:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
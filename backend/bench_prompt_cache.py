@@ -0,0 +1,195 @@
+"""
+プロンプト構成（プレフィックスキャッシュ対応）のベンチマーク
+
+旧構成（元記事がプロンプトの途中にあり、日付などの可変値が先頭付近にある）と
+新構成（静的プレフィックス + 可変サフィックス）で generate_english_lesson 相当の
+リクエストを送り、レイテンシ・キャッシュヒット率・推定コストを比較します。
+
+fake_openai_server.py のプレフィックスキャッシュ模擬に対して実行する想定です。
+OPENAI_API_BASE が未設定の場合はスタブサーバーを自動で起動します。
+
+使い方:
+  python bench_prompt_cache.py --articles 30 --levels 1,2,3 --concurrency 4
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import httpx
+from openai import AsyncOpenAI
+
+from app.services.ai_service import AIService
+
+# gpt-4o-mini の料金（USD / 100万トークン）
+PRICE_INPUT = 0.15
+PRICE_CACHED_INPUT = 0.075
+PRICE_OUTPUT = 0.60
+
+
+def _legacy_lesson_request(ai_service: AIService, japanese_content: str, japanese_title: str, level: int) -> Dict:
+    """変更前のプロンプト構成（比較用に再現）"""
+    today_str = datetime.now().strftime("Posted %B %d, %Y")
+    c = ai_service._level_constraints(level)
+    prompt = f"""
+あなたは英会話教材のプロフェッショナルです。
+以下の日本語ニュースを元に、わかりやすく読みやすい英語教材を1つ作成してください。
+
+【難易度指定（最重要）】
+- 学習者レベル: {level}（1=初心者 / 2=中級 / 3=上級）
+- CEFR目安: {c["cefr"]}（必ずこのレベルに合わせること）
+- 文体: {c["style"]}
+
+【元記事（日本語）】
+タイトル: {japanese_title}
+内容: {japanese_content}
+
+【作成要件】
+レッスンは以下の構成要素を必ず含めてください：
+1. **Header**: 英語タイトル、日付({today_str})、カテゴリー(News/Sports/Technologyなど)
+2. **Unlocking Word Meanings**: {c["vocab"]}
+   - word, pronunciation (IPA), type (v., n., adj.), definition (英語、わかりやすく), example sentence
+3. **Article**: ニュース記事本文。
+   - 長さ: **{c["article_words"]}**（3-4段落構成で、わかりやすく簡潔に執筆してください）
+   - レベル: CEFR {c["cefr"]} に必ず合わせる
+   - 重要: レベル不一致（難しすぎ/易しすぎ）はNG。特に初心者は簡単な語彙・文法のみで書くこと。
+4. **Viewpoint Discussion**:
+   - **Discussion A**: コンテンツの理解に関する質問 (2-3問)
+   - **Discussion B**: 個人的な見解を聞く質問 (2-3問)
+
+【出力形式】
+以下のJSON形式のみを出力してください（必ず "lessons" キーを使用し、リスト内に1つのレッスンオブジェクトを含めてください）。
+```json
+{{
+  "lessons": [
+    {{
+                    "title": "Clear and Simple English Title",
+      "date": "{today_str}",
+      "category": "News",
+      "vocabulary": [
+        {{
+            "word": "word",
+            "pronunciation": "/.../",
+            "type": "(n.)",
+            "definition": "Clear and precise English definition...",
+            "example": "A natural example sentence using the word..."
+        }}
+      ],
+      "content": "Article body...",
+      "discussion_a": ["Q1", "Q2"],
+      "discussion_b": ["Q1", "Q2"],
+      "question": "Main Question to start the discussion",
+      "level": "{level}"
+    }}
+  ]
+}}
+```
+"""
+    return {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {"role": "system", "content": f"You are a professional English education content creator. Create one lesson strictly for learner level {level} (CEFR {c['cefr']}). Follow constraints exactly. Output valid JSON with 'lessons' key containing a single lesson. The lesson.level MUST be '{level}'."},
+            {"role": "user", "content": prompt},
+        ],
+        "temperature": 0.7,
+        "max_tokens": 2500,
+        "response_format": {"type": "json_object"},
+    }
+
+
+def _synthetic_article(i: int) -> Dict[str, str]:
+    body = (
+        f"記事{i}：政府は{i}日、地方都市の公共交通を支援する新しい計画を発表した。"
+        "計画では、バスや電車の運行本数を増やし、高齢者が病院や買い物に行きやすくすることを目指す。"
+        "専門家は、人口減少が進む地域では移動手段の確保が重要だと指摘している。"
+    ) * 6
+    return {"title": f"地方交通支援の新計画（{i}）", "content": body}
+
+
+async def run_layout(client: AsyncOpenAI, name: str, requests: List[Dict], concurrency: int) -> Dict:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    usage = {"prompt": 0, "cached": 0, "completion": 0}
+
+    async def _one(req: Dict):
+        async with sem:
+            started = time.perf_counter()
+            res = await client.chat.completions.create(**req)
+            latencies.append(time.perf_counter() - started)
+            details = (res.usage.model_extra or {}).get("prompt_tokens_details") or {}
+            usage["prompt"] += res.usage.prompt_tokens
+            usage["cached"] += int(details.get("cached_tokens") or 0)
+            usage["completion"] += res.usage.completion_tokens
+
+    await asyncio.gather(*[_one(r) for r in requests])
+
+    uncached = usage["prompt"] - usage["cached"]
+    cost = (uncached * PRICE_INPUT + usage["cached"] * PRICE_CACHED_INPUT + usage["completion"] * PRICE_OUTPUT) / 1_000_000
+    latencies.sort()
+    return {
+        "layout": name,
+        "requests": len(requests),
+        "p50": statistics.median(latencies),
+        "p95": latencies[max(0, int(len(latencies) * 0.95) - 1)],
+        "cached_ratio": usage["cached"] / usage["prompt"] if usage["prompt"] else 0.0,
+        "cost_usd": cost,
+    }
+
+
+def _start_stub(port: int) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_openai_server.py"), "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    for _ in range(50):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/v1/models", timeout=0.5)
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("fake_openai_server.py did not start")
+
+
+async def main_async(args):
+    base_url = os.getenv("OPENAI_API_BASE") or f"http://127.0.0.1:{args.port}/v1"
+    client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY") or "fake", base_url=base_url, max_retries=0)
+    ai_service = AIService()
+    levels = [int(level) for level in args.levels.split(",")]
+    articles = [_synthetic_article(i) for i in range(args.articles)]
+
+    layouts = {
+        "legacy": [_legacy_lesson_request(ai_service, a["content"], a["title"], lv) for a in articles for lv in levels],
+        "prefix-cached": [ai_service.build_lesson_request(a["content"], a["title"], lv) for a in articles for lv in levels],
+    }
+
+    print(f"{'layout':<15}{'requests':>9}{'p50(s)':>9}{'p95(s)':>9}{'cached':>9}{'cost(USD)':>12}")
+    for name, reqs in layouts.items():
+        r = await run_layout(client, name, reqs, args.concurrency)
+        print(f"{r['layout']:<15}{r['requests']:>9}{r['p50']:>9.3f}{r['p95']:>9.3f}{r['cached_ratio']:>9.1%}{r['cost_usd']:>12.5f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt prefix caching benchmark")
+    parser.add_argument("--articles", type=int, default=30)
+    parser.add_argument("--levels", default="1,2,3")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8900, help="スタブサーバーを自動起動する場合のポート")
+    args = parser.parse_args()
+
+    proc = None if os.getenv("OPENAI_API_BASE") else _start_stub(args.port)
+    try:
+        asyncio.run(main_async(args))
+    finally:
+        if proc is not None:
+            proc.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+長い録音の区間分割（app/services/audio_segmenter.py）の確認
+
+話し声に似たWAV（単語ごとの音 + 単語間の短い隙間 + 文の間の 0.4〜1.2 秒の無音、背景ノイズあり）を作り、
+- 区切り位置が文の間の無音に入っているか（単語の途中で切っていないか）
+- パワー計算の時間と、その間に増えたメモリ（録音全体を配列にしていないこと）
+を表示します。--api-base を指定すると、録音を1回で文字起こしする場合と、
+区間に分けて並行に文字起こしする場合の所要時間を比較します（fake_openai_server.py など）。
+
+使い方:
+  python bench_segmentation.py --minutes 10
+  python bench_segmentation.py --minutes 10 --api-base http://localhost:8900/v1
+"""
+import argparse
+import asyncio
+import os
+import struct
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from app.services.audio_segmenter import FRAME_SECONDS, plan_segments
+
+
+def make_speech_like_wav(path: str, minutes: float, rate: int = 16000, seed: int = 7):
+    """
+    話し声に似たWAVをファイルに書き（1文ずつ書くので全体をメモリに置かない）、
+    文の間の無音区間 [(開始秒, 終了秒)] を返す
+    """
+    rng = np.random.default_rng(seed)
+    total = int(minutes * 60 * rate)
+    with open(path, "wb") as f:
+        f.write(b"RIFF" + struct.pack("<I", 36 + total * 2) + b"WAVE")
+        f.write(b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, rate, rate * 2, 2, 16))
+        f.write(b"data" + struct.pack("<I", total * 2))
+        written, pauses = 0, []
+        while written < total:
+            parts = []
+            for _ in range(rng.integers(4, 14)):
+                word = int(rng.uniform(0.15, 0.45) * rate)
+                t = np.arange(word) / rate
+                envelope = np.sin(np.pi * np.arange(word) / word)
+                tone = np.sin(2 * np.pi * rng.uniform(120, 260) * t) + 0.3 * rng.standard_normal(word)
+                parts.append(6000 * envelope * tone)
+                parts.append(np.zeros(int(rng.uniform(0.03, 0.12) * rate)))  # 単語間の短い隙間
+            pause = int(rng.uniform(0.4, 1.2) * rate)
+            parts.append(np.zeros(pause))
+            sentence = np.concatenate(parts)
+            sentence += 80 * rng.standard_normal(len(sentence))  # 背景ノイズ
+            sentence = sentence[:total - written]
+            end = (written + len(sentence)) / rate
+            pauses.append((end - pause / rate, end))
+            f.write(np.clip(sentence, -32768, 32767).astype("<i2").tobytes())
+            written += len(sentence)
+    return pauses
+
+
+async def _compare_latency(path: str, api_base: str):
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    os.environ["OPENAI_API_BASE"] = api_base
+    from app.services.whisper_service import WhisperService
+
+    service = WhisperService()
+    with open(path, "rb") as f:
+        started = time.perf_counter()
+        await service.transcribe_file(f, "recording.wav", "bench", "audio/wav")
+        single = time.perf_counter() - started
+        started = time.perf_counter()
+        await service.transcribe_recording(f, "recording.wav", "bench", "audio/wav")
+        segmented = time.perf_counter() - started
+    print(f"transcription: single request {single:.2f}s, segmented + concurrent {segmented:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Silence-aware segmentation check")
+    parser.add_argument("--minutes", type=float, default=10)
+    parser.add_argument("--api-base", help="比較に使うOpenAI互換APIのURL（fake_openai_server.py など）")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "long.wav")
+        pauses = make_speech_like_wav(path, args.minutes)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+
+        with open(path, "rb") as f:
+            tracemalloc.start()
+            started = time.perf_counter()
+            segments = plan_segments(f)
+            elapsed = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        print(f"recording: {args.minutes:.0f} min, {size_mb:.1f}MB, {len(pauses)} sentences")
+        print(f"analysis: {elapsed * 1000:.0f}ms, peak traced memory {peak / 1024 / 1024:.1f}MB")
+        print(f"segments: {len(segments)}")
+        position, in_pause = 0.0, 0
+        for i, segment in enumerate(segments):
+            end = position + segment.duration_seconds
+            if i < len(segments) - 1:
+                # 区切り位置の前後 FRAME_SECONDS を許容して、文の間の無音に入っているか
+                hit = any(start - FRAME_SECONDS <= end <= stop + FRAME_SECONDS for start, stop in pauses)
+                in_pause += hit
+                verdict = "pause" if hit else "INSIDE SPEECH"
+            else:
+                verdict = "end"
+            print(f"  #{i:<3}{position:>8.2f}s - {end:>8.2f}s ({segment.duration_seconds:5.1f}s)  cut: {verdict}")
+            position = end
+        if len(segments) > 1:
+            print(f"cuts in sentence pauses: {in_pause}/{len(segments) - 1}")
+
+        if args.api_base:
+            asyncio.run(_compare_latency(path, args.api_base))
+
+
+if __name__ == "__main__":
+    main()
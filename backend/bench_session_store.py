@@ -0,0 +1,116 @@
+"""
+セッションストアのメモリ使用量・速度の計測
+
+/api/session/start が保存するのと同じ形のセッション（記事本文入り）を N 件保存し、
+- MemorySessionStore: プロセス内で増えたメモリ（tracemalloc）
+- SqliteSessionStore: DBファイルのサイズと、プロセス内のメモリ増加
+- それぞれの put / get の1件あたりの時間
+を表示します。セッションは --lessons 種類のレッスンに均等に割り振り（同じ日のレッスンを大勢が練習する状況）、
+記事本文などを共有テーブルで参照する場合（interned）と、セッションごとにコピーする場合（copied）を比較します。
+最後に、別プロセスから同じSQLiteファイルのセッションを読めることを確認します。
+
+使い方:
+  python bench_session_store.py --sessions 10000 --lessons 5 --content-chars 3000
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+
+from app.services.session_store import SHARED_FIELDS, MemorySessionStore, SqliteSessionStore
+
+_SENTENCE = "The government announced a new plan on Monday to support public transport in regional cities. "
+
+
+def _session(content_chars: int, lesson: int) -> dict:
+    """リクエストごとにJSONから作られるのと同様、毎回新しい文字列・dictで作る"""
+    content = (_SENTENCE * (content_chars // len(_SENTENCE) + 1))[:content_chars - 8] + f" #{lesson:06d}"
+    return {
+        "article_url": "generated",
+        "article_title": f"Regional transport plan {lesson}",
+        "article_content": content,
+        "question": "What do you think about this news?",
+        "topic": f"Regional transport plan {lesson}",
+        "created_at": datetime.now().isoformat(),
+        "lesson_data": {
+            "title": f"Regional transport plan {lesson}",
+            "category": "Politics",
+            "level": "2",
+            "date": "2026-10-19",
+            "japanese_title": "地方交通支援の新計画を発表",
+        },
+    }
+
+
+def _measure(store, sessions: int, lessons: int, content_chars: int):
+    ids = [str(uuid.uuid4()) for _ in range(sessions)]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    for n, session_id in enumerate(ids):
+        store.put(session_id, _session(content_chars, n % lessons))
+    put_us = (time.perf_counter() - started) / sessions * 1e6
+    grown = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    for session_id in ids[::10]:
+        assert store.get(session_id) is not None
+    get_us = (time.perf_counter() - started) / len(ids[::10]) * 1e6
+    return grown, put_us, get_us, ids
+
+
+def _read_in_other_process(path: str, session_id: str, queue):
+    store = SqliteSessionStore(ttl_seconds=3600, path=path)
+    session = store.get(session_id)
+    queue.put(session["article_title"] if session else None)
+    store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Session store memory benchmark")
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--lessons", type=int, default=5)
+    parser.add_argument("--content-chars", type=int, default=3000)
+    args = parser.parse_args()
+
+    print(f"{args.sessions} sessions over {args.lessons} lessons, article_content={args.content_chars} chars")
+    print(f"{'store':<18}{'process MB':>11}{'bytes/session':>15}{'file MB':>9}{'put(us)':>9}{'get(us)':>9}")
+
+    def _row(name, grown, file_mb, put_us, get_us):
+        file_col = f"{file_mb:.1f}" if file_mb is not None else "-"
+        print(
+            f"{name:<18}{grown / 1024 / 1024:>11.1f}{grown / args.sessions:>15.0f}"
+            f"{file_col:>9}{put_us:>9.1f}{get_us:>9.1f}"
+        )
+
+    for label, shared_fields in (("copied", ()), ("interned", SHARED_FIELDS)):
+        memory = MemorySessionStore(ttl_seconds=3600, max_sessions=args.sessions, shared_fields=shared_fields)
+        grown, put_us, get_us, _ = _measure(memory, args.sessions, args.lessons, args.content_chars)
+        _row(f"memory/{label}", grown, None, put_us, get_us)
+        del memory
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, shared_fields in (("copied", ()), ("interned", SHARED_FIELDS)):
+            path = os.path.join(tmp, f"sessions-{label}.db")
+            sqlite_store = SqliteSessionStore(ttl_seconds=3600, path=path, shared_fields=shared_fields)
+            grown, put_us, get_us, ids = _measure(sqlite_store, args.sessions, args.lessons, args.content_chars)
+            sqlite_store.close()
+            file_mb = sum(
+                os.path.getsize(path + suffix) for suffix in ("", "-wal") if os.path.exists(path + suffix)
+            ) / 1024 / 1024
+            _row(f"sqlite/{label}", grown, file_mb, put_us, get_us)
+
+        queue = multiprocessing.Queue()
+        worker = multiprocessing.Process(target=_read_in_other_process, args=(path, ids[-1], queue))
+        worker.start()
+        worker.join()
+        print(f"read from another process: {queue.get()!r}")
+
+
+if __name__ == "__main__":
+    main()
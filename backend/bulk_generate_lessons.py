@@ -0,0 +1,357 @@
+"""
+レッスン一括生成CLI（1週間分のレッスンを事前に作成する用途）
+
+記事URLリスト、またはニュースソースのRSSスイープから記事を集め、
+指定レベルのレッスンを高並列で生成してJSONLに書き出します。
+出力済みの (URL, レベル) はスキップするため、中断しても同じコマンドで再開できます。
+
+使い方:
+  # URLリストから直接生成
+  python bulk_generate_lessons.py generate --urls urls.txt --levels 1,2,3 --out lessons.jsonl
+
+  # RSSスイープ（各ソース20件）から生成
+  python bulk_generate_lessons.py generate --sweep nhk,bbc --per-source 20 --out lessons.jsonl
+
+  # OpenAI Batch API用のリクエストファイルを出力 → 結果ファイルを取り込み
+  python bulk_generate_lessons.py emit-batch --urls urls.txt --out batch_requests.jsonl
+  python bulk_generate_lessons.py ingest-batch --results batch_output.jsonl --requests batch_requests.jsonl --out lessons.jsonl
+
+  # 生成結果をレッスンストア（Notion）へ一括保存
+  python bulk_generate_lessons.py load --in lessons.jsonl --user-email ops@example.com
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Dict, Iterable, List, Set
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.services.ai_service import AIService  # noqa: E402
+from app.services.http_client import shared_http_client  # noqa: E402
+from app.services.news_service import NewsService  # noqa: E402
+
+
+def _read_jsonl(path: str) -> Iterable[Dict]:
+    """JSONLを読み込む（中断時に書きかけになった最終行は無視する）"""
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def _record_key(url: str, level: int) -> str:
+    return f"{url}#L{level}"
+
+
+def _custom_id(url: str, level: int) -> str:
+    # Batch APIのcustom_idは長さ制限があるため、URLはハッシュ化する
+    return f"{hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]}-L{level}"
+
+
+class JsonlWriter:
+    """1レコードごとにflushする追記専用ライター（再開可能にするため）"""
+
+    def __init__(self, path: str):
+        # 中断で最終行が書きかけの場合、次のレコードが同じ行に連結されないよう改行しておく
+        needs_newline = False
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b"\n"
+        self._f = open(path, "a", encoding="utf-8")
+        if needs_newline:
+            self._f.write("\n")
+        self._lock = asyncio.Lock()
+
+    async def write(self, record: Dict):
+        async with self._lock:
+            self._f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+async def collect_urls(args, news_service: NewsService) -> List[str]:
+    urls: List[str] = []
+    if args.urls:
+        with open(args.urls, "r", encoding="utf-8") as f:
+            urls.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+    if args.sweep:
+        for source in args.sweep.split(","):
+            source = source.strip()
+            try:
+                items = await news_service.fetch_rss_items(source, limit=args.per_source)
+            except Exception as e:
+                print(f"[sweep] {source}: RSS取得失敗: {e}")
+                continue
+            links = [item["link"] for item in items if item.get("link")]
+            print(f"[sweep] {source}: {len(links)}件")
+            urls.extend(links)
+    # 順序を保ったまま重複除去
+    return list(dict.fromkeys(urls))
+
+
+async def cmd_generate(args):
+    news_service = NewsService()
+    ai_service = AIService()
+    levels = [int(level) for level in args.levels.split(",")]
+
+    done: Set[str] = {r["key"] for r in _read_jsonl(args.out) if "key" in r}
+    urls = await collect_urls(args, news_service)
+    pending = {url: [lv for lv in levels if _record_key(url, lv) not in done] for url in urls}
+    pending = {url: lvs for url, lvs in pending.items() if lvs}
+    total = sum(len(lvs) for lvs in pending.values())
+    print(f"対象: {len(urls)}記事 / 生成待ち: {total}件（完了済み: {len(done)}件）")
+
+    scrape_sem = asyncio.Semaphore(args.scrape_concurrency)
+    generate_sem = asyncio.Semaphore(args.concurrency)
+    writer = JsonlWriter(args.out)
+    counts = {"ok": 0, "failed": 0}
+
+    async def _generate_level(url: str, article: Dict, level: int):
+        async with generate_sem:
+            try:
+                lessons = await ai_service.generate_english_lesson(
+                    japanese_content=article["content"],
+                    japanese_title=article["title"],
+                    level=level,
+                )
+            except Exception as e:
+                lessons = []
+                print(f"[generate] 失敗 L{level} {url}: {e}")
+        if not lessons:
+            counts["failed"] += 1
+            return
+        await writer.write({
+            "key": _record_key(url, level),
+            "url": url,
+            "level": level,
+            "japanese_title": article["title"],
+            "generated_at": datetime.now().isoformat(),
+            "lessons": lessons,
+        })
+        counts["ok"] += 1
+        print(f"[generate] {counts['ok']}/{total} L{level} {article['title'][:40]}")
+
+    async def _process_url(url: str, url_levels: List[int]):
+        # 記事の取得は1回だけ行い、各レベルへファンアウトする
+        async with scrape_sem:
+            article = await news_service.scrape_article(url)
+        if not article:
+            counts["failed"] += len(url_levels)
+            print(f"[scrape] 失敗: {url}")
+            return
+        await asyncio.gather(*[_generate_level(url, article, lv) for lv in url_levels])
+
+    try:
+        await asyncio.gather(*[_process_url(url, lvs) for url, lvs in pending.items()])
+    finally:
+        writer.close()
+    print(f"完了: 成功 {counts['ok']}件 / 失敗 {counts['failed']}件（失敗分は再実行で再試行されます）")
+
+
+async def cmd_emit_batch(args):
+    news_service = NewsService()
+    ai_service = AIService()
+    levels = [int(level) for level in args.levels.split(",")]
+    manifest_path = args.out + ".manifest.jsonl"
+
+    done: Set[str] = {r["custom_id"] for r in _read_jsonl(args.out) if "custom_id" in r}
+    urls = await collect_urls(args, news_service)
+    scrape_sem = asyncio.Semaphore(args.scrape_concurrency)
+    writer = JsonlWriter(args.out)
+    manifest = JsonlWriter(manifest_path)
+    counts = {"emitted": 0}
+
+    async def _emit(url: str):
+        url_levels = [lv for lv in levels if _custom_id(url, lv) not in done]
+        if not url_levels:
+            return
+        async with scrape_sem:
+            article = await news_service.scrape_article(url)
+        if not article:
+            print(f"[scrape] 失敗: {url}")
+            return
+        for level in url_levels:
+            custom_id = _custom_id(url, level)
+            # マニフェストを先に書く（リクエスト行だけが残る状態を避ける）
+            await manifest.write({
+                "custom_id": custom_id,
+                "url": url,
+                "level": level,
+                "japanese_title": article["title"],
+            })
+            await writer.write({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": ai_service.build_lesson_request(article["content"], article["title"], level),
+            })
+            counts["emitted"] += 1
+
+    try:
+        await asyncio.gather(*[_emit(url) for url in urls])
+    finally:
+        writer.close()
+        manifest.close()
+    print(f"バッチリクエスト {counts['emitted']}件を出力: {args.out}（マニフェスト: {manifest_path}）")
+
+
+async def cmd_ingest_batch(args):
+    ai_service = AIService()
+    manifest_path = args.manifest or (args.requests + ".manifest.jsonl")
+    manifest = {r["custom_id"]: r for r in _read_jsonl(manifest_path)}
+    done: Set[str] = {r["key"] for r in _read_jsonl(args.out) if "key" in r}
+    writer = JsonlWriter(args.out)
+    counts = {"ok": 0, "skipped": 0, "failed": 0}
+
+    try:
+        for result in _read_jsonl(args.results):
+            meta = manifest.get(result.get("custom_id"))
+            if not meta:
+                counts["failed"] += 1
+                print(f"[ingest] マニフェストに存在しないcustom_id: {result.get('custom_id')}")
+                continue
+            key = _record_key(meta["url"], meta["level"])
+            if key in done:
+                counts["skipped"] += 1
+                continue
+
+            response = result.get("response") or {}
+            body = response.get("body") or {}
+            if result.get("error") or response.get("status_code") != 200 or not body.get("choices"):
+                counts["failed"] += 1
+                print(f"[ingest] 失敗レスポンス: {result.get('custom_id')} {result.get('error')}")
+                continue
+
+            content = (body["choices"][0].get("message") or {}).get("content") or ""
+            lessons = ai_service.parse_lesson_response(content.strip(), meta["japanese_title"], meta["level"])
+            if not lessons:
+                counts["failed"] += 1
+                continue
+            await writer.write({
+                "key": key,
+                "url": meta["url"],
+                "level": meta["level"],
+                "japanese_title": meta["japanese_title"],
+                "generated_at": datetime.now().isoformat(),
+                "lessons": lessons,
+            })
+            done.add(key)
+            counts["ok"] += 1
+    finally:
+        writer.close()
+    print(f"取り込み完了: 成功 {counts['ok']}件 / スキップ {counts['skipped']}件 / 失敗 {counts['failed']}件")
+
+
+async def cmd_load(args):
+    from app.services.notion_service import NotionService
+
+    notion_service = NotionService()
+    progress_path = args.input + ".loaded"
+    loaded: Set[str] = {r["key"] for r in _read_jsonl(progress_path) if "key" in r}
+    records = [r for r in _read_jsonl(args.input) if r.get("key") not in loaded]
+    print(f"保存対象: {len(records)}件（保存済み: {len(loaded)}件）")
+
+    sem = asyncio.Semaphore(args.concurrency)
+    progress = JsonlWriter(progress_path)
+    counts = {"ok": 0, "failed": 0}
+
+    async def _load(record: Dict):
+        async with sem:
+            try:
+                page_ids = []
+                for lesson in record["lessons"]:
+                    # NotionServiceは同期APIのためスレッドで実行
+                    page_ids.append(await asyncio.to_thread(
+                        notion_service.save_lesson, lesson, args.user_email, not args.no_duplicate_check
+                    ))
+            except Exception as e:
+                counts["failed"] += 1
+                print(f"[load] 失敗 {record['key']}: {e}")
+                return
+        if not all(page_ids):
+            counts["failed"] += 1
+            return
+        await progress.write({"key": record["key"], "page_ids": page_ids})
+        counts["ok"] += 1
+
+    try:
+        await asyncio.gather(*[_load(r) for r in records])
+    finally:
+        progress.close()
+    print(f"保存完了: 成功 {counts['ok']}件 / 失敗 {counts['failed']}件")
+
+
+async def _run(handler, args):
+    try:
+        await handler(args)
+    finally:
+        await shared_http_client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk lesson generation")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def _add_source_args(p):
+        p.add_argument("--urls", help="記事URLリスト（1行1URL）")
+        p.add_argument("--sweep", help=f"RSSスイープするソース（カンマ区切り: {','.join(NewsService.RSS_FEEDS)}）")
+        p.add_argument("--per-source", type=int, default=20, help="スイープ時のソースごとの記事数")
+        p.add_argument("--levels", default="1,2,3", help="生成するレベル（カンマ区切り）")
+        p.add_argument("--scrape-concurrency", type=int, default=8)
+
+    p_gen = sub.add_parser("generate", help="レッスンを生成してJSONLに出力")
+    _add_source_args(p_gen)
+    p_gen.add_argument("--concurrency", type=int, default=16, help="同時生成数")
+    p_gen.add_argument("--out", required=True)
+
+    p_emit = sub.add_parser("emit-batch", help="OpenAI Batch API形式のリクエストファイルを出力")
+    _add_source_args(p_emit)
+    p_emit.add_argument("--out", required=True)
+
+    p_ingest = sub.add_parser("ingest-batch", help="Batch APIの結果ファイルを取り込みJSONLに出力")
+    p_ingest.add_argument("--results", required=True, help="Batch APIの出力ファイル")
+    p_ingest.add_argument("--requests", required=True, help="emit-batchで出力したリクエストファイル")
+    p_ingest.add_argument("--manifest", help="マニフェスト（省略時は <requests>.manifest.jsonl）")
+    p_ingest.add_argument("--out", required=True)
+
+    p_load = sub.add_parser("load", help="生成済みJSONLをレッスンストア（Notion）へ一括保存")
+    p_load.add_argument("--in", dest="input", required=True)
+    p_load.add_argument("--user-email", default="", help="保存先ユーザー（空なら共通レッスン）")
+    p_load.add_argument("--concurrency", type=int, default=3, help="Notion APIのレート制限(3req/s)を考慮")
+    p_load.add_argument("--no-duplicate-check", action="store_true")
+
+    args = parser.parse_args()
+    if args.command in {"generate", "emit-batch"} and not (args.urls or args.sweep):
+        parser.error("--urls または --sweep を指定してください")
+
+    handlers = {
+        "generate": cmd_generate,
+        "emit-batch": cmd_emit_batch,
+        "ingest-batch": cmd_ingest_batch,
+        "load": cmd_load,
+    }
+    try:
+        asyncio.run(_run(handlers[args.command], args))
+    except KeyboardInterrupt:
+        print("\n中断しました。同じコマンドを再実行すると続きから再開します。")
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
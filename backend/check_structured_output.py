@@ -0,0 +1,78 @@
+"""
+Structured Outputs のスキーマ（app/services/structured_output.py）の確認
+
+スキーマどおりのレスポンスを組み立て、
+- モデルの全フィールド（バックエンドで付与するものを除く）がスキーマの properties / required に残っているか
+- そのレスポンスが AIService.parse_lesson_response でレッスンとして読めるか
+を確認します。APIキーやネットワークは不要です。
+
+使い方:
+  python check_structured_output.py
+"""
+import json
+import sys
+
+from app.models.schemas import FeedbackItem, LessonOption
+from app.services.ai_service import AIService
+from app.services.structured_output import (
+    FEEDBACK_BACKEND_FIELDS,
+    FEEDBACK_RESPONSE_FORMAT,
+    LESSON_BACKEND_FIELDS,
+    LESSON_RESPONSE_FORMAT,
+)
+
+
+def _resolve(node, defs):
+    ref = node.get("$ref")
+    if ref:
+        return defs[ref.split("/")[-1]]
+    return node
+
+
+def sample(node, defs, name="value"):
+    """スキーマどおりの値を作る（文字列はプロパティ名、配列は要素1つ）"""
+    node = _resolve(node, defs)
+    if "anyOf" in node:
+        return sample(node["anyOf"][0], defs, name)
+    kind = node.get("type")
+    if kind == "object":
+        return {key: sample(sub, defs, key) for key, sub in node["properties"].items()}
+    if kind == "array":
+        return [sample(node["items"], defs, name)]
+    if kind in ("integer", "number"):
+        return 1
+    if kind == "boolean":
+        return True
+    return f"sample {name}"
+
+
+def check_fields(label, response_format, list_key, model, backend_fields) -> bool:
+    schema = response_format["json_schema"]["schema"]
+    item = _resolve(schema["properties"][list_key]["items"], schema.get("$defs", {}))
+    expected = [name for name in model.model_fields if name not in backend_fields]
+    missing = [name for name in expected if name not in item["properties"]]
+    not_required = [name for name in expected if name not in item["required"]]
+    ok = not missing and not not_required
+    print(f"{label}: properties {list(item['properties'])}")
+    if not ok:
+        print(f"  NG missing={missing} not_required={not_required}")
+    return ok
+
+
+def main():
+    ok = check_fields("lesson", LESSON_RESPONSE_FORMAT, "lessons", LessonOption, LESSON_BACKEND_FIELDS)
+    ok &= check_fields("feedback", FEEDBACK_RESPONSE_FORMAT, "feedback", FeedbackItem, FEEDBACK_BACKEND_FIELDS)
+
+    schema = LESSON_RESPONSE_FORMAT["json_schema"]["schema"]
+    content = json.dumps(sample(schema, schema.get("$defs", {})))
+    lessons = AIService().parse_lesson_response(content, "サンプル記事", level=2)
+    round_trip = len(lessons) == 1 and lessons[0].get("title") == "sample title"
+    print(f"lesson round trip: {len(lessons)} lesson(s), title={lessons[0].get('title') if lessons else None!r}")
+    ok &= round_trip
+
+    print("OK" if ok else "NG")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
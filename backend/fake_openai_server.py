@@ -0,0 +1,404 @@
+"""
+ローカル用のOpenAI APIスタンドインサーバー（負荷試験・レイテンシ試験用）
+
+実APIを叩かずに /api/session/submit, /api/lesson/generate, /api/tts/speak,
+/api/whisper/transcribe を負荷試験するためのサーバーです。
+サービスが利用するエンドポイントだけを実装しています:
+
+  POST /v1/chat/completions      (stream=true のSSEトークンストリーミング対応)
+  POST /v1/audio/transcriptions
+  POST /v1/audio/speech
+
+使い方:
+  python fake_openai_server.py --port 8900 --chat-latency lognormal:1.2,0.5 --error-rate 0.05
+
+バックエンド側は .env で接続先を差し替えます:
+  OPENAI_API_KEY=fake
+  OPENAI_API_BASE=http://localhost:8900/v1
+
+レイテンシ指定の書式（秒）:
+  fixed:0.5 / uniform:0.2,1.5 / normal:平均,標準偏差 / lognormal:中央値,sigma / exp:平均
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+
+class LatencyDistribution:
+    """レイテンシ分布（"lognormal:1.2,0.5" 形式の文字列から生成）"""
+
+    def __init__(self, spec: str):
+        self.spec = spec
+        kind, _, params = spec.partition(":")
+        self.kind = kind.strip().lower()
+        self.params = [float(p) for p in params.split(",") if p.strip()]
+        if self.kind not in {"fixed", "uniform", "normal", "lognormal", "exp"}:
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self) -> float:
+        p = self.params
+        if self.kind == "fixed":
+            value = p[0] if p else 0.0
+        elif self.kind == "uniform":
+            value = random.uniform(p[0], p[1])
+        elif self.kind == "normal":
+            value = random.gauss(p[0], p[1])
+        elif self.kind == "lognormal":
+            value = random.lognormvariate(math.log(p[0]), p[1])
+        else:
+            value = random.expovariate(1.0 / p[0])
+        return max(0.0, value)
+
+
+class FakeConfig:
+    """スタブサーバーの設定（環境変数またはCLI引数から）"""
+
+    def __init__(self):
+        self.chat_latency = LatencyDistribution(os.getenv("FAKE_OPENAI_CHAT_LATENCY", "lognormal:1.0,0.4"))
+        self.transcribe_latency = LatencyDistribution(os.getenv("FAKE_OPENAI_TRANSCRIBE_LATENCY", "lognormal:0.8,0.3"))
+        self.speech_latency = LatencyDistribution(os.getenv("FAKE_OPENAI_SPEECH_LATENCY", "lognormal:0.5,0.3"))
+        # 1MBあたりの追加レイテンシ（文字起こしは音声サイズに比例して遅くなる）
+        self.transcribe_seconds_per_mb = float(os.getenv("FAKE_OPENAI_TRANSCRIBE_SECONDS_PER_MB", "0.5"))
+        # ストリーミング時の生成速度（トークン/秒）
+        self.stream_tokens_per_second = float(os.getenv("FAKE_OPENAI_STREAM_TPS", "80"))
+        # エラー注入
+        self.error_rate = float(os.getenv("FAKE_OPENAI_ERROR_RATE", "0"))
+        self.error_statuses = [int(s) for s in os.getenv("FAKE_OPENAI_ERROR_STATUSES", "429,500,503").split(",")]
+        self.hang_rate = float(os.getenv("FAKE_OPENAI_HANG_RATE", "0"))
+        self.hang_seconds = float(os.getenv("FAKE_OPENAI_HANG_SECONDS", "120"))
+        self.lessons_file = os.getenv("FAKE_OPENAI_LESSONS_FILE")
+        # プレフィックスキャッシュがヒットした割合に応じて最初のトークンまでの時間を短縮する率
+        self.cache_speedup = float(os.getenv("FAKE_OPENAI_CACHE_SPEEDUP", "0.5"))
+
+
+config = FakeConfig()
+stats: Dict[str, int] = {"requests": 0, "errors_injected": 0, "hangs_injected": 0}
+
+app = FastAPI(title="Fake OpenAI API", version="1.0.0")
+
+
+_CANNED_LESSON = {
+    "title": "City Opens New Library for Families",
+    "date": "Posted January 01, 2026",
+    "category": "News",
+    "vocabulary": [
+        {
+            "word": "library",
+            "pronunciation": "/ˈlaɪbrəri/",
+            "type": "(n.)",
+            "definition": "A building where people can read and borrow books.",
+            "example": "I go to the library every Saturday.",
+        },
+        {
+            "word": "community",
+            "pronunciation": "/kəˈmjuːnəti/",
+            "type": "(n.)",
+            "definition": "The people who live in one area.",
+            "example": "Our community enjoys the new park.",
+        },
+    ],
+    "content": (
+        "A city in Japan opened a new library this week. The library has many books for children and adults.\n\n"
+        "There is also a quiet room for students. People can use computers for free.\n\n"
+        "The mayor said the library is a place for the whole community. Many families visited on the first day."
+    ),
+    "discussion_a": ["What did the city open this week?", "What can people use for free?"],
+    "discussion_b": ["Do you often go to a library?", "What would you like in a new library?"],
+    "question": "What did the city open this week?",
+    "level": "2",
+}
+
+_CANNED_FEEDBACK = [
+    {
+        "original_sentence": "I go to library yesterday.",
+        "corrected_sentence": "I went to the library yesterday.",
+        "category": "Grammar",
+        "reason": "過去の出来事なので go を went にし、特定の図書館なので the を付けます。",
+    },
+    {
+        "original_sentence": "It was very fun place.",
+        "corrected_sentence": "It was a really fun place.",
+        "category": "Expression",
+        "reason": "可算名詞 place には a が必要です。very fun より really fun の方が自然です。",
+    },
+]
+
+_CANNED_TRANSCRIPT = (
+    "I think the new library is a good idea. I go to library yesterday with my son. "
+    "It was very fun place and we read many books."
+)
+
+
+def _load_canned_lessons() -> List[Dict]:
+    if config.lessons_file:
+        with open(config.lessons_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, list) else [data]
+    return [_CANNED_LESSON]
+
+
+def _estimate_tokens(text: str) -> int:
+    # 英数字は約4文字で1トークン、日本語などの非ASCII文字は約1文字で1トークンとして概算
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return max(1, ascii_chars // 4 + (len(text) - ascii_chars))
+
+
+class PrefixCache:
+    """
+    OpenAIの自動プロンプトキャッシュの模擬
+    先頭1024トークン以上のプレフィックスを128トークン単位でキャッシュする
+    """
+
+    MIN_TOKENS = 1024
+    INCREMENT = 128
+
+    def __init__(self, max_entries: int = 20000):
+        self._entries: "OrderedDict[int, None]" = OrderedDict()
+        self.max_entries = max_entries
+
+    def _boundaries(self, text: str) -> List[Tuple[int, int]]:
+        """(トークン数, 文字位置) のキャッシュ境界リスト"""
+        boundaries = []
+        tokens = 0.0
+        next_boundary = self.MIN_TOKENS
+        for i, ch in enumerate(text):
+            tokens += 0.25 if ord(ch) < 128 else 1.0
+            if tokens >= next_boundary:
+                boundaries.append((next_boundary, i + 1))
+                next_boundary += self.INCREMENT
+        return boundaries
+
+    def lookup_and_store(self, text: str) -> int:
+        """キャッシュヒットしたトークン数を返し、今回のプレフィックスを登録する"""
+        cached = 0
+        for tokens, end in self._boundaries(text):
+            key = hash(text[:end])
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                cached = tokens
+            else:
+                self._entries[key] = None
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return cached
+
+
+prefix_cache = PrefixCache()
+
+
+def _messages_text(messages: List[Dict]) -> str:
+    parts = []
+    for m in messages:
+        content = m.get("content")
+        parts.append(f"<|{m.get('role', 'user')}|>")
+        if isinstance(content, str):
+            parts.append(content)
+        elif isinstance(content, list):
+            parts.extend(c.get("text", "") for c in content if isinstance(c, dict))
+    return "\n".join(parts)
+
+
+def _canned_completion(body: Dict) -> str:
+    """リクエスト内容からそれらしい固定レスポンスを選ぶ"""
+    messages = body.get("messages") or []
+    text = _messages_text(messages)
+    wants_json = (body.get("response_format") or {}).get("type") in {"json_object", "json_schema"}
+
+    if wants_json and '"lessons"' in text:
+        lesson = dict(random.choice(_load_canned_lessons()))
+        m = re.search(r"学習者レベル: (\d)|learner level (\d)", text)
+        if m:
+            lesson["level"] = m.group(1) or m.group(2)
+        return json.dumps({"lessons": [lesson]}, ensure_ascii=False)
+    if wants_json and "original_sentence" in text:
+        return json.dumps({"feedback": _CANNED_FEEDBACK}, ensure_ascii=False)
+    if wants_json:
+        return "{}"
+    if "summary" in text.lower():
+        return "The learner talked about their weekend and their job. The tutor corrected past tense errors."
+    return "That sounds great! Could you tell me a little more about it?"
+
+
+async def _maybe_inject_failure() -> Optional[Response]:
+    stats["requests"] += 1
+    if config.hang_rate and random.random() < config.hang_rate:
+        stats["hangs_injected"] += 1
+        await asyncio.sleep(config.hang_seconds)
+    if config.error_rate and random.random() < config.error_rate:
+        stats["errors_injected"] += 1
+        status = random.choice(config.error_statuses)
+        return JSONResponse(
+            status_code=status,
+            content={"error": {"message": f"Injected failure ({status})", "type": "fake_error", "code": str(status)}},
+        )
+    return None
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    failure = await _maybe_inject_failure()
+    if failure is not None:
+        return failure
+
+    model = body.get("model", "gpt-4o-mini")
+    content = _canned_completion(body)
+    prompt_text = _messages_text(body.get("messages") or [])
+    prompt_tokens = _estimate_tokens(prompt_text)
+    cached_tokens = min(prefix_cache.lookup_and_store(prompt_text), prompt_tokens)
+    completion_tokens = _estimate_tokens(content)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+    created = int(time.time())
+
+    # 最初のトークンまでの待ち時間（キャッシュヒット分だけ短縮）
+    cache_ratio = cached_tokens / prompt_tokens
+    await asyncio.sleep(config.chat_latency.sample() * (1.0 - config.cache_speedup * cache_ratio))
+
+    if body.get("stream"):
+        async def _stream():
+            # 4文字 ≒ 1トークンとしてチャンク分割
+            tokens = [content[i:i + 4] for i in range(0, len(content), 4)]
+            delay = 1.0 / config.stream_tokens_per_second if config.stream_tokens_per_second > 0 else 0.0
+            for i, tok in enumerate(tokens):
+                delta = {"content": tok}
+                if i == 0:
+                    delta["role"] = "assistant"
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                if delay:
+                    await asyncio.sleep(delay)
+            final = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(_stream(), media_type="text/event-stream")
+
+    # 非ストリーミング: 生成時間ぶん待つ
+    if config.stream_tokens_per_second > 0:
+        await asyncio.sleep(completion_tokens / config.stream_tokens_per_second)
+
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        },
+    }
+
+
+@app.post("/v1/audio/transcriptions")
+async def audio_transcriptions(request: Request):
+    # multipartは解析せず、サイズだけ見てレイテンシに反映する
+    body = await request.body()
+    failure = await _maybe_inject_failure()
+    if failure is not None:
+        return failure
+
+    size_mb = len(body) / (1024 * 1024)
+    await asyncio.sleep(config.transcribe_latency.sample() + size_mb * config.transcribe_seconds_per_mb)
+    return {"text": _CANNED_TRANSCRIPT}
+
+
+@app.post("/v1/audio/speech")
+async def audio_speech(request: Request):
+    body = await request.json()
+    failure = await _maybe_inject_failure()
+    if failure is not None:
+        return failure
+
+    await asyncio.sleep(config.speech_latency.sample())
+    # 実際のmp3ではないが、入力長に比例したサイズのダミー音声を返す
+    text = body.get("input") or ""
+    frame = b"\xff\xfb\x90\x64" + b"\x00" * 413
+    return Response(content=frame * max(1, len(text) // 4), media_type="audio/mpeg")
+
+
+@app.get("/v1/models")
+async def list_models():
+    return {
+        "object": "list",
+        "data": [
+            {"id": m, "object": "model", "owned_by": "fake"}
+            for m in ("gpt-4o-mini", "gpt-4o", "whisper-1", "gpt-4o-mini-tts", "tts-1-hd")
+        ],
+    }
+
+
+@app.get("/stats")
+async def get_stats():
+    """注入したエラー数などの統計"""
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI API server for load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--chat-latency", help="例: lognormal:1.0,0.4")
+    parser.add_argument("--transcribe-latency", help="例: uniform:0.5,1.5")
+    parser.add_argument("--speech-latency", help="例: fixed:0.3")
+    parser.add_argument("--stream-tps", type=float, help="生成速度（トークン/秒）")
+    parser.add_argument("--error-rate", type=float, help="エラー注入率（0-1）")
+    parser.add_argument("--error-statuses", help="注入するHTTPステータス（カンマ区切り）")
+    parser.add_argument("--hang-rate", type=float, help="応答を返さずハングさせる率（0-1）")
+    parser.add_argument("--lessons-file", help="固定レッスンのJSONファイル（オブジェクトまたは配列）")
+    args = parser.parse_args()
+
+    if args.chat_latency:
+        config.chat_latency = LatencyDistribution(args.chat_latency)
+    if args.transcribe_latency:
+        config.transcribe_latency = LatencyDistribution(args.transcribe_latency)
+    if args.speech_latency:
+        config.speech_latency = LatencyDistribution(args.speech_latency)
+    if args.stream_tps is not None:
+        config.stream_tokens_per_second = args.stream_tps
+    if args.error_rate is not None:
+        config.error_rate = args.error_rate
+    if args.error_statuses:
+        config.error_statuses = [int(s) for s in args.error_statuses.split(",")]
+    if args.hang_rate is not None:
+        config.hang_rate = args.hang_rate
+    if args.lessons_file:
+        config.lessons_file = args.lessons_file
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,6 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
@@ -8,12 +11,57 @@ load_dotenv()
 
 from app.routes import session_router, auth_router, chat_router, dashboard_router, lesson_router, tts_router, stripe_webhook_router, feedback_router
 from app.routes import whisper as whisper_router
+from app.routes.lesson import lesson_variant_store
+from app.routes.chat import chat_store
+from app.services.llm_hedging import llm_hedger
+from app.services.llm_usage import prompt_cache_stats, structured_output_stats
+from app.services.model_router import model_router
+from app.services.http_client import shared_http_client
+from app.services.article_cache import article_cache
+from app.services.article_extractors import download_stats
+from app.services.circuit_breaker import domain_breaker
+from app.services.parse_pool import parse_pool
+from app.services.article_index import article_index
+from app.services.news_service import NewsService, news_source_stats
+from app.services.rss_poller import RssPoller
+from app.services.session_store import session_store
+from app.services.live_practice import live_practice_stats
+from app.services.audio_probe import audio_probe_stats
+from app.services.audio_segmenter import segmentation_stats
+from app.services.idempotency import transcription_results
+from app.services.usage_ledger import usage_ledger
+
+# RSSを定期取得して記事索引に先読みするバックグラウンドタスク（RSS_POLLER_ENABLED=0で無効化）
+rss_poller = RssPoller(NewsService(), article_index)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 記事・RSS取得用の共有HTTPクライアント（接続プール・keep-alive・HTTP/2）
+    await shared_http_client.start()
+    app.state.http_client = shared_http_client
+    if os.getenv("RSS_POLLER_ENABLED", "1") != "0":
+        rss_poller.start()
+    # Whisper使用量のNotionへの書き込み（まとめて定期的に）
+    usage_ledger.start()
+    yield
+    await rss_poller.stop()
+    await usage_ledger.stop()
+    await shared_http_client.aclose()
+    parse_pool.shutdown()
+    article_index.close()
+    session_store.close()
+    chat_store.close()
+    transcription_results.close()
+    usage_ledger.close()
+    lesson_variant_store.close()
 
 
 app = FastAPI(
     title="English Conversation Training API",
     description="API for RareJob DNA article-based conversation training",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS設定（フロントエンドからのアクセスを許可）
@@ -47,9 +95,25 @@ async def root():
         "message": "English Conversation Training API is running"
     }
 
+_health_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="health")
+
+
 @app.get("/health")
 async def health_check():
     """詳細なヘルスチェック"""
+    # SQLiteに問い合わせる統計は、書き込み中のロック待ちでイベントループを止めないようスレッドで取得する
+    # （既定のスレッドプールはNotion保存でも使うため、その後ろに並ばないよう専用のスレッドで）。
+    # どれかが失敗しても（ロック待ちのタイムアウトなど）その項目だけエラーとし、ヘルスチェック自体は成功させる
+    results = await asyncio.gather(
+        asyncio.get_running_loop().run_in_executor(_health_executor, article_index.stats),
+        session_store.asnapshot(),
+        transcription_results.asnapshot(),
+        usage_ledger.asnapshot(),
+        return_exceptions=True,
+    )
+    article_index_stats, sessions, transcription_replays, usage = [
+        {"error": str(result)} if isinstance(result, Exception) else result for result in results
+    ]
     return {
         "status": "healthy",
         "openai_configured": bool(os.getenv("OPENAI_API_KEY")),
@@ -65,6 +129,25 @@ async def health_check():
         "notion_db_lessons_id_value": os.getenv("NOTION_LESSONS_DB_ID", "NOT_SET")[:20] + "..." if os.getenv("NOTION_LESSONS_DB_ID") else "NOT_SET",
         "stripe_secret_configured": bool(os.getenv("STRIPE_SECRET_KEY")),
         "stripe_webhook_secret_configured": bool(os.getenv("STRIPE_WEBHOOK_SECRET")),
+        "llm_hedging": llm_hedger.snapshot(),
+        "llm_prompt_cache": prompt_cache_stats.snapshot(),
+        "llm_routing": model_router.snapshot(),
+        "llm_structured_output": structured_output_stats.snapshot(),
+        "http_client": shared_http_client.snapshot(),
+        "news_sources": news_source_stats.snapshot(),
+        "article_cache": article_cache.snapshot(),
+        "article_download": download_stats.snapshot(),
+        "scrape_breakers": domain_breaker.snapshot(),
+        "html_parse_pool": parse_pool.snapshot(),
+        "rss_poller": rss_poller.snapshot(),
+        "article_index": article_index_stats,
+        "lesson_near_duplicates": lesson_variant_store.similar.snapshot(),
+        "sessions": sessions,
+        "live_practice": live_practice_stats.snapshot(),
+        "audio_probe": audio_probe_stats.snapshot(),
+        "audio_segmentation": segmentation_stats.snapshot(),
+        "transcription_replays": transcription_replays,
+        "usage_ledger": usage,
     }
 
 if __name__ == "__main__":
@@ -931,7 +931,7 @@ function SessionPageInner() {
             const levelParam = searchParams.get('level');
             const level = levelParam ? parseInt(levelParam, 10) : 2;
             console.log('[Session] Generating lessons with level:', level);
-            const response = await api.generateLessons(level);
+            const response = await api.getDailyLesson(level);
             console.log('[Session] handleGenerate success:', response);
             setLessons((response.lessons || []).map((l) => normalizeLesson(l)));
             setStep('selection');
@@ -22,6 +22,7 @@ export default function AIChat() {
     const streamRef = useRef<MediaStream | null>(null);
     const recordingStartTimeRef = useRef<number>(0);
     const sessionIdRef = useRef<string>('');
+    const conversationIdRef = useRef<string>('');
 
     // Sync state to refs to avoid stale closures
     useEffect(() => {
@@ -497,7 +498,8 @@ export default function AIChat() {
         try {
             // Use REF for history to avoid stale closure
             const history = messagesRef.current.map(m => ({ role: m.role, content: m.content }));
-            const data = await api.sendMessage(userMsg, history);
+            const data = await api.sendMessage(userMsg, history, conversationIdRef.current || undefined);
+            conversationIdRef.current = data.conversation_id;
             setMessages(prev => [...prev, { role: 'assistant', content: data.response }]);
             setStatusMsg(''); // ステータスメッセージをクリア
 
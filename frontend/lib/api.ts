@@ -115,6 +115,18 @@ export const api = {
         return response.json();
     },
 
+    async getDailyLesson(level: number = 2): Promise<LessonGenerateResponse> {
+        // 今日の記事のレベル別レッスン（初回のみ全レベルを生成、以降のレベル切り替えは即時）
+        const response = await authenticatedFetch(`${API_URL}/api/lesson/daily?level=${level}`, {
+            method: 'GET',
+        });
+        if (!response.ok) {
+            const errorData = await response.json().catch(() => ({}));
+            throw new Error(errorData.detail || 'レッスンの取得に失敗しました');
+        }
+        return response.json();
+    },
+
     async generateLessonFromUrl(newsUrl: string): Promise<LessonGenerateResponse> {
         const response = await authenticatedFetch(`${API_URL}/api/lesson/generate`, {
             method: 'POST',
@@ -207,11 +219,22 @@ export const api = {
         return response.json();
     },
 
-    async sendMessage(message: string, history: any[]): Promise<{ response: string }> {
-        const response = await authenticatedFetch(`${API_URL}/api/chat`, {
+    async sendMessage(message: string, history: any[], conversationId?: string): Promise<{ response: string; conversation_id: string }> {
+        // conversation_id があれば履歴はサーバー側に保持されているため送らない
+        const body = conversationId
+            ? { message, conversation_id: conversationId }
+            : { message, history };
+        let response = await authenticatedFetch(`${API_URL}/api/chat`, {
             method: 'POST',
-            body: JSON.stringify({ message, history }),
+            body: JSON.stringify(body),
         });
+        if (response.status === 404 && conversationId) {
+            // サーバー側の会話が期限切れなどで見つからない場合は、手元の履歴を付けて新しい会話として送り直す
+            response = await authenticatedFetch(`${API_URL}/api/chat`, {
+                method: 'POST',
+                body: JSON.stringify({ message, history }),
+            });
+        }
         if (!response.ok) {
             throw new Error('メッセージの送信に失敗しました');
         }